@@ -0,0 +1,480 @@
+"""
+Offline benchmark suite for the backend.
+
+Generates a synthetic product catalog (with realistic category, brand and
+attribute cardinalities) in a local SQLite file or a disposable Postgres
+database, stores media with STORAGE_BACKEND=local (main.LocalStorage) and
+serves media links from a local HTTP server, then measures throughput and
+p50/p99 latency of the hot endpoints in-process. Results are written as JSON so runs can be compared.
+
+    python benchmark.py --sizes 10000,100000 --output bench.json
+    python benchmark.py --sizes 10000 --baseline bench.json   # exits 1 on regressions
+
+Each catalog size runs in its own subprocess, because main.py binds its
+engine to DATABASE_URL at import time.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAIN_CATEGORIES = [
+    "Sensors", "Valves", "Motors", "Drives", "Relays", "Switches",
+    "Connectors", "Cables", "Controllers", "Pneumatics", "Lighting", "Enclosures",
+]
+SUB_CATEGORY_KINDS = [
+    "Inductive", "Capacitive", "Photoelectric", "Ultrasonic", "Solenoid", "Miniature",
+    "Industrial", "Safety", "Compact", "Heavy Duty", "Modular", "Accessories",
+]
+BRAND_COUNT = 300
+BRANDS_PER_CATEGORY = 40
+ATTRIBUTE_CARDINALITIES = {
+    "housing_size": 30,
+    "function": 40,
+    "range": 60,
+    "output": 20,
+    "voltage": 15,
+    "connection": 25,
+    "material": 12,
+}
+ATTRIBUTE_NULL_RATE = 0.3
+MEDIA_VARIANTS = 500  # distinct media files behind the generated links
+INSERT_CHUNK = 5000
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    """
+    Serves /media/<n>.jpg and /media/<n>.pdf with deterministic bodies.
+    """
+
+    def do_GET(self):
+        name = os.path.basename(self.path)
+        body = (f"benchmark media {name} ".encode() * 512)[:16384]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf" if name.endswith(".pdf") else "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_media_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MediaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/media"
+
+
+def zipf_weights(count, exponent=0.9):
+    return [1 / (rank + 1) ** exponent for rank in range(count)]
+
+
+def catalog_shape(rng):
+    """
+    Reference data of the synthetic catalog: categories, sub-categories per
+    category, the brands sold in each category and the attribute vocabularies.
+    """
+    brands = [f"Brand {index:03d}" for index in range(BRAND_COUNT)]
+    sub_categories = {main: [f"{main} {kind}" for kind in SUB_CATEGORY_KINDS] for main in MAIN_CATEGORIES}
+    category_brands = {main: rng.sample(brands, BRANDS_PER_CATEGORY) for main in MAIN_CATEGORIES}
+    attributes = {
+        column: [f"{column.replace('_', ' ').title()} {index}" for index in range(count)]
+        for column, count in ATTRIBUTE_CARDINALITIES.items()
+    }
+    return brands, sub_categories, category_brands, attributes
+
+
+def generate_catalog(main, size, rng, media_base, media_rows):
+    """
+    Insert `size` products plus the category, sub_category and brand rows.
+    The first `media_rows` products get image and PDF links on the local media server.
+    """
+    from sqlalchemy import insert
+
+    brands, sub_categories, category_brands, attributes = catalog_shape(rng)
+    category_weights = zipf_weights(len(MAIN_CATEGORIES), 0.6)
+    sub_weights = zipf_weights(len(SUB_CATEGORY_KINDS), 0.8)
+    brand_weights = zipf_weights(BRANDS_PER_CATEGORY)
+    attribute_weights = {column: zipf_weights(len(values), 0.7) for column, values in attributes.items()}
+
+    with main.engine.begin() as conn:
+        conn.execute(insert(main.Category.__table__), [
+            {"main_category": name, "display_name": name, "priority": index, "image_link": f"{media_base}/category-{index}.jpg"}
+            for index, name in enumerate(MAIN_CATEGORIES)
+        ])
+        conn.execute(insert(main.SubCategory.__table__), [
+            {"subcat": name, "display_name": name, "priority": index, "link": f"{media_base}/sub-{index}.jpg"}
+            for names in sub_categories.values() for index, name in enumerate(names)
+        ])
+        conn.execute(insert(main.Brand.__table__), [
+            {"brand": name, "display_name": name, "priority": index, "aws_link": f"{media_base}/brand-{index}.jpg"}
+            for index, name in enumerate(brands)
+        ])
+
+    for start in range(0, size, INSERT_CHUNK):
+        rows = []
+        for index in range(start, min(start + INSERT_CHUNK, size)):
+            main_cat = rng.choices(MAIN_CATEGORIES, category_weights)[0]
+            brand = rng.choices(category_brands[main_cat], brand_weights)[0]
+            row = {
+                "code": f"LV{index:07d}",
+                "main_cat": main_cat,
+                "sub_cat": rng.choices(sub_categories[main_cat], sub_weights)[0],
+                "brand": brand,
+                "model": f"{brand.split()[-1]}-{rng.randrange(36 ** 5):05X}",
+                "images": None,
+                "pdf": None,
+            }
+            for column, values in attributes.items():
+                row[column] = None if rng.random() < ATTRIBUTE_NULL_RATE else rng.choices(values, attribute_weights[column])[0]
+            if index < media_rows:
+                row["images"] = f"{media_base}/{index % MEDIA_VARIANTS}.jpg"
+                row["pdf"] = f"{media_base}/{index % MEDIA_VARIANTS}.pdf"
+            rows.append(row)
+        with main.engine.begin() as conn:
+            conn.execute(insert(main.Product.__table__), rows)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summarize(name, latencies, errors, wall):
+    latencies = sorted(latencies)
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+    }
+
+
+async def run_scenario(client, name, make_request, count, concurrency):
+    """
+    Issue `count` requests built by `make_request(i)` -> (method, url, json body)
+    with at most `concurrency` in flight.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(index):
+        nonlocal errors
+        method, url, body = make_request(index)
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            errors += 1
+        latencies.append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(index) for index in range(count)])
+    return summarize(name, latencies, errors, time.perf_counter() - started)
+
+
+def serialization_cost(main, limit, repeats):
+    """
+    CPU time per row of a `limit`-row product page on the former ORM read path
+    (Product objects, ProductResponse.model_validate, response_model validation and
+    JSON encoding) and on the Core tuple + FastJSONResponse path. Both include
+    running the query.
+    """
+    from typing import List
+
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+
+    response_model = TypeAdapter(List[main.ProductResponse])
+
+    def orm_page(db):
+        products = db.query(main.Product).order_by(main.Product.id).limit(limit).all()
+        models = [main.ProductResponse.model_validate(product) for product in products]
+        content = response_model.dump_python(response_model.validate_python(models), mode="json")
+        body = json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode()
+        db.expunge_all()
+        return body
+
+    def core_page(db):
+        rows = main.project_products(db.query(main.Product), None).order_by(main.Product.id).limit(limit).all()
+        return main.FastJSONResponse(main.product_dicts(rows, None)).body
+
+    timings = {}
+    with main.SessionLocal() as db:
+        for name, page in (("orm", orm_page), ("core", core_page)):
+            page(db)  # warm-up
+            started = time.process_time()
+            for _ in range(repeats):
+                rows = json.loads(page(db))
+            timings[name] = (time.process_time() - started) / (repeats * max(len(rows), 1)) * 1e6
+    return {
+        "scenario": f"serialization_limit_{limit}",
+        "rows": len(rows),
+        "orm_us_per_row": round(timings["orm"], 2),
+        "core_us_per_row": round(timings["core"], 2),
+        "saved_us_per_row": round(timings["orm"] - timings["core"], 2),
+        "speedup": round(timings["orm"] / timings["core"], 2) if timings["core"] else None,
+    }
+
+
+async def run_process_links(client, timeout):
+    """
+    Start a media migration job and wait for it; throughput is media links per second.
+    """
+    started = time.perf_counter()
+    job = (await client.put("/process-links", params={"restart": "true"})).json()
+    status = {}
+    while time.perf_counter() - started < timeout:
+        status = (await client.get(job["status_url"])).json()
+        if status.get("status") in ("completed", "failed", "interrupted"):
+            break
+        await asyncio.sleep(0.2)
+    wall = time.perf_counter() - started
+    links = status.get("processed", 0)
+    return {
+        "scenario": "process_links",
+        "status": status.get("status"),
+        "links": links,
+        "updated": status.get("updated"),
+        "failed": status.get("failed"),
+        "seconds": round(wall, 3),
+        "throughput_links_per_s": round(links / wall, 2) if wall else None,
+    }
+
+
+async def run_suite(main, size, args, rng):
+    import httpx
+
+    with main.SessionLocal() as db:
+        pairs = [tuple(row) for row in db.query(main.Product.main_cat, main.Product.sub_cat).distinct()]
+    brands, sub_categories, category_brands, attributes = catalog_shape(random.Random(args.seed))
+    deep = max(0, size - args.page_size * 10)
+    count = args.requests
+
+    def get(url):
+        return lambda index: ("GET", url(index), None)
+
+    search_filters = {
+        "search_main_cat": lambda: {"main_cat": rng.choice(MAIN_CATEGORIES)[:5]},
+        "search_main_sub": lambda: dict(zip(("main_cat", "sub_cat"), rng.choice(pairs))),
+        "search_brand": lambda: {"brand": f"{rng.randrange(BRAND_COUNT):03d}"},
+        "search_model_prefix": lambda: {"model": f"{rng.randrange(BRAND_COUNT):03d}-{rng.randrange(16):X}"},
+        "search_three_filters": lambda: {
+            "main_cat": rng.choice(MAIN_CATEGORIES),
+            "voltage": rng.choice(attributes["voltage"]),
+            "material": rng.choice(attributes["material"]),
+        },
+        "search_deep_page": lambda: {"main_cat": rng.choice(MAIN_CATEGORIES), "page": 50},
+    }
+    scenarios = [
+        ("products_deep_offset", get(lambda i: f"/products?limit={args.page_size}&offset={rng.randint(deep // 2, deep)}")),
+        ("products_deep_cursor", get(lambda i: f"/products?limit={args.page_size}&after_id={rng.randint(deep // 2, deep)}")),
+        ("products_limit_500", get(lambda i: f"/products?limit=500&after_id={rng.randint(0, max(0, size - 500))}")),
+    ]
+    for name, make_params in search_filters.items():
+        scenarios.append((name, lambda i, make_params=make_params: (
+            "GET", "/search-products-extended?" + "&".join(f"{k}={v}" for k, v in make_params().items()), None)))
+    scenarios += [
+        ("distinct_values", get(lambda i: "/distinct-values")),
+        ("unique_brands", get(lambda i: "/products/unique_brands/{}/{}".format(*rng.choice(pairs)))),
+        ("navigation", get(lambda i: "/navigation")),
+        ("bulk_update_ids", lambda i: ("PATCH", "/bulk/products", {
+            "ids": rng.sample(range(1, size + 1), min(size, 100)),
+            "changes": {"voltage": rng.choice(attributes["voltage"])},
+        })),
+        ("bulk_update_items", lambda i: ("PATCH", "/bulk/products", {
+            "items": [{"id": product_id, "material": rng.choice(attributes["material"])}
+                      for product_id in rng.sample(range(1, size + 1), min(size, 100))],
+        })),
+    ]
+
+    results = []
+    transport = httpx.ASGITransport(app=main.app)
+    # A running server has its search index built in the background long before
+    # the measured requests; build it up front instead of racing the rebuild thread
+    main.search_index.rebuild()
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for name, make_request in scenarios:
+            if args.scenarios and name not in args.scenarios:
+                continue
+            # One warm-up request fills the in-memory caches, as on a running server
+            method, url, body = make_request(-1)
+            await client.request(method, url, json=body)
+            result = await run_scenario(client, name, make_request, count, args.concurrency)
+            print(f"  {size:>9} {name:<22} {result['throughput_rps']:>9} req/s  "
+                  f"p50 {result['p50_ms']:>9} ms  p99 {result['p99_ms']:>9} ms  errors {result['errors']}")
+            results.append(result)
+        if args.media_rows and (not args.scenarios or "process_links" in args.scenarios):
+            result = await run_process_links(client, args.process_links_timeout)
+            print(f"  {size:>9} process_links          {result['throughput_links_per_s']} links/s ({result['status']})")
+            results.append(result)
+    if not args.scenarios or "serialization" in args.scenarios:
+        result = serialization_cost(main, 500, args.serialization_repeats)
+        print(f"  {size:>9} {result['scenario']:<22} orm {result['orm_us_per_row']} us/row  "
+              f"core {result['core_us_per_row']} us/row  ({result['speedup']}x)")
+        results.append(result)
+    if main.async_engine is not None:
+        await main.async_engine.dispose()
+    return results
+
+
+def run_size(args):
+    """
+    Worker: build one catalog and benchmark it (runs in a subprocess).
+    """
+    workdir = tempfile.mkdtemp(prefix=f"benchmark-{args.size}-")
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'catalog.db')}"
+    os.environ.update({
+        "DATABASE_URL": database_url,
+        "AWS_BUCKET_NAME": "benchmark-bucket",
+        "STORAGE_BACKEND": "local",
+        "LOCAL_STORAGE_DIR": os.path.join(workdir, "storage"),
+        "UPLOAD_SIGNING_SECRET": "benchmark",
+        "MEDIA_JOB_DIR": workdir,
+        # The synthetic media are not real images; process_links measures transfers only
+        "IMAGE_VARIANTS_ENABLED": "false",
+    })
+    server, media_base = start_media_server()
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import main
+
+        if args.database_url:
+            main.Base.metadata.drop_all(main.engine)
+        main.init_db()
+
+        rng = random.Random(args.seed)
+        started = time.perf_counter()
+        generate_catalog(main, args.size, rng, media_base, min(args.media_rows, args.size))
+        generation_seconds = time.perf_counter() - started
+        print(f"  {args.size:>9} generated in {generation_seconds:.1f}s ({database_url.split(':')[0]})")
+
+        results = asyncio.run(run_suite(main, args.size, args, rng))
+        with open(args.output, "w") as output:
+            json.dump({"size": args.size, "generation_seconds": round(generation_seconds, 3), "results": results}, output)
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def find_regressions(current, baseline, tolerance):
+    """
+    Scenarios whose p99 grew or throughput dropped by more than `tolerance` (a fraction).
+    """
+    previous = {(run["size"], result["scenario"]): result for run in baseline["runs"] for result in run["results"]}
+    regressions = []
+    for run in current["runs"]:
+        for result in run["results"]:
+            before = previous.get((run["size"], result["scenario"]))
+            if not before:
+                continue
+            for metric, worse_when_higher in (("p99_ms", True), ("throughput_rps", False), ("throughput_links_per_s", False)):
+                old, new = before.get(metric), result.get(metric)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old
+                if (change > tolerance) if worse_when_higher else (change < -tolerance):
+                    regressions.append({"size": run["size"], "scenario": result["scenario"],
+                                        "metric": metric, "baseline": old, "current": new})
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated catalog sizes")
+    parser.add_argument("--database-url", help="Disposable database to use instead of a temporary SQLite file; its tables are dropped")
+    parser.add_argument("--allow-drop", action="store_true", help="Confirm that --database-url may be wiped")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight per scenario")
+    parser.add_argument("--page-size", type=int, default=50, help="limit used by the /products scenarios")
+    parser.add_argument("--media-rows", type=int, default=1000, help="Products with media links for /process-links (0 skips it)")
+    parser.add_argument("--process-links-timeout", type=float, default=600)
+    parser.add_argument("--serialization-repeats", type=int, default=20, help="Pages timed per read path in the serialization comparison")
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), help="Only run these scenarios")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before a regression is reported")
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)  # worker mode
+    args = parser.parse_args()
+
+    if args.size is not None:
+        run_size(args)
+        return
+    if args.database_url and not args.allow_drop:
+        parser.error("--database-url drops the tables of that database; pass --allow-drop to confirm")
+
+    runs = []
+    for size in [int(value) for value in args.sizes.split(",") if value]:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as handle:
+            worker_output = handle.name
+        worker_args = list(sys.argv[1:])
+        for flag in ("--output", "--baseline", "--sizes"):
+            if flag in worker_args:
+                index = worker_args.index(flag)
+                del worker_args[index:index + 2]
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), *worker_args,
+                            "--size", str(size), "--output", worker_output], check=True)
+            with open(worker_output) as handle:
+                runs.append(json.load(handle))
+        finally:
+            os.remove(worker_output)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": (args.database_url or "sqlite").split(":")[0],
+            "db_async": os.getenv("DB_ASYNC", "false"),
+            "requests_per_scenario": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "runs": runs,
+    }
+    if args.baseline:
+        with open(args.baseline) as handle:
+            report["regressions"] = find_regressions(report, json.load(handle), args.tolerance)
+    with open(args.output, "w") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"Results written to {args.output}")
+
+    for regression in report.get("regressions", []):
+        print(f"Regression: {regression['scenario']} @ {regression['size']} {regression['metric']} "
+              f"{regression['baseline']} -> {regression['current']}")
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
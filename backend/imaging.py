@@ -0,0 +1,44 @@
+"""
+Image resizing for the image variant process pool.
+
+Kept out of main.py on purpose: the pool's processes are spawned, so they import
+the module of the function they run. This one needs only Pillow, not the
+application (engine, routes, settings) that main.py builds on import.
+"""
+
+import io
+
+from PIL import Image, ImageOps
+
+
+def render_image_variants(data, sizes, formats, quality):
+    """
+    Resize and recompress an image into every `sizes` entry (name -> longest
+    side in pixels, never enlarged) and every format in `formats` ("webp",
+    "jpeg"). Returns (variant, format, bytes, width, height) tuples.
+    """
+    results = []
+    with Image.open(io.BytesIO(data)) as source:
+        # JPEGs can be decoded at a reduced scale when the largest variant is much smaller
+        largest = max(sizes.values())
+        source.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(source)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    # Largest first, so every smaller variant is resized from the previous one
+    for variant, longest_side in sorted(sizes.items(), key=lambda item: -item[1]):
+        image = image.copy()
+        image.thumbnail((longest_side, longest_side), Image.LANCZOS)
+        for image_format in formats:
+            output = io.BytesIO()
+            if image_format == "jpeg":
+                flat = image
+                if has_alpha:
+                    flat = Image.new("RGB", image.size, (255, 255, 255))
+                    flat.paste(image, mask=image.getchannel("A"))
+                flat.save(output, "JPEG", quality=quality, optimize=True, progressive=True)
+            else:
+                image.save(output, "WEBP", quality=quality, method=4)
+            results.append((variant, image_format, output.getvalue(), image.width, image.height))
+    return results
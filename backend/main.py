@@ -1,25 +1,70 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, File, UploadFile, Path
+import time
+
+# Cold start is measured from here, before the heavy imports
+PROCESS_STARTED = time.monotonic()
+
+from fastapi import FastAPI, Depends, HTTPException, Query, File, Form, UploadFile, Path, Response, Request
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, ValidationError, TypeAdapter
 from fastapi import FastAPI, HTTPException
-from sqlalchemy import create_engine, Column, Integer, String, Text
+from sqlalchemy import create_engine, event, Column, Integer, String, Text, DateTime, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import asc ,or_, func, and_
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from sqlalchemy import asc ,or_, func, and_, update, text, select, insert, bindparam, inspect, case, literal_column, null, tuple_, union_all
+from sqlalchemy.exc import DataError, SQLAlchemyError, TimeoutError as SQLAlchemyTimeoutError
 
 from dotenv import load_dotenv
 import os
-import boto3
 from botocore.exceptions import ClientError
-from datetime import datetime
-from urllib.parse import urlparse
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote, unquote, urlencode, urlparse
 import csv
+import io
+import logging
 import requests
-
-
-app = FastAPI()
+import base64
+import json
+import threading
+import random
+import uuid
+import hashlib
+import hmac
+import shutil
+import mimetypes
+import tempfile
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.engine import make_url
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager, closing, contextmanager
+from contextvars import ContextVar
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    report_upload_signing_secret()
+    # Open the first DB connection and build the S3 client off the request path
+    threading.Thread(target=readiness.warm_up, daemon=True).start()
+    # Pick up media jobs that a previous process left unfinished
+    threading.Thread(target=media_jobs.resume_interrupted, daemon=True).start()
+    yield
+    media_jobs.shutdown()
+    image_variants.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -28,6 +73,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all HTTP methods
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Next-Cursor", "ETag"],  # Keyset pagination cursor, part ETags of local multipart uploads
 )
 
 # Load environment variables from .env file
@@ -42,22 +88,744 @@ AWS_REGION = os.getenv("AWS_REGION")
 # AWS S3 Configuration
 AWS_BUCKET_NAME = os.getenv("AWS_BUCKET_NAME")
 AWS_REGION = os.getenv("AWS_REGION")
-S3_CLIENT = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION
-)
+# "s3", or "local" to keep objects on the local filesystem (offline development and tests)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "s3").lower()
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "storage")
+# Base URL under which the API is reachable; local objects are served from {STORAGE_PUBLIC_URL}/storage/
+STORAGE_PUBLIC_URL = os.getenv("STORAGE_PUBLIC_URL", "http://localhost:8000").rstrip("/")
+# Signs upload tokens and local presigned URLs. Without it the /uploads endpoints
+# answer 503 when STORAGE_BACKEND=s3 or with several workers (WEB_CONCURRENCY,
+# read by uvicorn and gunicorn); the rest of the API is unaffected.
+UPLOAD_SIGNING_SECRET = os.getenv("UPLOAD_SIGNING_SECRET")
+UPLOAD_SIGNING_SECRET_GENERATED = not UPLOAD_SIGNING_SECRET
+if UPLOAD_SIGNING_SECRET_GENERATED:
+    # Only valid in this process; upload_signing_unavailable() decides whether that is acceptable
+    UPLOAD_SIGNING_SECRET = uuid.uuid4().hex
+
+S3_CLIENT = None  # created on first use by get_s3_client()
+_s3_client_lock = threading.Lock()
+
+
+def upload_signing_unavailable():
+    """
+    Why direct uploads cannot be signed, or None when they can. A per-process
+    secret breaks uploads wherever a token signed by one worker (or before a
+    restart) may be checked by another, so it is only accepted for a single
+    worker on local storage.
+    """
+    if not UPLOAD_SIGNING_SECRET_GENERATED:
+        return None
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if STORAGE_BACKEND != "local" or workers > 1:
+        return (
+            f"Direct uploads are disabled: UPLOAD_SIGNING_SECRET is not set "
+            f"(STORAGE_BACKEND={STORAGE_BACKEND}, WEB_CONCURRENCY={workers})"
+        )
+    return None
+
+
+def report_upload_signing_secret():
+    """
+    Log at startup whether direct uploads work without UPLOAD_SIGNING_SECRET.
+    """
+    if not UPLOAD_SIGNING_SECRET_GENERATED:
+        return
+    reason = upload_signing_unavailable()
+    if reason:
+        logging.error(f"{reason}; the /uploads endpoints answer 503 until it is configured")
+    else:
+        logging.warning("UPLOAD_SIGNING_SECRET is not set; upload tokens are only valid until this process restarts")
+
+
+def require_upload_signing():
+    reason = upload_signing_unavailable()
+    if reason:
+        raise HTTPException(status_code=503, detail=reason)
+
+
+def sign_value(value: str):
+    return hmac.new(UPLOAD_SIGNING_SECRET.encode(), value.encode(), hashlib.sha256).hexdigest()
+
+
+class LocalStorage:
+    """
+    Filesystem stand-in for the subset of the boto3 S3 client used here. Objects
+    live under LOCAL_STORAGE_DIR and are served by GET /storage/{key}; presigned
+    URLs point at the /storage upload routes of this API and are HMAC-signed.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid object key: {key}")
+        return path
+
+    def _missing(self, operation):
+        return ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, operation)
+
+    def _write(self, key, fileobj):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f"{path}.{uuid.uuid4().hex}.partial"
+        with open(partial, "wb") as target:
+            while True:
+                chunk = fileobj.read(1024 * 1024)
+                if not chunk:
+                    break
+                target.write(chunk)
+        os.replace(partial, path)
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None):
+        self._write(Key, Fileobj)
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        self._write(Key, io.BytesIO(Body) if isinstance(Body, bytes) else Body)
+        return {}
+
+    def get_object(self, Bucket, Key):
+        path = self.path(Key)
+        if not os.path.isfile(path):
+            raise self._missing("GetObject")
+        # Read now rather than hand out an open file that the caller has to close
+        with open(path, "rb") as source:
+            data = source.read()
+        return {"Body": io.BytesIO(data), "ContentLength": len(data)}
+
+    def delete_object(self, Bucket, Key):
+        path = self.path(Key)
+        if os.path.exists(path):
+            os.remove(path)
+        return {}
+
+    def delete_objects(self, Bucket, Delete):
+        if len(Delete["Objects"]) > 1000:
+            raise ClientError({"Error": {"Code": "MalformedXML", "Message": "At most 1000 keys per request"}}, "DeleteObjects")
+        deleted, errors = [], []
+        for obj in Delete["Objects"]:
+            try:
+                self.delete_object(Bucket, obj["Key"])
+                deleted.append({"Key": obj["Key"]})
+            except (ValueError, OSError) as e:
+                errors.append({"Key": obj["Key"], "Code": "InternalError", "Message": str(e)})
+        return {"Errors": errors} if Delete.get("Quiet") else {"Deleted": deleted, "Errors": errors}
+
+    def _keys(self, prefix):
+        # Every stored key under `prefix`
+        for directory, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [name for name in dirnames if directory != self.root or name != ".multipart"]
+            relative = os.path.relpath(directory, self.root)
+            for name in filenames:
+                key = name if relative == "." else f"{relative.replace(os.sep, '/')}/{name}"
+                if key.startswith(prefix) and not name.endswith(".partial"):
+                    yield key
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None, MaxKeys=1000):
+        contents = []
+        for key in sorted(self._keys(Prefix)):
+            if ContinuationToken is not None and key <= ContinuationToken:
+                continue
+            if len(contents) == MaxKeys:
+                return {"Contents": contents, "IsTruncated": True, "NextContinuationToken": contents[-1]["Key"], "KeyCount": len(contents)}
+            stat = os.stat(self.path(key))
+            contents.append({
+                "Key": key,
+                "Size": stat.st_size,
+                "LastModified": datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+            })
+        return {"Contents": contents, "IsTruncated": False, "KeyCount": len(contents)}
+
+    def get_paginator(self, operation_name):
+        if operation_name != "list_objects_v2":
+            raise ValueError(f"Unsupported paginator: {operation_name}")
+        return LocalListPaginator(self)
+
+    def head_object(self, Bucket, Key, ChecksumMode=None):
+        path = self.path(Key)
+        if not os.path.isfile(path):
+            raise self._missing("HeadObject")
+        result = {"ContentLength": os.path.getsize(path), "ContentType": mimetypes.guess_type(Key)[0]}
+        if ChecksumMode == "ENABLED":
+            digest = hashlib.sha256()
+            with open(path, "rb") as source:
+                for chunk in iter(lambda: source.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            result["ChecksumSHA256"] = base64.b64encode(digest.digest()).decode()
+        return result
+
+    def _parts_dir(self, upload_id):
+        if not upload_id.isalnum():
+            raise ValueError("Invalid upload id")
+        return os.path.join(self.root, ".multipart", upload_id)
+
+    def create_multipart_upload(self, Bucket, Key, ContentType=None):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._parts_dir(upload_id))
+        return {"UploadId": upload_id, "Key": Key}
+
+    def write_part(self, upload_id, part_number, fileobj):
+        parts_dir = self._parts_dir(upload_id)
+        if not os.path.isdir(parts_dir):
+            raise self._missing("UploadPart")
+        digest = hashlib.md5()
+        with open(os.path.join(parts_dir, f"{part_number:05d}"), "wb") as target:
+            for chunk in iter(lambda: fileobj.read(1024 * 1024), b""):
+                digest.update(chunk)
+                target.write(chunk)
+        return f'"{digest.hexdigest()}"'
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts_dir = self._parts_dir(UploadId)
+        if not os.path.isdir(parts_dir):
+            raise self._missing("CompleteMultipartUpload")
+        path = self.path(Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as target:
+            for part in sorted(MultipartUpload["Parts"], key=lambda part: part["PartNumber"]):
+                with open(os.path.join(parts_dir, f"{part['PartNumber']:05d}"), "rb") as source:
+                    shutil.copyfileobj(source, target)
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        return {"Key": Key}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        shutil.rmtree(self._parts_dir(UploadId), ignore_errors=True)
+        return {}
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn=3600):
+        query = {"expires": str(int(time.time()) + ExpiresIn)}
+        if ClientMethod == "upload_part":
+            query["upload_id"] = Params["UploadId"]
+            query["part_number"] = str(Params["PartNumber"])
+        if Params.get("ChecksumSHA256"):
+            query["checksum"] = Params["ChecksumSHA256"]
+        query["signature"] = sign_value(local_upload_string(Params["Key"], query))
+        return f"{STORAGE_PUBLIC_URL}/storage/{quote(Params['Key'])}?{urlencode(query)}"
+
+    def generate_presigned_post(self, Bucket, Key, Fields=None, Conditions=None, ExpiresIn=3600):
+        max_size = next(
+            (condition[2] for condition in Conditions or [] if isinstance(condition, list) and condition[0] == "content-length-range"),
+            None,
+        )
+        policy = base64.urlsafe_b64encode(json.dumps(
+            {"key": Key, "expires": int(time.time()) + ExpiresIn, "max_size": max_size}
+        ).encode()).decode()
+        return {"url": f"{STORAGE_PUBLIC_URL}/storage", "fields": {**(Fields or {}), "key": Key, "policy": policy, "signature": sign_value(policy)}}
+
+
+class LocalListPaginator:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def paginate(self, Bucket, Prefix=""):
+        token = None
+        while True:
+            page = self.storage.list_objects_v2(Bucket, Prefix=Prefix, ContinuationToken=token)
+            yield page
+            if not page["IsTruncated"]:
+                return
+            token = page["NextContinuationToken"]
+
+
+def local_upload_string(key, query):
+    # Canonical string signed into local presigned upload URLs
+    return "\n".join([key] + [f"{name}={query[name]}" for name in ("expires", "upload_id", "part_number", "checksum") if name in query])
+
+
+def get_s3_client():
+    """
+    The shared boto3 S3 client, created on first use (importing boto3 and
+    building a client takes a noticeable part of a worker's boot time).
+    """
+    global S3_CLIENT
+    if S3_CLIENT is None:
+        with _s3_client_lock:
+            if S3_CLIENT is None and STORAGE_BACKEND == "local":
+                S3_CLIENT = LocalStorage(LOCAL_STORAGE_DIR)
+            elif S3_CLIENT is None:
+                import boto3
+
+                S3_CLIENT = boto3.client(
+                    "s3",
+                    aws_access_key_id=AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                    region_name=AWS_REGION
+                )
+    return S3_CLIENT
 
 @app.get("/")
 def read_root():
     return {"message": "CORS is enabled!"}
 
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds before a connection is replaced, -1 to disable
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+class PoolMetrics:
+    """
+    Counters for one connection pool, fed by SQLAlchemy pool events plus the
+    checkout wait time measured by the instrumented pool classes below.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.counters = Counter()
+        self.wait_buckets = [0] * (len(POOL_WAIT_BUCKETS) + 1)  # last one is +Inf
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+
+    def attach(self, pool):
+        self.pool = pool
+        pool.metrics = self
+        event.listen(pool, "connect", lambda *args: self.count("connections_opened"))
+        event.listen(pool, "close", lambda *args: self.count("connections_closed"))
+        event.listen(pool, "invalidate", lambda *args: self.count("connections_invalidated"))
+        event.listen(pool, "checkout", lambda *args: self.count("checkouts"))
+        event.listen(pool, "checkin", lambda *args: self.count("checkins"))
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def observe_wait(self, seconds, timed_out=False):
+        with self._lock:
+            index = next((i for i, bound in enumerate(POOL_WAIT_BUCKETS) if seconds <= bound), len(POOL_WAIT_BUCKETS))
+            self.wait_buckets[index] += 1
+            self.wait_sum += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.counters["checkout_timeouts"] += 1
+
+    def snapshot(self):
+        pool = self.pool
+        with self._lock:
+            counters = dict(self.counters)
+            buckets = list(self.wait_buckets)
+            wait_sum, wait_max = self.wait_sum, self.wait_max
+        result = {"pool": pool.__class__.__name__ if pool else None}
+        if isinstance(pool, QueuePool):
+            result.update({
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                # QueuePool reports unused base capacity as negative overflow
+                "overflow_in_use": max(pool.overflow(), 0),
+            })
+        cumulative, histogram = 0, {}
+        for bound, bucket in zip([str(bound) for bound in POOL_WAIT_BUCKETS] + ["+Inf"], buckets):
+            cumulative += bucket
+            histogram[bound] = cumulative
+        result.update({
+            "connections_opened": counters.get("connections_opened", 0),
+            "connections_closed": counters.get("connections_closed", 0),
+            "connections_invalidated": counters.get("connections_invalidated", 0),
+            "checkouts": counters.get("checkouts", 0),
+            "checkins": counters.get("checkins", 0),
+            "checkout_timeouts": counters.get("checkout_timeouts", 0),
+            "checkout_wait_seconds": {
+                "count": cumulative,
+                "sum": round(wait_sum, 6),
+                "max": round(wait_max, 6),
+                "buckets": histogram,
+            },
+        })
+        return result
+
+
+class TimedCheckoutMixin:
+    """
+    Records how long each checkout waited for a connection (pool events only
+    fire once a connection has been handed out).
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except SQLAlchemyTimeoutError:
+            self.metrics.observe_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.observe_wait(time.perf_counter() - started)
+        return connection
+
+
+class InstrumentedQueuePool(TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(url, poolclass):
+    """
+    create_engine pool arguments from the DB_POOL_* settings. In-memory SQLite
+    uses a single shared connection, so only pre-ping applies there.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {"pool_pre_ping": DB_POOL_PRE_PING}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+pool_metrics = {"sync": PoolMetrics("sync")}
+
 # Database Configuration
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL, InstrumentedQueuePool))
+pool_metrics["sync"].attach(engine.pool)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Optional asyncio engine for the hot read endpoints. Needs the asyncpg
+# (PostgreSQL) or aiosqlite (SQLite) driver from requirements-async.txt;
+# writes stay on the sync engine.
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_database_url(url):
+    """
+    DATABASE_URL with its driver swapped for the asyncio one.
+    """
+    parsed = make_url(url)
+    if parsed.get_dialect().is_async:
+        return parsed
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"DB_ASYNC is not supported for {backend} databases")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend])
+
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    async_engine = create_async_engine(
+        async_database_url(DATABASE_URL), **pool_options(DATABASE_URL, InstrumentedAsyncQueuePool)
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    pool_metrics["async"] = PoolMetrics("async")
+    pool_metrics["async"].attach(async_engine.sync_engine.pool)
+
+
+@app.get("/metrics/pool")
+def get_pool_metrics():
+    """
+    Live connection pool state: checked-out connections, overflow in use,
+    checkout wait histogram and connection churn, per engine.
+    """
+    return {name: metrics.snapshot() for name, metrics in pool_metrics.items()}
+
+
+# Seconds between warm-up attempts while the database or storage is unavailable,
+# or the schema is behind the code
+READINESS_RETRY_SECONDS = float(os.getenv("READINESS_RETRY_SECONDS", "2"))
+
+
+class Readiness:
+    """
+    Warm-up state of the resources a worker needs before it takes traffic
+    (a pooled database connection, a schema with every migration applied and
+    the S3 client), plus cold start timings.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.components = {
+            "database": {"ready": False, "error": None, "seconds": None},
+            "schema": {"ready": False, "error": None, "seconds": None},
+            "storage": {"ready": False, "error": None, "seconds": None},
+        }
+        self.ready_seconds = None  # process start -> everything warm
+        self.first_request_seconds = None  # process start -> first request served
+
+    def _warm_database(self):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    def _check_schema(self):
+        with engine.connect() as conn:
+            pending = pending_migrations(conn)
+        if pending:
+            raise RuntimeError(
+                f"Migrations {', '.join(map(str, pending))} are not applied; run `python main.py migrate`"
+            )
+
+    def check(self):
+        """
+        Try every component that is not ready yet once. Returns whether all are ready.
+        """
+        checks = {"database": self._warm_database, "schema": self._check_schema, "storage": get_s3_client}
+        for name, check in checks.items():
+            if self.components[name]["ready"]:
+                continue
+            started = time.monotonic()
+            try:
+                check()
+                with self._lock:
+                    self.components[name] = {"ready": True, "error": None, "seconds": round(time.monotonic() - started, 3)}
+            except Exception as e:
+                print(f"Warm-up of {name} failed: {e}")
+                with self._lock:
+                    self.components[name] = {"ready": False, "error": str(e), "seconds": None}
+        return self.ready
+
+    def warm_up(self):
+        """
+        Warm every component, retrying until all are ready. Runs in a background thread.
+        """
+        while not self.check():
+            time.sleep(READINESS_RETRY_SECONDS)
+        with self._lock:
+            self.ready_seconds = round(time.monotonic() - PROCESS_STARTED, 3)
+        print(f"Worker ready {self.ready_seconds}s after process start")
+
+    @property
+    def ready(self):
+        with self._lock:
+            return all(component["ready"] for component in self.components.values())
+
+    def request_served(self):
+        if self.first_request_seconds is None:
+            with self._lock:
+                if self.first_request_seconds is None:
+                    self.first_request_seconds = round(time.monotonic() - PROCESS_STARTED, 3)
+
+    def report(self):
+        with self._lock:
+            return {
+                "ready": all(component["ready"] for component in self.components.values()),
+                **{name: dict(component) for name, component in self.components.items()},
+                "cold_start": {
+                    "uptime_seconds": round(time.monotonic() - PROCESS_STARTED, 3),
+                    "ready_seconds": self.ready_seconds,
+                    "first_request_seconds": self.first_request_seconds,
+                },
+            }
+
+
+readiness = Readiness()
+PROBE_PATHS = ("/healthz", "/readyz")
+
+
+@app.get("/healthz")
+def healthz():
+    """
+    Liveness probe: the process is up and serving.
+    """
+    return {"status": "ok", "uptime_seconds": round(time.monotonic() - PROCESS_STARTED, 3)}
+
+
+@app.get("/readyz")
+def readyz():
+    """
+    Readiness probe: 200 once the database pool and storage client are warm and
+    every schema migration is applied, 503 before.
+    """
+    report = readiness.report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+
+# Requests over either budget are logged with their route and SQL statistics (0 disables)
+REQUEST_LOG_MAX_STATEMENTS = int(os.getenv("REQUEST_LOG_MAX_STATEMENTS", "0"))
+REQUEST_LOG_MAX_SECONDS = float(os.getenv("REQUEST_LOG_MAX_SECONDS", "0"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+RESPONSE_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus sense (not thread-safe on its own).
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.sum += value
+
+    def render(self, name, labels):
+        lines, cumulative = [], 0
+        for bound, count in zip([str(bound) for bound in self.buckets] + ["+Inf"], self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class RequestStats:
+    """
+    SQL statistics of the request being served, shared through `current_request_stats`.
+    """
+
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+for instrumented_engine in [engine] + ([async_engine.sync_engine] if async_engine is not None else []):
+    event.listen(instrumented_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(instrumented_engine, "after_cursor_execute", after_cursor_execute)
+
+
+class RequestMetrics:
+    """
+    Per-route latency, DB time, SQL statement and response size histograms,
+    rendered in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}  # (method, route) -> histograms
+        self._requests = Counter()  # (method, route, status) -> count
+
+    def record(self, method, route, status, seconds, stats, response_bytes):
+        with self._lock:
+            histograms = self._routes.get((method, route))
+            if histograms is None:
+                histograms = self._routes[(method, route)] = {
+                    "http_request_duration_seconds": Histogram(LATENCY_BUCKETS),
+                    "http_request_db_seconds": Histogram(LATENCY_BUCKETS),
+                    "http_request_sql_statements": Histogram(STATEMENT_BUCKETS),
+                    "http_response_size_bytes": Histogram(RESPONSE_SIZE_BUCKETS),
+                }
+            histograms["http_request_duration_seconds"].observe(seconds)
+            histograms["http_request_db_seconds"].observe(stats.db_seconds)
+            histograms["http_request_sql_statements"].observe(stats.statements)
+            histograms["http_response_size_bytes"].observe(response_bytes)
+            self._requests[(method, route, status)] += 1
+
+    def render(self):
+        help_texts = {
+            "http_request_duration_seconds": "Request latency",
+            "http_request_db_seconds": "Time spent executing SQL per request",
+            "http_request_sql_statements": "SQL statements executed per request",
+            "http_response_size_bytes": "Response body size",
+        }
+        lines = ["# HELP http_requests_total Requests served", "# TYPE http_requests_total counter"]
+        with self._lock:
+            for (method, route, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+            for name, help_text in help_texts.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (method, route), histograms in sorted(self._routes.items()):
+                    lines += histograms[name].render(name, f'method="{method}",route="{route}"')
+
+        pool_gauges = {
+            "db_pool_checked_out": "checked_out",
+            "db_pool_overflow_in_use": "overflow_in_use",
+            "db_pool_connections_opened_total": "connections_opened",
+            "db_pool_connections_closed_total": "connections_closed",
+            "db_pool_checkout_timeouts_total": "checkout_timeouts",
+        }
+        snapshots = {name: metrics.snapshot() for name, metrics in pool_metrics.items()}
+        for metric, key in pool_gauges.items():
+            lines += [f"# TYPE {metric} {'counter' if metric.endswith('_total') else 'gauge'}"]
+            lines += [f'{metric}{{engine="{name}"}} {snapshot[key]}' for name, snapshot in snapshots.items() if key in snapshot]
+        return "\n".join(lines) + "\n"
+
+
+request_metrics = RequestMetrics()
+
+
+class RequestMetricsMiddleware:
+    """
+    Pure ASGI middleware (no response buffering) that times each request,
+    counts its SQL statements and response bytes, and logs it when it goes
+    over REQUEST_LOG_MAX_STATEMENTS / REQUEST_LOG_MAX_SECONDS.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+        response = {"status": 500, "bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request_stats.reset(token)
+            seconds = time.perf_counter() - started
+            if scope["path"] not in PROBE_PATHS:
+                readiness.request_served()
+            # FastAPI records the matched route in the scope; unmatched paths share one label
+            route = getattr(scope.get("route"), "path", "unmatched")
+            request_metrics.record(scope["method"], route, response["status"], seconds, stats, response["bytes"])
+            if (REQUEST_LOG_MAX_STATEMENTS and stats.statements > REQUEST_LOG_MAX_STATEMENTS) or (
+                REQUEST_LOG_MAX_SECONDS and seconds > REQUEST_LOG_MAX_SECONDS
+            ):
+                print(
+                    f"Request over budget: {scope['method']} {scope['path']} (route {route}) "
+                    f"status={response['status']} time={seconds:.3f}s sql={stats.statements} "
+                    f"db_time={stats.db_seconds:.3f}s bytes={response['bytes']}"
+                )
+
+
+app.add_middleware(RequestMetricsMiddleware)
+
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Request and connection pool metrics in the Prometheus text format.
+    """
+    return Response(content=request_metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Database Model
 class Product(Base):
     __tablename__ = "products"
@@ -145,8 +913,53 @@ class ProductResponse(BaseModel):
     class Config:
         from_attributes = True
 
-# Create tables (only needed once)
-Base.metadata.create_all(bind=engine)
+class CatalogVersion(Base):
+    __tablename__ = "catalog_versions"
+
+    name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class MediaJob(Base):
+    __tablename__ = "media_jobs"
+
+    id = Column(String(32), primary_key=True)
+    status = Column(String(20), nullable=False, default="queued")
+    total = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    last_product_id = Column(Integer, nullable=False, default=0)  # checkpoint
+    csv_file = Column(String(255), nullable=True)
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)  # heartbeat, refreshed every batch
+    finished_at = Column(DateTime, nullable=True)
+
+class MediaObject(Base):
+    __tablename__ = "media_objects"
+
+    sha256 = Column(String(64), primary_key=True)  # content hash of the stored file
+    file_key = Column(String(512), nullable=False)
+    url = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)
+    content_type = Column(String(255), nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+class MediaVariant(Base):
+    __tablename__ = "media_variants"
+    __table_args__ = (UniqueConstraint("source_key", "variant", "format"),)
+
+    id = Column(Integer, primary_key=True)
+    source_key = Column(String(64), nullable=False, index=True)  # sha256 of source_url
+    source_url = Column(Text, nullable=False)
+    variant = Column(String(20), nullable=False)  # thumbnail, card or full
+    format = Column(String(10), nullable=False)  # webp or jpeg
+    file_key = Column(String(512), nullable=False)
+    url = Column(Text, nullable=False)
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
 
 # Dependency for DB session
 def get_db():
@@ -156,6 +969,50 @@ def get_db():
     finally:
         db.close()
 
+# Dependency for the read endpoints: an AsyncSession when DB_ASYNC is on,
+# otherwise a regular session that run_read uses from the threadpool
+async def get_read_db():
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+
+async def run_read(db, fn, *args):
+    """
+    Call `fn(session, *args)` with the session from get_read_db without holding
+    a threadpool slot on the async path (AsyncSession.run_sync).
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args)
+
+    def call():
+        try:
+            return fn(db, *args)
+        finally:
+            # Hand the connection back before leaving the worker thread, so a
+            # burst that fills the threadpool cannot starve the pool of returns
+            db.close()
+
+    return await run_in_threadpool(call)
+
+
+def off_loop(fn, *args):
+    """
+    Call `fn(*args)` for CPU-bound index work. Under AsyncSession.run_sync the
+    read functions execute on the event loop thread, so there the call is handed
+    to the threadpool and the loop keeps serving other requests meanwhile.
+    `fn` must not use the database session.
+    """
+    if in_greenlet():
+        return await_only(run_in_threadpool(fn, *args))
+    return fn(*args)
+
 # Pydantic Models for Request/Response
 class ProductBase(BaseModel):
     code: Optional[str]
@@ -182,6 +1039,574 @@ class ProductResponse(ProductBase):
 class ProductUpdate(ProductBase):
     pass
 
+# Every column of the products table, in table order
+PRODUCT_COLUMNS = [
+    "id", "code", "main_cat", "sub_cat", "brand", "model", "housing_size", "function",
+    "range", "output", "voltage", "connection", "material", "images", "pdf",
+]
+
+# Facet name (as returned by the distinct endpoints) -> Product column
+FACET_FIELDS = {
+    "code": "code",
+    "main_categories": "main_cat",
+    "sub_categories": "sub_cat",
+    "brands": "brand",
+    "models": "model",
+    "housing_sizes": "housing_size",
+    "functions": "function",
+    "ranges": "range",
+    "outputs": "output",
+    "voltages": "voltage",
+    "connections": "connection",
+    "materials": "material",
+}
+
+class FacetStore:
+    """
+    In-process cache of the distinct values of every facet column.
+    It is built with a single scan of `products` and then kept up to date by the
+    product write endpoints, so the distinct endpoints are served from memory.
+    Like the other product caches it remembers the `products` catalog version it
+    reflects and is rebuilt when another process has written since.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self._lock = threading.Lock()
+        self._counts = None  # column -> Counter(value -> number of products using it)
+        self._sorted = {}  # column -> cached sorted list of distinct values
+        self._version = None
+        self._writes = 0
+
+    def _scan(self, db):
+        counts = {column: Counter() for column in self.columns}
+        rows = db.execute(
+            select(*[getattr(Product, column) for column in self.columns]).execution_options(yield_per=5000)
+        )
+        for batch in rows.partitions():
+            off_loop(self._count_rows, counts, batch)
+        return counts
+
+    def _count_rows(self, counts, rows):
+        for row in rows:
+            for column, value in zip(self.columns, row):
+                if value is not None:
+                    counts[column][value] += 1
+
+    def _current(self, db):
+        version = get_catalog_version(db)
+        with self._lock:
+            if self._counts is not None and self._version == version:
+                return self._counts
+            writes = self._writes
+        counts = self._scan(db)
+        with self._lock:
+            # A write that landed while we were scanning may or may not be part of
+            # the scan, so only keep the result if nothing was written meanwhile.
+            # Writes committed by other processes during the scan leave the
+            # database ahead of `version`, which triggers another scan next time.
+            if self._writes == writes:
+                self._counts = counts
+                self._sorted = {}
+                self._version = version
+        return counts
+
+    def distinct(self, db, column):
+        return off_loop(self._distinct, self._current(db), column)
+
+    def _distinct(self, counts, column):
+        with self._lock:
+            if counts is self._counts and column in self._sorted:
+                return self._sorted[column]
+            values = sorted(value for value, count in counts[column].items() if count > 0)
+            if counts is self._counts:
+                self._sorted[column] = values
+        return values
+
+    def apply(self, before, after, version):
+        """
+        Record a product write committed as catalog `version`. `before`/`after`
+        are column dicts, None for inserts/deletes.
+        """
+        with self._lock:
+            self._writes += 1
+            if self._counts is None:
+                return
+            if version is None or self._version != version - 1:
+                # Some other write happened in between; rebuild on next use
+                self._counts = None
+                self._sorted = {}
+                return
+            self._version = version
+            for column in self.columns:
+                old = before.get(column) if before else None
+                new = after.get(column) if after else None
+                if old == new:
+                    continue
+                if old is not None:
+                    self._counts[column][old] -= 1
+                    if self._counts[column][old] <= 0:
+                        del self._counts[column][old]
+                if new is not None:
+                    self._counts[column][new] += 1
+                self._sorted.pop(column, None)
+
+    def invalidate(self):
+        with self._lock:
+            self._writes += 1
+            self._counts = None
+            self._sorted = {}
+
+
+facet_store = FacetStore(FACET_FIELDS.values())
+
+
+def bump_catalog_version(db: Session, name: str = "products"):
+    """
+    Increment the shared write counter of `name` inside the caller's transaction
+    and return the new version. Every process can compare it with the version its
+    in-memory indexes were built from.
+    """
+    version = db.execute(
+        update(CatalogVersion)
+        .where(CatalogVersion.name == name)
+        .values(version=CatalogVersion.version + 1)
+        .returning(CatalogVersion.version)
+    ).scalar()
+    if version is None:
+        version = 1
+        db.add(CatalogVersion(name=name, version=version))
+        db.flush()
+    return version
+
+
+def get_catalog_version(db: Session, name: str = "products"):
+    return db.query(CatalogVersion.version).filter(CatalogVersion.name == name).scalar() or 0
+
+
+def get_catalog_versions(db: Session, names):
+    """
+    Versions of several `names` read with one query, in the order given.
+    """
+    versions = dict(db.query(CatalogVersion.name, CatalogVersion.version).filter(CatalogVersion.name.in_(names)))
+    return tuple(versions.get(name, 0) for name in names)
+
+
+# Columns searched by /search-products-extended (same as the facet columns)
+SEARCH_FIELDS = list(FACET_FIELDS.values())
+
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+# Above this many candidates the id list costs more than the scan it saves
+SEARCH_INDEX_MAX_CANDIDATES = int(os.getenv("SEARCH_INDEX_MAX_CANDIDATES", "5000"))
+# Minimum seconds between the starts of two rebuilds, so a burst of writes
+# (e.g. an import bumping the version per chunk) costs one rebuild, not one per write
+SEARCH_INDEX_REBUILD_INTERVAL = float(os.getenv("SEARCH_INDEX_REBUILD_INTERVAL", "5"))
+
+
+class SearchIndex:
+    """
+    In-process trigram index over the extended search columns.
+
+    Each trigram of a lowered column value points to the distinct values that
+    contain it, and each value points to its product ids. A substring filter is
+    resolved to a set of candidate ids without scanning the table; the database
+    still applies the original ILIKE filters to those candidates, so results are
+    identical to an unindexed search. The index remembers the `products` catalog
+    version it reflects. When another process has written since, it is rebuilt
+    by a background thread while searches are answered by the database alone.
+    """
+
+    GRAM = 3
+
+    def __init__(self, columns, max_candidates, rebuild_interval=SEARCH_INDEX_REBUILD_INTERVAL):
+        self.columns = list(columns)
+        self.max_candidates = max_candidates
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._last_rebuild = None  # monotonic start time of the last rebuild
+        self._version = None
+        self._rows = {}  # product id -> tuple of column values
+        self._postings = {}  # column -> value -> set of product ids
+        self._grams = {}  # column -> trigram -> set of values
+        self._unindexed = {}  # column -> non-ASCII values, always kept as candidates
+
+    @classmethod
+    def _ngrams(cls, text):
+        return {text[i:i + cls.GRAM] for i in range(len(text) - cls.GRAM + 1)}
+
+    def _add_value(self, column, value, product_id):
+        postings = self._postings[column]
+        ids = postings.get(value)
+        if ids is None:
+            ids = postings[value] = set()
+            # Case folding of non-ASCII text differs between Python and the
+            # database, so those values are never ruled out by the index.
+            if value.isascii():
+                for gram in self._ngrams(value.lower()):
+                    self._grams[column].setdefault(gram, set()).add(value)
+            else:
+                self._unindexed[column].add(value)
+        ids.add(product_id)
+
+    def _remove_value(self, column, value, product_id):
+        postings = self._postings[column]
+        ids = postings.get(value)
+        if ids is None:
+            return
+        ids.discard(product_id)
+        if ids:
+            return
+        del postings[value]
+        if value.isascii():
+            grams = self._grams[column]
+            for gram in self._ngrams(value.lower()):
+                values = grams.get(gram)
+                if values is not None:
+                    values.discard(value)
+                    if not values:
+                        del grams[gram]
+        else:
+            self._unindexed[column].discard(value)
+
+    def _add_row(self, product_id, values):
+        self._rows[product_id] = values
+        for column, value in zip(self.columns, values):
+            if value is not None:
+                self._add_value(column, value, product_id)
+
+    def _remove_row(self, product_id):
+        values = self._rows.pop(product_id, None)
+        if values is None:
+            return
+        for column, value in zip(self.columns, values):
+            if value is not None:
+                self._remove_value(column, value, product_id)
+
+    def _build(self, db):
+        fresh = SearchIndex(self.columns, self.max_candidates)
+        fresh._postings = {column: {} for column in self.columns}
+        fresh._grams = {column: {} for column in self.columns}
+        fresh._unindexed = {column: set() for column in self.columns}
+        rows = db.query(Product.id, *[getattr(Product, column) for column in self.columns]).yield_per(5000)
+        for row in rows:
+            fresh._add_row(row[0], tuple(row[1:]))
+        return fresh
+
+    def _ensure(self, db, version=None):
+        """
+        Whether the index matches the database and can be used for this request.
+        When it does not, a rebuild is started in the background (at most one at
+        a time, and one per `rebuild_interval`) and the caller uses the database.
+        """
+        if version is None:
+            version = get_catalog_version(db)
+        with self._lock:
+            if self._version == version:
+                return True
+            if self._rebuilding or (
+                self._last_rebuild is not None and time.monotonic() - self._last_rebuild < self.rebuild_interval
+            ):
+                return False
+            self._rebuilding = True
+            self._last_rebuild = time.monotonic()
+        threading.Thread(target=self.rebuild, daemon=True).start()
+        return False
+
+    def rebuild(self):
+        """
+        Scan `products` into a new index and swap it in.
+        """
+        db = SessionLocal()
+        try:
+            # Read the version before scanning: writes committed during the scan
+            # leave the database ahead of it, which triggers another rebuild.
+            version = get_catalog_version(db)
+            fresh = self._build(db)
+            with self._lock:
+                self._rows, self._postings = fresh._rows, fresh._postings
+                self._grams, self._unindexed = fresh._grams, fresh._unindexed
+                self._version = version
+        except Exception as e:
+            print(f"Search index rebuild failed: {e}")
+        finally:
+            db.close()
+            with self._lock:
+                self._rebuilding = False
+
+    def _matching_values(self, column, needle):
+        """
+        Distinct values of `column` that can match ILIKE '%needle%', or None when
+        the index cannot answer (LIKE wildcards or non-ASCII text in the needle).
+        """
+        if not needle.isascii() or any(char in needle for char in "%_\\"):
+            return None
+        needle = needle.lower()
+        if len(needle) < self.GRAM:
+            candidates = self._postings[column].keys()
+        else:
+            grams = self._grams[column]
+            posting_lists = sorted((grams.get(gram, set()) for gram in self._ngrams(needle)), key=len)
+            candidates = posting_lists[0].intersection(*posting_lists[1:])
+        values = {value for value in candidates if value.isascii() and needle in value.lower()}
+        return values | self._unindexed[column]
+
+    def candidates(self, db, criteria, version=None):
+        """
+        Product ids that can satisfy every filter in `criteria` ({column: needle}),
+        or None when the filters should be evaluated by the database alone.
+        """
+        if not SEARCH_INDEX_ENABLED or not criteria or not self._ensure(db, version):
+            return None
+        return off_loop(self._candidates, criteria)
+
+    def _candidates(self, criteria):
+        with self._lock:
+            if self._version is None:
+                return None
+            matches = []
+            for column, needle in criteria.items():
+                values = self._matching_values(column, needle)
+                if values is not None:
+                    postings = self._postings[column]
+                    matches.append((sum(len(postings[value]) for value in values), column, values))
+            if not matches:
+                return None
+            # Start from the most selective filter and check the others per row
+            matches.sort(key=lambda match: match[0])
+            size, column, values = matches[0]
+            if size > self.max_candidates:
+                return None
+            postings = self._postings[column]
+            ids = set().union(*(postings[value] for value in values))
+            for _, column, values in matches[1:]:
+                position = self.columns.index(column)
+                ids = {product_id for product_id in ids if self._rows[product_id][position] in values}
+            return ids
+
+    def _resolve_values(self, db, column, needle):
+        """
+        Exact set of distinct values of `column` matching ILIKE '%needle%'. Cases
+        the index cannot decide on its own are checked by the database.
+        """
+        with self._lock:
+            values = self._matching_values(column, needle)
+            unsure = values & self._unindexed[column] if values is not None else None
+        attribute = getattr(Product, column)
+        condition = func.lower(attribute).ilike(f"%{needle.lower()}%")
+        if values is None:
+            return {value for (value,) in db.query(attribute).filter(condition).distinct()}
+        if unsure:
+            confirmed = {
+                value for (value,) in db.query(attribute).filter(attribute.in_(unsure), condition).distinct()
+            }
+            values = (values - unsure) | confirmed
+        return values
+
+    def facet_counts(self, db, criteria, columns):
+        """
+        For each of `columns`, the values present among the products matching
+        `criteria` and how many products have each. A column's own filter is left
+        out when counting its values, so its alternatives stay visible.
+        Returns (total matching products, {column: {value: count}}), or None
+        while the index is out of date.
+        """
+        if not SEARCH_INDEX_ENABLED or not self._ensure(db):
+            return None
+        matches = {column: self._resolve_values(db, column, needle) for column, needle in criteria.items()}
+
+        with self._lock:
+            # Product ids passing each filter
+            passing = {}
+            for column, values in matches.items():
+                postings = self._postings[column]
+                passing[column] = set().union(*(postings.get(value, set()) for value in values))
+
+            def intersect(excluded=None):
+                sets = sorted((ids for column, ids in passing.items() if column != excluded), key=len)
+                if not sets:
+                    return None  # no filter: every product
+                return sets[0].intersection(*sets[1:])
+
+            matching_all = intersect()
+            total = len(self._rows) if matching_all is None else len(matching_all)
+            counts = {}
+            for column in columns:
+                base = intersect(column) if column in passing else matching_all
+                if base is None:
+                    counts[column] = {value: len(ids) for value, ids in self._postings[column].items()}
+                    continue
+                position = self.columns.index(column)
+                column_counts = Counter(self._rows[product_id][position] for product_id in base)
+                column_counts.pop(None, None)
+                counts[column] = column_counts
+        return total, counts
+
+    def apply(self, before, after, version):
+        """
+        Record a product write committed as catalog `version`.
+        """
+        with self._lock:
+            if self._version is None:
+                return
+            if version is None or self._version != version - 1:
+                # Some other write happened in between; rebuild on next use
+                self._version = None
+                return
+            if before:
+                self._remove_row(before["id"])
+            if after:
+                self._add_row(after["id"], tuple(after[column] for column in self.columns))
+            self._version = version
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+
+search_index = SearchIndex(SEARCH_FIELDS, SEARCH_INDEX_MAX_CANDIDATES)
+
+COUNT_CACHE_SIZE = int(os.getenv("COUNT_CACHE_SIZE", "1024"))
+
+
+class CountCache:
+    """
+    Total match counts of extended searches, keyed by normalized filter signature.
+    Entries belong to one `products` catalog version and are dropped as soon as a
+    newer version is seen, so a cached count never outlives a product write.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._version = None
+        self._counts = OrderedDict()
+
+    @staticmethod
+    def signature(criteria):
+        return tuple(sorted((column, value.lower()) for column, value in criteria.items()))
+
+    def get(self, version, criteria):
+        with self._lock:
+            if self._version != version:
+                return None
+            key = self.signature(criteria)
+            total = self._counts.get(key)
+            if total is not None:
+                self._counts.move_to_end(key)
+            return total
+
+    def put(self, version, criteria, total):
+        with self._lock:
+            if self._version != version:
+                self._version = version
+                self._counts.clear()
+            self._counts[self.signature(criteria)] = total
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+
+
+count_cache = CountCache(COUNT_CACHE_SIZE)
+
+
+def estimate_product_count(db: Session, query, filtered: bool):
+    """
+    Planner estimate of the number of rows `query` returns, or None when the
+    database cannot provide one (only PostgreSQL statistics are used).
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    if not filtered:
+        # Row count maintained by VACUUM/ANALYZE; -1 until the table has been analyzed
+        estimate = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'products'::regclass")
+        ).scalar()
+        return estimate if estimate is not None and estimate >= 0 else None
+    # Compiled with named parameters and bound again through text(), so the
+    # driver (psycopg2 or asyncpg) applies its own paramstyle
+    compiled = query.statement.compile(
+        dialect=postgresql.dialect(paramstyle="named"), compile_kwargs={"render_postcompile": True}
+    )
+    plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"), compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def product_values(product):
+    """
+    Snapshot a Product row as a plain dict of its columns.
+    """
+    return {column: getattr(product, column) for column in PRODUCT_COLUMNS}
+
+
+def product_changed(before, after, version=None):
+    """
+    Keep the in-memory product indexes in sync after a committed write.
+    `version` is the catalog version returned by bump_catalog_version.
+    """
+    facet_store.apply(before, after, version)
+    search_index.apply(before, after, version)
+    catalog_tree.apply(before, after, version)
+
+
+def products_changed_in_bulk():
+    """
+    Drop the in-memory product indexes after a set-based write; they are rebuilt on next use.
+    """
+    facet_store.invalidate()
+    search_index.invalidate()
+    catalog_tree.invalidate()
+
+
+def extended_search_criteria(
+    code: Optional[str] = None,
+    main_cat: Optional[str] = None,
+    sub_cat: Optional[str] = None,
+    brand: Optional[str] = None,
+    model: Optional[str] = None,
+    housing_size: Optional[str] = None,
+    function: Optional[str] = None,
+    range: Optional[str] = None,
+    output: Optional[str] = None,
+    voltage: Optional[str] = None,
+    connection: Optional[str] = None,
+    material: Optional[str] = None,
+):
+    """
+    Collect the extended search filters that were provided as {column: stripped value}.
+    """
+    values = {
+        "code": code,
+        "main_cat": main_cat,
+        "sub_cat": sub_cat,
+        "brand": brand,
+        "model": model,
+        "housing_size": housing_size,
+        "function": function,
+        "range": range,
+        "output": output,
+        "voltage": voltage,
+        "connection": connection,
+        "material": material,
+    }
+    return {column: value.strip() for column, value in values.items() if value}
+
+
+def build_search_filters(db: Session, criteria: dict, version=None):
+    """
+    Case-insensitive substring filters for `criteria`, narrowed to the candidate
+    ids from the search index when it can resolve them.
+    """
+    filters = [
+        func.lower(getattr(Product, column)).ilike(f"%{value.lower()}%")
+        for column, value in criteria.items()
+    ]
+    candidate_ids = search_index.candidates(db, criteria, version)
+    if candidate_ids is not None:
+        filters.append(Product.id.in_(sorted(candidate_ids)))
+    return filters
+
 class Category(Base):
     __tablename__ = "category"
 
@@ -235,60 +1660,344 @@ class SubCategory(Base):
     priority = Column(Integer, nullable=False)
     link = Column(Text, nullable=False)
 
-# API Endpoints
-@app.get("/products", response_model=List[ProductResponse])
-def get_all_products(
-    limit: int = Query(10, description="Number of products per page", ge=1), 
-    offset: int = Query(0, description="Offset for pagination", ge=0),
-    db: Session = Depends(get_db)
-):
+def encode_cursor(last_id: int):
     """
-    Fetch products with pagination.
-    - limit: max number of products to return
-    - offset: skip this many products
+    Opaque keyset pagination cursor pointing after product `last_id`.
     """
-    # Query the database with limit and offset
-    products = db.query(Product).order_by(asc(Product.id)).offset(offset).limit(limit).all()
-    return products
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode().rstrip("=")
 
-@app.get("/products/{product_id}", response_model=ProductResponse)
-def get_product_by_id(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
 
-@app.get("/products/code/{code}", response_model=List[ProductResponse])
-def get_products_by_code(code: str, db: Session = Depends(get_db)):
-    products = db.query(Product).filter(Product.code == code).all()
-    if not products:
-        raise HTTPException(status_code=404, detail="No products found with this code")
-    return products
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))["id"]
+        if not isinstance(last_id, int):
+            raise ValueError(last_id)
+        return last_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-@app.delete("/products/{product_id}")
-def delete_product_by_id(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    db.delete(product)
-    db.commit()
-    return {"detail": "Product deleted successfully"}
 
-@app.put("/products/{product_id}", response_model=ProductResponse)
-def update_product_by_id(product_id: int, product_update: ProductUpdate, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    for key, value in product_update.dict(exclude_unset=True).items():
-        setattr(product, key, value)
-    db.commit()
-    db.refresh(product)
-    return product
+try:
+    import orjson
+except ImportError:  # the standard library encoder is used instead
+    orjson = None
 
 
-# Pydantic Model for Add Product
-class ProductCreate(BaseModel):
-    code: Optional[str]
+class FastJSONResponse(Response):
+    """
+    JSON response encoded in a single pass (with orjson when installed) from
+    plain dicts and lists, for read paths that skip ORM objects and
+    response_model validation.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content):
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def product_fields(
+    fields: Optional[str] = Query(
+        None, description="Comma-separated product columns to return (id is always included), e.g. code,brand,model"
+    ),
+):
+    """
+    Parse a `fields=` sparse fieldset into Product column names (in table order),
+    or None when the full ProductResponse is wanted.
+    """
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = sorted(requested - set(PRODUCT_COLUMNS))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Available fields: {', '.join(PRODUCT_COLUMNS)}",
+        )
+    return [column for column in PRODUCT_COLUMNS if column == "id" or column in requested]
+
+
+def project_products(query, fields):
+    """
+    Narrow a Product query to the `fields` columns (all of them when None);
+    rows then come back as plain tuples instead of ORM objects.
+    """
+    return query.with_entities(*[getattr(Product, column) for column in fields or PRODUCT_COLUMNS])
+
+
+def product_dicts(rows, fields):
+    # zip stops at the projected columns, so extra trailing columns (e.g. a window count) are ignored
+    return [dict(zip(fields or PRODUCT_COLUMNS, row)) for row in rows]
+
+
+def image_variant(
+    size: Optional[str] = Query(
+        None, description="Return product images as this variant: thumbnail, card or full (default: the original)"
+    ),
+    image_format: str = Query("webp", description="Format of the image variant: webp or jpeg"),
+):
+    """
+    Parse the `size` / `image_format` parameters into a (variant, format) pair,
+    or None when the original images are wanted.
+    """
+    if size is None or size == "original":
+        return None
+    if size not in IMAGE_VARIANTS:
+        raise HTTPException(status_code=400, detail=f"Unknown size: {size}. Available sizes: original, {', '.join(IMAGE_VARIANTS)}")
+    if image_format not in IMAGE_VARIANT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown image format: {image_format}")
+    return size, image_format
+
+
+def with_image_variants(db, products, variant):
+    """
+    Point the `images` of product dicts at the requested variant. Images
+    without that variant (not generated yet, or not images) keep the original URL.
+    """
+    if variant is None:
+        return products
+    urls = image_variants.urls(db, {product["images"] for product in products if product.get("images")}, *variant)
+    for product in products:
+        if product.get("images") in urls:
+            product["images"] = urls[product["images"]]
+    return products
+
+
+def product_list_response(products, response: Optional[Response] = None):
+    """
+    Send product dicts as they are. They already have the ProductResponse shape
+    (or the requested sparse fieldset), so validating them again through
+    response_model would only cost time.
+    """
+    headers = {}
+    if response is not None and "X-Next-Cursor" in response.headers:
+        headers["X-Next-Cursor"] = response.headers["X-Next-Cursor"]
+    return FastJSONResponse(content=products, headers=headers)
+
+
+def paginate_products(
+    query,
+    response: Response,
+    limit: int,
+    offset: int,
+    after_id: Optional[int],
+    cursor: Optional[str],
+    fields: Optional[List[str]] = None,
+):
+    """
+    Page a product query ordered by id. With `after_id` or `cursor` the page starts
+    right after that id (keyset pagination, constant cost per page) and `offset` is
+    ignored; otherwise classic offset pagination is used. When the page is full the
+    cursor of the next page is returned in the X-Next-Cursor header. The page is a
+    list of dicts of the `fields` columns (all columns when None).
+    """
+    if cursor is not None:
+        after_id = decode_cursor(cursor)
+    query = query.order_by(asc(Product.id))
+    if after_id is not None:
+        query = query.filter(Product.id > after_id)
+    else:
+        query = query.offset(offset)
+    products = product_dicts(project_products(query, fields).limit(limit).all(), fields)
+    if len(products) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(products[-1]["id"])
+    return products
+
+
+# API Endpoints
+@app.get("/products", response_model=List[ProductResponse])
+async def get_all_products(
+    response: Response,
+    limit: int = Query(10, description="Number of products per page", ge=1), 
+    offset: int = Query(0, description="Offset for pagination", ge=0),
+    after_id: Optional[int] = Query(None, description="Return products with an id greater than this (keyset pagination)"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    fields: Optional[List[str]] = Depends(product_fields),
+    variant=Depends(image_variant),
+    db=Depends(get_read_db)
+):
+    """
+    Fetch products with pagination.
+    - limit: max number of products to return
+    - offset: skip this many products
+    - after_id / cursor: continue after the given product instead of using offset
+    - fields: only return these columns
+    - size: return this image variant instead of the original image
+    """
+    products = await run_read(
+        db,
+        lambda session: with_image_variants(
+            session,
+            paginate_products(session.query(Product), response, limit, offset, after_id, cursor, fields),
+            variant,
+        ),
+    )
+    return product_list_response(products, response)
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))  # rows fetched per round trip
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def iter_export_batches(criteria: dict):
+    """
+    Yield the matching products as lists of row tuples (PRODUCT_COLUMNS order),
+    read through a server-side cursor so memory stays flat.
+    """
+    db = SessionLocal()
+    try:
+        statement = select(*[getattr(Product, column) for column in PRODUCT_COLUMNS]).order_by(asc(Product.id))
+        filters = build_search_filters(db, criteria)
+        if filters:
+            statement = statement.where(and_(*filters))
+        result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for batch in result.partitions():
+            yield [tuple(row) for row in batch]
+    finally:
+        db.close()
+
+
+def iter_file(path, chunk_size=1024 * 1024):
+    """
+    Stream a temporary file and delete it afterwards.
+    """
+    try:
+        with open(path, "rb") as file:
+            while True:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def export_csv(criteria):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(PRODUCT_COLUMNS)
+    for batch in iter_export_batches(criteria):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_ndjson(criteria):
+    for batch in iter_export_batches(criteria):
+        yield "".join(json.dumps(dict(zip(PRODUCT_COLUMNS, row))) + "\n" for row in batch)
+
+
+def export_xlsx(criteria):
+    import openpyxl
+
+    # Write-only workbooks keep rows on disk, not in memory
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("products")
+    sheet.append(PRODUCT_COLUMNS)
+    for batch in iter_export_batches(criteria):
+        for row in batch:
+            sheet.append(row)
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    workbook.save(path)
+    yield from iter_file(path)
+
+
+def export_parquet(criteria):
+    import pyarrow
+    import pyarrow.parquet
+
+    schema = pyarrow.schema(
+        [("id", pyarrow.int64())] + [(column, pyarrow.string()) for column in PRODUCT_COLUMNS[1:]]
+    )
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+    # One row group per batch keeps memory bounded by EXPORT_BATCH_SIZE
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for batch in iter_export_batches(criteria):
+            columns = list(zip(*batch))
+            writer.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            ))
+    yield from iter_file(path)
+
+
+@app.get("/products/export")
+def export_products(
+    criteria: dict = Depends(extended_search_criteria),
+    format: str = Query("csv", description="csv, ndjson, xlsx or parquet", pattern="^(csv|ndjson|xlsx|parquet)$"),
+):
+    """
+    Stream the catalog, or the products matching the /search-products-extended
+    filters, as a file download.
+    """
+    if format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Parquet export requires the pyarrow package")
+    exporters = {"csv": export_csv, "ndjson": export_ndjson, "xlsx": export_xlsx, "parquet": export_parquet}
+    return StreamingResponse(
+        exporters[format](criteria),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
+    )
+
+
+@app.get("/products/{product_id}", response_model=ProductResponse)
+def get_product_by_id(product_id: int, variant=Depends(image_variant), db: Session = Depends(get_db)):
+    product = db.query(Product).filter(Product.id == product_id).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return with_image_variants(db, [product_values(product)], variant)[0]
+
+@app.get("/products/code/{code}", response_model=List[ProductResponse])
+def get_products_by_code(code: str, variant=Depends(image_variant), db: Session = Depends(get_db)):
+    products = db.query(Product).filter(Product.code == code).all()
+    if not products:
+        raise HTTPException(status_code=404, detail="No products found with this code")
+    return with_image_variants(db, [product_values(product) for product in products], variant)
+
+@app.delete("/products/{product_id}")
+def delete_product_by_id(product_id: int, db: Session = Depends(get_db)):
+    product = db.query(Product).filter(Product.id == product_id).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    before = product_values(product)
+    db.delete(product)
+    version = bump_catalog_version(db)
+    db.commit()
+    product_changed(before, None, version)
+    return {"detail": "Product deleted successfully"}
+
+@app.put("/products/{product_id}", response_model=ProductResponse)
+def update_product_by_id(product_id: int, product_update: ProductUpdate, db: Session = Depends(get_db)):
+    product = db.query(Product).filter(Product.id == product_id).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    before = product_values(product)
+    for key, value in product_update.dict(exclude_unset=True).items():
+        setattr(product, key, value)
+    version = bump_catalog_version(db)
+    db.commit()
+    db.refresh(product)
+    product_changed(before, product_values(product), version)
+    return product
+
+
+# Pydantic Model for Add Product
+class ProductCreate(BaseModel):
+    code: Optional[str]
     main_cat: Optional[str]
     sub_cat: Optional[str]
     brand: Optional[str]
@@ -326,50 +2035,236 @@ def add_product(product: ProductCreate, db: Session = Depends(get_db)):
 
     # Add and commit to the database
     db.add(new_product)
+    version = bump_catalog_version(db)
     db.commit()
     db.refresh(new_product)  # Retrieve the new row
+    product_changed(None, product_values(new_product), version)
 
     return {"message": "Product added successfully", "id": new_product.id}
 
 
-@app.get("/distinct-categories", response_model=dict)
-def get_distinct_categories(db: Session = Depends(get_db)):
+PRODUCT_IMPORT_CHUNK_SIZE = int(os.getenv("PRODUCT_IMPORT_CHUNK_SIZE", "1000"))
+PRODUCT_IMPORT_MAX_ERRORS = int(os.getenv("PRODUCT_IMPORT_MAX_ERRORS", "1000"))  # rows listed in the report
+PRODUCT_FIELDS = PRODUCT_COLUMNS[1:]  # every column except id
+
+
+def iter_import_rows(file, filename):
     """
-    Fetch distinct values for main_cat, sub_cat, and brand.
+    Stream (row number, {header: value}) pairs from an uploaded CSV or XLSX file.
+    Headers are normalized to column names ("Housing Size" -> "housing_size").
     """
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".csv":
+        reader = csv.reader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+    elif extension in (".xlsx", ".xlsm"):
+        import openpyxl
+
+        # Read-only mode streams rows instead of loading the whole sheet
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        reader = workbook.active.iter_rows(values_only=True)
+    else:
+        raise HTTPException(status_code=400, detail="Unsupported file type, upload a .csv or .xlsx file")
+
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [str(name or "").strip().lower().replace(" ", "_") for name in header]
+    for row_number, values in enumerate(reader, start=2):
+        if not any(value not in (None, "") for value in values):
+            continue  # blank line
+        yield row_number, dict(zip(header, values))
+
+
+def import_cell(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # spreadsheet numbers: 24.0 -> "24"
+    value = str(value).strip()
+    return value or None
+
+
+def import_product_chunk(db: Session, rows, columns):
+    """
+    Upsert one chunk of validated rows by product code with set-based statements.
+    Rows without a code are always inserted; `columns` are the ones present in
+    the file, and only those are overwritten on existing products.
+    Returns (inserted, updated).
+    """
+    by_code = {}
+    inserts = []
+    for row in rows:
+        if row["code"]:
+            by_code[row["code"]] = row  # a later row for the same code wins
+        else:
+            inserts.append(row)
+    existing = set()
+    if by_code:
+        existing = {code for (code,) in db.query(Product.code).filter(Product.code.in_(list(by_code))).distinct()}
+    inserts.extend(row for code, row in by_code.items() if code not in existing)
+    updates = [row for code, row in by_code.items() if code in existing]
+
+    if inserts:
+        # Batched multi-row INSERT
+        db.execute(insert(Product.__table__), inserts)
+    update_columns = [column for column in columns if column != "code"]
+    if updates and update_columns:
+        table = Product.__table__
+        db.execute(
+            update(table)
+            .where(table.c.code == bindparam("match_code"))
+            .values({column: bindparam(f"new_{column}") for column in update_columns}),
+            [
+                {"match_code": row["code"], **{f"new_{column}": row[column] for column in update_columns}}
+                for row in updates
+            ],
+        )
+    return len(inserts), len(updates)
+
+
+@app.post("/products/import")
+def import_products(
+    file: UploadFile = File(...),
+    chunk_size: int = Query(PRODUCT_IMPORT_CHUNK_SIZE, description="Rows validated and written per transaction", ge=1),
+    db: Session = Depends(get_db),
+):
+    """
+    Bulk import products from a CSV or XLSX file, upserting by product code.
+    Rows are validated against ProductCreate and written in chunks, one
+    transaction per chunk; invalid rows are skipped and listed in the report.
+
+    Chunks are committed as they go, so when the import stops early (a file
+    that cannot be read past some row: 422, a database failure: 500) the
+    error detail is the report of what was written, with `aborted_at_row`.
+    """
+    inserted = updated = failed = 0
+    errors = []
+
+    def abort(status_code, message, row_number):
+        raise HTTPException(status_code=status_code, detail={
+            "message": message,
+            "aborted_at_row": row_number,
+            "inserted": inserted,
+            "updated": updated,
+            "failed": failed,
+            "errors": errors,
+        })
+
+    def report_error(row_number, row_errors):
+        nonlocal failed
+        failed += 1
+        if len(errors) < PRODUCT_IMPORT_MAX_ERRORS:
+            errors.append({"row": row_number, "errors": row_errors})
+
+    def flush(chunk, columns):
+        nonlocal inserted, updated
+        if not chunk:
+            return
+        try:
+            chunk_inserted, chunk_updated = import_product_chunk(db, [row for _, row in chunk], columns)
+            bump_catalog_version(db)
+            db.commit()
+            inserted += chunk_inserted
+            updated += chunk_updated
+        except (IntegrityError, DataError) as e:
+            # Rejected by the database because of the data: report the chunk's rows
+            db.rollback()
+            for row_number, _ in chunk:
+                report_error(row_number, [f"Database error: {e.__class__.__name__}: {e.orig if hasattr(e, 'orig') else e}"])
+        except SQLAlchemyError:
+            db.rollback()
+            raise
+        finally:
+            products_changed_in_bulk()
+
+    rows = iter_import_rows(file.file, file.filename)
+    chunk = []
+    columns = None
+    last_row = 1  # the header
     try:
-        # Query distinct values
-        distinct_main_cat = db.query(Product.main_cat).distinct().all()
-        distinct_sub_cat = db.query(Product.sub_cat).distinct().all()
-        distinct_brand = db.query(Product.brand).distinct().all()
+        while True:
+            try:
+                item = next(rows, None)
+            except HTTPException:
+                raise
+            except Exception as e:
+                # Only reading the file is guarded here: the rows before it are kept
+                flush(chunk, columns)
+                chunk = []
+                abort(422, f"Could not read the file after row {last_row}: {e}", last_row + 1)
+            if item is None:
+                break
+            row_number, raw = item
+            last_row = row_number
+            if columns is None:
+                columns = [column for column in PRODUCT_FIELDS if column in raw]
+                if "code" not in columns:
+                    raise HTTPException(status_code=400, detail="The file needs a 'code' column")
+            try:
+                product = ProductCreate(**{column: import_cell(raw.get(column)) for column in PRODUCT_FIELDS})
+            except ValidationError as e:
+                report_error(row_number, [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()])
+                continue
+            values = product.model_dump()
+            too_long = [column for column, value in values.items() if value is not None and len(value) > 255]
+            if too_long:
+                report_error(row_number, [f"{column}: longer than 255 characters" for column in too_long])
+                continue
+            chunk.append((row_number, values))
+            if len(chunk) >= chunk_size:
+                flush(chunk, columns)
+                chunk = []
+        flush(chunk, columns)
+    except SQLAlchemyError as e:
+        abort(500, f"Database error: {e}", chunk[0][0] if chunk else last_row + 1)
+
+    return {
+        "message": "Products imported",
+        "inserted": inserted,
+        "updated": updated,
+        "failed": failed,
+        "errors": errors,
+    }
+
+
+def read_distinct_categories(db: Session):
+    # Served from the in-memory facet store
+    return {
+        name: facet_store.distinct(db, FACET_FIELDS[name])
+        for name in ("main_categories", "sub_categories", "brands")
+    }
 
-        # Convert tuples to a flat list
-        main_cat_list = sorted([item[0] for item in distinct_main_cat if item[0] is not None])
-        sub_cat_list = sorted([item[0] for item in distinct_sub_cat if item[0] is not None])
-        brand_list = sorted([item[0] for item in distinct_brand if item[0] is not None])
 
-        return {
-            "main_categories": main_cat_list,
-            "sub_categories": sub_cat_list,
-            "brands": brand_list,
-        }
+@app.get("/distinct-categories", response_model=dict)
+async def get_distinct_categories(db=Depends(get_read_db)):
+    """
+    Fetch distinct values for main_cat, sub_cat, and brand.
+    """
+    try:
+        return FastJSONResponse(await run_read(db, read_distinct_categories))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 
 @app.get("/search-products", response_model=List[ProductResponse])
 def search_products(
+    response: Response,
     brand: Optional[str] = None,
     sub_cat: Optional[str] = None,
     main_cat: Optional[str] = None,
     limit: int = Query(10, description="Number of products per page", ge=1),
     offset: int = Query(0, description="Number of products to skip for pagination", ge=0),
+    after_id: Optional[int] = Query(None, description="Return products with an id greater than this (keyset pagination)"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    fields: Optional[List[str]] = Depends(product_fields),
+    variant=Depends(image_variant),
     db: Session = Depends(get_db),
 ):
     """
     Search products based on optional filters: brand, sub_cat, and main_cat.
     If a filter is not provided, it will be ignored in the query.
-    Pagination is implemented using limit and offset.
+    Pagination is implemented using limit and offset, or keyset pagination
+    with after_id / cursor. `fields` limits the returned columns.
     """
     try:
         query = db.query(Product)
@@ -383,9 +2278,10 @@ def search_products(
             query = query.filter(Product.main_cat == main_cat)
 
         # Apply sorting and pagination
-        products = query.order_by(asc(Product.id)).offset(offset).limit(limit).all()
-
-        return products
+        products = paginate_products(query, response, limit, offset, after_id, cursor, fields)
+        return product_list_response(with_image_variants(db, products, variant), response)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
@@ -393,110 +2289,1063 @@ def search_products(
 @app.get("/search-by-model", response_model=List[ProductResponse])
 def search_by_model(
     model: str,
+    fields: Optional[List[str]] = Depends(product_fields),
+    variant=Depends(image_variant),
     db: Session = Depends(get_db),
 ):
     """
-    Search for a product by its model and return the first matching result.
+    Search for a product by its model and return the first matching result.
+    """
+    try:
+        # Query the database for the first product matching the model
+        query = db.query(Product).filter(Product.model.ilike(f"%{model}%"))
+        product = product_dicts(project_products(query, fields).all(), fields)
+
+        # Handle the case where no product is found
+        if not product:
+            raise HTTPException(status_code=404, detail="Product with the specified model not found")
+
+        return product_list_response(with_image_variants(db, product, variant))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
+@app.post("/upload-product-image")
+async def upload_image(file: UploadFile = File(...)):
+    try:
+        # Stored under its content hash; a file uploaded before is not sent again
+        _, file_extension = os.path.splitext(file.filename or "")
+        file_url = await run_in_threadpool(
+            store_media, file.file, "product_images", file_extension, file.content_type
+        )
+
+        return {"message": "Image uploaded successfully", "url": file_url}
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to upload image: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
+
+
+@app.delete("/delete-image")
+async def delete_image(file_url: str = Query(...)):
+    try:
+        # Extract the file key (path after the bucket name) from the URL
+        file_key = storage_key_from_url(file_url)
+
+        # Delete the file from S3
+        get_s3_client().delete_object(Bucket=AWS_BUCKET_NAME, Key=file_key)
+        media_index.forget([file_key])
+        return {"message": f"Image '{file_key}' deleted successfully"}
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to delete image: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
+
+
+UPLOAD_URL_EXPIRES = int(os.getenv("UPLOAD_URL_EXPIRES", "900"))  # seconds a presigned URL stays valid
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(1024 * 1024 * 1024)))
+UPLOAD_MULTIPART_THRESHOLD = int(os.getenv("UPLOAD_MULTIPART_THRESHOLD", str(64 * 1024 * 1024)))  # larger files upload in parts
+UPLOAD_PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE", str(16 * 1024 * 1024)))  # S3 needs at least 5 MB per part
+UPLOAD_FOLDERS = {"product_images", "images", "pdfs"}
+
+
+class UploadRequest(BaseModel):
+    filename: str
+    content_type: Optional[str] = None
+    size: int
+    folder: str = "product_images"
+    sha256: Optional[str] = None  # hex digest computed by the client, enables dedupe and an integrity check
+    mode: str = "auto"  # auto, put, post or multipart
+
+
+class UploadPart(BaseModel):
+    part_number: int
+    etag: str
+
+
+class UploadComplete(BaseModel):
+    upload_token: str
+    parts: List[UploadPart] = []
+
+
+def encode_upload_token(claims):
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode()
+    return f"{payload}.{sign_value(payload)}"
+
+
+def decode_upload_token(token):
+    """
+    Claims of a token issued by /uploads. The token carries the whole upload
+    state, so completion works on any worker without a server-side session.
+    """
+    payload, _, signature = token.partition(".")
+    if not hmac.compare_digest(sign_value(payload), signature):
+        raise HTTPException(status_code=400, detail="Invalid upload token")
+    claims = json.loads(base64.urlsafe_b64decode(payload))
+    if claims["expires"] < time.time():
+        raise HTTPException(status_code=400, detail="Upload token expired")
+    return claims
+
+
+@app.post("/uploads", dependencies=[Depends(require_upload_signing)])
+def create_upload(upload: UploadRequest):
+    """
+    Presigned URLs for uploading a file straight to storage.
+
+    Files up to UPLOAD_MULTIPART_THRESHOLD get a single PUT (or a form POST with
+    mode=post), larger ones a multipart upload with one URL per part. When the
+    client sends the SHA-256 of the file, an already stored copy is returned
+    without any upload, and a PUT is stored under the hash with the checksum
+    enforced by storage. Finish with /uploads/complete.
+    """
+    if upload.folder not in UPLOAD_FOLDERS:
+        raise HTTPException(status_code=400, detail=f"Unknown folder: {upload.folder}")
+    if not 0 < upload.size <= UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=400, detail=f"File size must be between 1 and {UPLOAD_MAX_BYTES} bytes")
+    sha256 = upload.sha256.lower() if upload.sha256 else None
+    if sha256 is not None and (len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256)):
+        raise HTTPException(status_code=400, detail="sha256 must be a hex digest")
+    mode = upload.mode
+    if mode == "auto":
+        mode = "multipart" if upload.size > UPLOAD_MULTIPART_THRESHOLD else "put"
+    if mode not in ("put", "post", "multipart"):
+        raise HTTPException(status_code=400, detail=f"Unknown upload mode: {upload.mode}")
+
+    try:
+        if sha256 is not None:
+            existing_url = media_index.lookup(sha256)
+            if existing_url is not None:
+                return {"status": "exists", "url": existing_url}
+
+        content_type = upload.content_type or mimetypes.guess_type(upload.filename)[0] or "application/octet-stream"
+        file_extension = media_extension(upload.filename, content_type)
+        # Only a checksummed PUT proves the content, so only that may take the content-addressed key
+        name = sha256 if sha256 is not None and mode == "put" else uuid.uuid4().hex
+        file_key = f"{upload.folder}/{name}{file_extension}"
+        claims = {
+            "key": file_key,
+            "size": upload.size,
+            "content_type": content_type,
+            "sha256": sha256,
+            "mode": mode,
+            "expires": int(time.time()) + UPLOAD_URL_EXPIRES * 4,
+        }
+        s3_client = get_s3_client()
+        result = {"status": "upload", "mode": mode, "key": file_key}
+
+        if mode == "put":
+            params = {"Bucket": AWS_BUCKET_NAME, "Key": file_key, "ContentType": content_type}
+            headers = {"Content-Type": content_type}
+            if sha256 is not None:
+                checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+                params["ChecksumSHA256"] = checksum
+                headers["x-amz-checksum-sha256"] = checksum
+            result["method"] = "PUT"
+            result["url"] = s3_client.generate_presigned_url("put_object", Params=params, ExpiresIn=UPLOAD_URL_EXPIRES)
+            result["headers"] = headers
+        elif mode == "post":
+            presigned = s3_client.generate_presigned_post(
+                AWS_BUCKET_NAME, file_key,
+                Fields={"Content-Type": content_type},
+                Conditions=[{"Content-Type": content_type}, ["content-length-range", 1, upload.size]],
+                ExpiresIn=UPLOAD_URL_EXPIRES,
+            )
+            result["method"] = "POST"
+            result["url"] = presigned["url"]
+            result["fields"] = presigned["fields"]
+        else:
+            # S3 allows at most 10000 parts
+            part_size = max(UPLOAD_PART_SIZE, -(-upload.size // 10000))
+            upload_id = s3_client.create_multipart_upload(
+                Bucket=AWS_BUCKET_NAME, Key=file_key, ContentType=content_type
+            )["UploadId"]
+            claims["upload_id"] = upload_id
+            result["part_size"] = part_size
+            result["parts"] = [
+                {
+                    "part_number": part_number,
+                    "url": s3_client.generate_presigned_url(
+                        "upload_part",
+                        Params={"Bucket": AWS_BUCKET_NAME, "Key": file_key, "UploadId": upload_id, "PartNumber": part_number},
+                        ExpiresIn=UPLOAD_URL_EXPIRES,
+                    ),
+                }
+                for part_number in range(1, -(-upload.size // part_size) + 1)
+            ]
+
+        result["upload_token"] = encode_upload_token(claims)
+        return result
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to prepare upload: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
+
+
+@app.post("/uploads/complete", dependencies=[Depends(require_upload_signing)])
+def complete_upload(body: UploadComplete):
+    """
+    Register a finished direct upload and return its URL.
+
+    Multipart uploads are assembled here. The stored object must have the
+    announced size; content uploaded with a checksum is added to the media index
+    so later uploads of the same file are deduplicated.
+    """
+    claims = decode_upload_token(body.upload_token)
+    file_key = claims["key"]
+    try:
+        s3_client = get_s3_client()
+        if claims.get("upload_id"):
+            if not body.parts:
+                raise HTTPException(status_code=400, detail="parts are required to complete a multipart upload")
+            s3_client.complete_multipart_upload(
+                Bucket=AWS_BUCKET_NAME, Key=file_key, UploadId=claims["upload_id"],
+                MultipartUpload={"Parts": [
+                    {"PartNumber": part.part_number, "ETag": part.etag}
+                    for part in sorted(body.parts, key=lambda part: part.part_number)
+                ]},
+            )
+
+        try:
+            head = s3_client.head_object(Bucket=AWS_BUCKET_NAME, Key=file_key, ChecksumMode="ENABLED")
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                raise HTTPException(status_code=400, detail="The file has not been uploaded")
+            raise
+        if head["ContentLength"] != claims["size"]:
+            s3_client.delete_object(Bucket=AWS_BUCKET_NAME, Key=file_key)
+            raise HTTPException(status_code=400, detail="Uploaded file does not match the announced size")
+
+        url = s3_object_url(file_key)
+        sha256 = claims.get("sha256")
+        verified = bool(
+            sha256 and head.get("ChecksumSHA256")
+            and base64.b64decode(head["ChecksumSHA256"]).hex() == sha256
+        )
+        if verified:
+            media_index.record(sha256, file_key, url, claims["size"], claims["content_type"])
+        if image_variants.wanted(claims["content_type"], claims["size"]):
+            image_variants.schedule(url, file_key)
+        return {"message": "File uploaded successfully", "url": url, "key": file_key, "size": claims["size"], "verified": verified}
+    except HTTPException:
+        raise
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to complete upload: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
+
+
+@app.post("/uploads/abort", dependencies=[Depends(require_upload_signing)])
+def abort_upload(body: UploadComplete):
+    """
+    Discard the parts of an unfinished multipart upload.
+    """
+    claims = decode_upload_token(body.upload_token)
+    if not claims.get("upload_id"):
+        return {"message": "Nothing to abort"}
+    try:
+        get_s3_client().abort_multipart_upload(Bucket=AWS_BUCKET_NAME, Key=claims["key"], UploadId=claims["upload_id"])
+        return {"message": "Upload aborted"}
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to abort upload: {e}")
+
+
+def local_storage():
+    if STORAGE_BACKEND != "local":
+        raise HTTPException(status_code=404, detail="Not Found")
+    return get_s3_client()
+
+
+async def receive_upload(request: Request, spool, max_size):
+    # Spool the request body, returning its SHA-256 and MD5 (the ETag S3 reports)
+    sha256, md5 = hashlib.sha256(), hashlib.md5()
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_size:
+            raise HTTPException(status_code=413, detail="File too large")
+        sha256.update(chunk)
+        md5.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return sha256, md5
+
+
+@app.get("/storage/{file_key:path}")
+def read_local_object(file_key: str):
+    """
+    Serve an object of the local storage backend.
+    """
+    storage = local_storage()
+    try:
+        path = storage.path(file_key)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return FileResponse(path, media_type=mimetypes.guess_type(path)[0])
+
+
+@app.put("/storage/{file_key:path}")
+async def write_local_object(file_key: str, request: Request):
+    """
+    Target of the presigned PUT and part URLs issued by the local storage backend.
+    """
+    storage = local_storage()
+    query = dict(request.query_params)
+    checksum = query.get("checksum") or request.headers.get("x-amz-checksum-sha256")
+    if not hmac.compare_digest(sign_value(local_upload_string(file_key, query)), query.get("signature", "")):
+        raise HTTPException(status_code=403, detail="Invalid signature")
+    if int(query["expires"]) < time.time():
+        raise HTTPException(status_code=403, detail="Request has expired")
+
+    with tempfile.SpooledTemporaryFile(max_size=MEDIA_SPOOL_MAX_MEMORY) as spool:
+        sha256, md5 = await receive_upload(request, spool, UPLOAD_MAX_BYTES)
+        if checksum and base64.b64encode(sha256.digest()).decode() != checksum:
+            raise HTTPException(status_code=400, detail="BadDigest: the checksum does not match the uploaded content")
+        try:
+            if "upload_id" in query:
+                etag = await run_in_threadpool(storage.write_part, query["upload_id"], int(query["part_number"]), spool)
+            else:
+                await run_in_threadpool(storage.upload_fileobj, spool, AWS_BUCKET_NAME, file_key)
+                etag = f'"{md5.hexdigest()}"'
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ClientError:
+            raise HTTPException(status_code=404, detail="NoSuchUpload")
+    return Response(status_code=200, headers={"ETag": etag})
+
+
+@app.post("/storage")
+async def post_local_object(
+    key: str = Form(...),
+    policy: str = Form(...),
+    signature: str = Form(...),
+    file: UploadFile = File(...),
+):
+    """
+    Target of the presigned form POSTs issued by the local storage backend.
+    """
+    storage = local_storage()
+    if not hmac.compare_digest(sign_value(policy), signature):
+        raise HTTPException(status_code=403, detail="Invalid signature")
+    conditions = json.loads(base64.urlsafe_b64decode(policy))
+    if conditions["key"] != key or conditions["expires"] < time.time():
+        raise HTTPException(status_code=403, detail="Policy does not allow this upload")
+    file.file.seek(0, os.SEEK_END)
+    if conditions["max_size"] is not None and file.file.tell() > conditions["max_size"]:
+        raise HTTPException(status_code=400, detail="EntityTooLarge")
+    file.file.seek(0)
+    try:
+        await run_in_threadpool(storage.upload_fileobj, file.file, AWS_BUCKET_NAME, key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(status_code=204)
+
+
+@app.put("/process-links")
+def process_links(restart: bool = Query(False, description="Start a new job even if an unfinished one can be resumed")):
+    """
+    Copy every product image and PDF into S3 and point the products at the copies.
+    The work runs as a background job; poll GET /process-links/{job_id} for progress.
+    An unfinished job is resumed from its checkpoint unless `restart` is set.
+    """
+    try:
+        job, created = media_jobs.start(restart)
+        if created:
+            message = "Links processing started"
+        elif restart:
+            message = "Links processing is already running; it was not restarted"
+        else:
+            message = "Links processing resumed"
+        return {
+            "message": message,
+            "job_id": job.id,
+            "status_url": f"/process-links/{job.id}",
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing links: {e}")
+
+
+@app.get("/process-links/{job_id}")
+def get_process_links_job(job_id: str, db: Session = Depends(get_db)):
+    """
+    Progress of a media migration job.
+    """
+    job = db.query(MediaJob).filter(MediaJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return media_jobs.report(job)
+
+
+@app.post("/process-links/{job_id}/resume")
+def resume_process_links_job(job_id: str):
+    """
+    Resume an interrupted or failed media migration job from its checkpoint.
+    """
+    job = media_jobs.resume(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"message": "Links processing resumed", "job_id": job.id, "status": job.status}
+
+
+# Media migration settings
+MEDIA_CONCURRENCY = int(os.getenv("MEDIA_CONCURRENCY", "8"))  # transfers in flight overall
+MEDIA_PER_HOST_CONCURRENCY = int(os.getenv("MEDIA_PER_HOST_CONCURRENCY", "4"))
+MEDIA_DRIVE_CONCURRENCY = int(os.getenv("MEDIA_DRIVE_CONCURRENCY", "2"))  # Google Drive throttles hard
+MEDIA_CONNECT_TIMEOUT = float(os.getenv("MEDIA_CONNECT_TIMEOUT", "10"))
+MEDIA_READ_TIMEOUT = float(os.getenv("MEDIA_READ_TIMEOUT", "60"))
+MEDIA_RETRIES = int(os.getenv("MEDIA_RETRIES", "3"))
+MEDIA_BACKOFF = float(os.getenv("MEDIA_BACKOFF", "1.0"))  # seconds, doubled on every retry
+
+# Download responses worth retrying; other errors fail immediately
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+def s3_object_url(file_key):
+    if STORAGE_BACKEND == "local":
+        return f"{STORAGE_PUBLIC_URL}/storage/{file_key}"
+    return f"https://{AWS_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{file_key}"
+
+
+def storage_key_from_url(file_url):
+    """
+    Object key of a URL returned by s3_object_url.
+    """
+    file_key = urlparse(file_url).path.lstrip("/")  # Remove leading "/"
+    if STORAGE_BACKEND == "local" and file_key.startswith("storage/"):
+        file_key = file_key[len("storage/"):]
+    return unquote(file_key)
+
+
+MEDIA_SPOOL_MAX_MEMORY = int(os.getenv("MEDIA_SPOOL_MAX_MEMORY", str(8 * 1024 * 1024)))  # larger files spill to disk
+MEDIA_INDEX_CACHE_SIZE = int(os.getenv("MEDIA_INDEX_CACHE_SIZE", "10000"))
+
+
+class MediaIndex:
+    """
+    Content hash -> stored URL index backed by the media_objects table, with an
+    in-memory LRU in front so repeated files cost no database round trip.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._urls = OrderedDict()
+        self._pending = {}  # sha256 -> [lock, number of uploads waiting on it]
+
+    @contextmanager
+    def storing(self, sha256):
+        """
+        Serialize uploads of the same content within this process, so concurrent
+        duplicates wait for the first upload and then find it in the index.
+        """
+        with self._lock:
+            pending = self._pending.setdefault(sha256, [threading.Lock(), 0])
+            pending[1] += 1
+        try:
+            with pending[0]:
+                yield
+        finally:
+            with self._lock:
+                pending[1] -= 1
+                if pending[1] == 0:
+                    del self._pending[sha256]
+
+    def _remember(self, sha256, url):
+        with self._lock:
+            self._urls[sha256] = url
+            self._urls.move_to_end(sha256)
+            while len(self._urls) > self.max_entries:
+                self._urls.popitem(last=False)
+
+    def lookup(self, sha256):
+        with self._lock:
+            url = self._urls.get(sha256)
+        if url is not None:
+            return url
+        db = SessionLocal()
+        try:
+            url = db.query(MediaObject.url).filter(MediaObject.sha256 == sha256).scalar()
+        finally:
+            db.close()
+        if url is not None:
+            self._remember(sha256, url)
+        return url
+
+    def record(self, sha256, file_key, url, size, content_type):
+        db = SessionLocal()
+        try:
+            db.add(MediaObject(sha256=sha256, file_key=file_key, url=url, size=size, content_type=content_type))
+            db.commit()
+        except IntegrityError:
+            # Stored concurrently by another upload; the key is the same either way
+            db.rollback()
+        finally:
+            db.close()
+        self._remember(sha256, url)
+
+    def forget(self, file_keys):
+        """
+        Drop deleted objects from the index, so their content is stored again
+        instead of being deduplicated to a URL that no longer exists.
+        """
+        file_keys = list(file_keys)
+        urls = {s3_object_url(file_key) for file_key in file_keys}
+        with self._lock:
+            for sha256 in [sha256 for sha256, url in self._urls.items() if url in urls]:
+                del self._urls[sha256]
+        db = SessionLocal()
+        try:
+            for start in range(0, len(file_keys), 1000):
+                db.query(MediaObject).filter(MediaObject.file_key.in_(file_keys[start:start + 1000])).delete(
+                    synchronize_session=False
+                )
+            db.commit()
+        finally:
+            db.close()
+
+
+media_index = MediaIndex(MEDIA_INDEX_CACHE_SIZE)
+
+
+def media_extension(link, content_type=None):
+    """
+    File extension for a stored object, taken from the URL path or the content type.
+    """
+    _, file_extension = os.path.splitext(urlparse(link).path)
+    if not file_extension and content_type:
+        file_extension = mimetypes.guess_extension(content_type.split(";")[0].strip()) or ""
+    return file_extension.lower()
+
+
+def store_media(fileobj, folder, file_extension, content_type=None, s3_client=None):
+    """
+    Store a file under its content hash and return its URL.
+
+    The stream is hashed while it is spooled (in memory, or on disk past
+    MEDIA_SPOOL_MAX_MEMORY), and the hash is checked against the media index
+    before anything is sent, so a file that is already stored costs one lookup.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.SpooledTemporaryFile(max_size=MEDIA_SPOOL_MAX_MEMORY) as spool:
+        while True:
+            chunk = fileobj.read(1024 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+            spool.write(chunk)
+            size += len(chunk)
+        sha256 = digest.hexdigest()
+
+        with media_index.storing(sha256):
+            existing_url = media_index.lookup(sha256)
+            if existing_url is not None:
+                return existing_url
+
+            file_key = f"{folder}/{sha256}{file_extension}"
+            spool.seek(0)
+            # Upload to S3 without ACL
+            (s3_client or get_s3_client()).upload_fileobj(
+                spool, AWS_BUCKET_NAME, file_key,
+                ExtraArgs={"ContentType": content_type or "application/octet-stream"}
+            )
+            url = s3_object_url(file_key)
+            media_index.record(sha256, file_key, url, size, content_type)
+
+            # Thumbnails and web-sized copies are made in the background
+            if image_variants.wanted(content_type, size):
+                image_variants.schedule(url, file_key)
+    return url
+
+
+try:
+    import imaging
+except ImportError:  # image variants are not generated without Pillow
+    imaging = None
+
+# Variant name -> longest side in pixels; images are never enlarged
+IMAGE_VARIANTS = {"thumbnail": 128, "card": 480, "full": 1600}
+IMAGE_VARIANT_FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", "80"))
+IMAGE_VARIANTS_ENABLED = os.getenv("IMAGE_VARIANTS_ENABLED", "true").lower() in ("1", "true", "yes") and imaging is not None
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", str(min(4, os.cpu_count() or 1))))  # processes
+IMAGE_VARIANT_MAX_PENDING = int(os.getenv("IMAGE_VARIANT_MAX_PENDING", "64"))  # queued images (only their keys and URLs)
+IMAGE_VARIANT_MAX_BYTES = int(os.getenv("IMAGE_VARIANT_MAX_BYTES", str(50 * 1024 * 1024)))
+
+
+def source_key(source_url):
+    return hashlib.sha256(source_url.encode()).hexdigest()
+
+
+class ImageVariants:
+    """
+    Generates the resized variants of uploaded images off the request path.
+
+    `schedule` only queues the image's storage key or URL: a small thread pool
+    reads it when its turn comes, resizes it in a process pool (it is CPU bound,
+    see imaging.py), then uploads the results and records them in
+    media_variants. So only the images being worked on are held in memory. At
+    most `max_pending` images are queued; beyond that an image is skipped and
+    left to /media/variants/backfill.
+    """
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._processes = None
+        self._threads = None
+
+    def _executors(self):
+        with self._lock:
+            if self._processes is None:
+                from concurrent.futures import ProcessPoolExecutor
+
+                import multiprocessing
+
+                # Not forked: the parent has threads (and locks) that a fork would copy mid-use
+                self._processes = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+                self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-variants")
+            return self._processes, self._threads
+
+    def wanted(self, content_type, size=None):
+        return (
+            IMAGE_VARIANTS_ENABLED
+            and (content_type or "").startswith("image/")
+            and "svg" not in content_type
+            and (size is None or size <= IMAGE_VARIANT_MAX_BYTES)
+        )
+
+    def schedule(self, source_url, file_key=None, wait=False):
+        """
+        Queue variant generation for `source_url`. The image is read from storage
+        (`file_key`) or else downloaded. Returns False when the queue is full and
+        `wait` is not set.
+        """
+        if not IMAGE_VARIANTS_ENABLED:
+            return False
+        if not self._slots.acquire(blocking=wait):
+            print(f"Image variant queue is full, skipping {source_url}")
+            return False
+        try:
+            _, threads = self._executors()
+            threads.submit(self._generate, source_url, file_key)
+        except Exception:
+            self._slots.release()
+            raise
+        return True
+
+    def _read(self, source_url, file_key):
+        if file_key is not None:
+            # Closing the body hands the HTTP connection back to boto3's pool
+            with closing(get_s3_client().get_object(Bucket=AWS_BUCKET_NAME, Key=file_key)["Body"]) as body:
+                return body.read()
+        response = requests.get(source_url, timeout=(MEDIA_CONNECT_TIMEOUT, MEDIA_READ_TIMEOUT))
+        response.raise_for_status()
+        return response.content
+
+    def _generate(self, source_url, file_key):
+        try:
+            data = self._read(source_url, file_key)
+            processes, _ = self._executors()
+            rendered = processes.submit(
+                imaging.render_image_variants, data, IMAGE_VARIANTS, list(IMAGE_VARIANT_FORMATS), IMAGE_VARIANT_QUALITY
+            ).result()
+            data = None
+
+            key = source_key(source_url)
+            rows = []
+            s3_client = get_s3_client()
+            for variant, image_format, content, width, height in rendered:
+                variant_key = f"variants/{key}/{variant}.{image_format}"
+                s3_client.upload_fileobj(
+                    io.BytesIO(content), AWS_BUCKET_NAME, variant_key,
+                    ExtraArgs={"ContentType": IMAGE_VARIANT_FORMATS[image_format]},
+                )
+                rows.append(MediaVariant(
+                    source_key=key, source_url=source_url, variant=variant, format=image_format,
+                    file_key=variant_key, url=s3_object_url(variant_key), width=width, height=height, size=len(content),
+                ))
+
+            db = SessionLocal()
+            try:
+                db.query(MediaVariant).filter(MediaVariant.source_key == key).delete()
+                db.add_all(rows)
+                db.commit()
+            except IntegrityError:
+                # Generated concurrently by another worker; the objects are identical
+                db.rollback()
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"Failed to generate image variants for {source_url}. Error: {e}")
+        finally:
+            self._slots.release()
+
+    def urls(self, db, source_urls, variant, image_format):
+        """
+        Map each of `source_urls` that has the variant to the variant URL.
+        """
+        keys = {source_key(url): url for url in source_urls}
+        if not keys:
+            return {}
+        rows = db.execute(
+            select(MediaVariant.source_key, MediaVariant.url).where(
+                MediaVariant.source_key.in_(keys),
+                MediaVariant.variant == variant,
+                MediaVariant.format == image_format,
+            )
+        ).all()
+        return {keys[key]: url for key, url in rows}
+
+    def missing(self, db):
+        """
+        Image URLs referenced by products, categories, brands and clients that
+        have no variants yet.
+        """
+        sources = set()
+        for column in (Product.images, Category.image_link, Brand.aws_link, Client.link):
+            sources.update(url for (url,) in db.query(column).filter(column.isnot(None), column != "").distinct())
+        done = {key for (key,) in db.query(MediaVariant.source_key).distinct()}
+        return sorted(url for url in sources if source_key(url) not in done and not url.lower().endswith((".pdf", ".svg")))
+
+    def backfill(self, source_urls):
+        for source_url in source_urls:
+            file_key = storage_key_from_url(source_url) if source_url.startswith(s3_object_url("")) else None
+            self.schedule(source_url, file_key, wait=True)
+
+    def shutdown(self):
+        with self._lock:
+            if self._threads is not None:
+                self._threads.shutdown(wait=False, cancel_futures=True)
+                self._processes.shutdown(wait=False, cancel_futures=True)
+
+
+image_variants = ImageVariants(IMAGE_VARIANT_WORKERS, IMAGE_VARIANT_MAX_PENDING)
+
+
+@app.get("/media/variants")
+def get_media_variants(url: str = Query(..., description="URL of the original image"), db: Session = Depends(get_db)):
+    """
+    Every generated variant of an image, e.g. for brand and client logos.
+    """
+    variants = db.query(MediaVariant).filter(MediaVariant.source_key == source_key(url)).all()
+    return {
+        "url": url,
+        "variants": {
+            f"{variant.variant}.{variant.format}": {"url": variant.url, "width": variant.width, "height": variant.height}
+            for variant in variants
+        },
+    }
+
+
+@app.post("/media/variants/backfill")
+def backfill_media_variants(db: Session = Depends(get_db)):
+    """
+    Generate variants for every referenced image that has none, e.g. images
+    stored before variants existed or skipped while the queue was full.
+    """
+    if not IMAGE_VARIANTS_ENABLED:
+        raise HTTPException(status_code=503, detail="Image variants are disabled (IMAGE_VARIANTS_ENABLED, Pillow)")
+    try:
+        missing = image_variants.missing(db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+    threading.Thread(target=image_variants.backfill, args=(missing,), daemon=True).start()
+    return {"message": "Backfill started", "queued": len(missing)}
+
+
+MEDIA_DELETE_BATCH_SIZE = 1000  # S3 DeleteObjects limit
+# Objects younger than this are never collected: they may belong to an upload that is not attached yet
+MEDIA_GC_MIN_AGE_HOURS = float(os.getenv("MEDIA_GC_MIN_AGE_HOURS", "24"))
+# Only the prefixes this API writes to are scanned
+MEDIA_GC_PREFIXES = [prefix for prefix in os.getenv("MEDIA_GC_PREFIXES", "images/,pdfs/,product_images/,variants/").split(",") if prefix]
+MEDIA_GC_REPORT_KEYS = int(os.getenv("MEDIA_GC_REPORT_KEYS", "1000"))  # orphaned keys listed in the report
+
+
+def media_url_columns():
+    # Every column that holds a stored media URL
+    return [
+        Product.images, Product.pdf, Category.image_link, Brand.aws_link,
+        SubCategory.link, Project.image_link, Client.link,
+    ]
+
+
+def delete_media(file_keys, s3_client=None):
+    """
+    Delete objects with multi-object deletes of up to 1000 keys, drop them from
+    the media index together with their image variants, and return
+    (deleted keys, errors).
+    """
+    s3_client = s3_client or get_s3_client()
+    file_keys = list(dict.fromkeys(file_keys))
+    deleted, errors = [], []
+    for start in range(0, len(file_keys), MEDIA_DELETE_BATCH_SIZE):
+        batch = file_keys[start:start + MEDIA_DELETE_BATCH_SIZE]
+        result = s3_client.delete_objects(
+            Bucket=AWS_BUCKET_NAME, Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+        )
+        # Quiet mode only reports failures
+        failed = {error["Key"] for error in result.get("Errors", [])}
+        errors.extend(
+            {"key": error["Key"], "code": error.get("Code"), "message": error.get("Message")}
+            for error in result.get("Errors", [])
+        )
+        deleted.extend(key for key in batch if key not in failed)
+
+    if deleted:
+        media_index.forget(deleted)
+        sources = [source_key(s3_object_url(key)) for key in deleted]
+        db = SessionLocal()
+        try:
+            variant_keys = []
+            for start in range(0, len(deleted), 1000):
+                # Variants of the deleted files, and rows of deleted variant files
+                chunk = sources[start:start + 1000]
+                variant_keys.extend(key for (key,) in db.query(MediaVariant.file_key).filter(MediaVariant.source_key.in_(chunk)))
+                db.query(MediaVariant).filter(
+                    or_(MediaVariant.source_key.in_(chunk), MediaVariant.file_key.in_(deleted[start:start + 1000]))
+                ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        # The variants of a deleted image are useless; failures here are left to the garbage collector
+        for start in range(0, len(variant_keys), MEDIA_DELETE_BATCH_SIZE):
+            s3_client.delete_objects(
+                Bucket=AWS_BUCKET_NAME,
+                Delete={"Objects": [{"Key": key} for key in variant_keys[start:start + MEDIA_DELETE_BATCH_SIZE]], "Quiet": True},
+            )
+    return deleted, errors
+
+
+def referenced_media(db, source_urls=None):
+    """
+    Storage keys referenced by the media_url_columns, plus the source keys of
+    every referenced URL (whose variants are therefore still in use). With
+    `source_urls` only those URLs are looked up.
+    """
+    file_keys, sources = set(), set()
+    storage_prefix = s3_object_url("")
+    for column in media_url_columns():
+        statement = select(column).where(column.isnot(None), column != "").distinct()
+        if source_urls is not None:
+            statement = statement.where(column.in_(source_urls))
+        for (url,) in db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE)):
+            sources.add(source_key(url))
+            if url.startswith(storage_prefix):
+                file_keys.add(storage_key_from_url(url))
+    return file_keys, sources
+
+
+def collect_orphaned_media(dry_run=True, min_age_hours=MEDIA_GC_MIN_AGE_HOURS, s3_client=None):
     """
+    Delete the objects under MEDIA_GC_PREFIXES that no media_url_columns URL
+    refers to (variants count as referenced while their source is), and return
+    a report. The bucket listing is streamed page by page; orphans are deleted
+    in batches, each re-checked against the database first, so a URL that was
+    attached during the scan is kept. With `dry_run` nothing is deleted.
+    """
+    s3_client = s3_client or get_s3_client()
+    started = time.monotonic()
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=min_age_hours)
+    db = SessionLocal()
     try:
-        # Query the database for the first product matching the model
-        product = db.query(Product).filter(Product.model.ilike(f"%{model}%")).all()
+        referenced, sources = referenced_media(db)
+    finally:
+        db.close()
 
-        # Handle the case where no product is found
-        if not product:
-            raise HTTPException(status_code=404, detail="Product with the specified model not found")
+    report = {
+        "dry_run": dry_run,
+        "prefixes": MEDIA_GC_PREFIXES,
+        "min_age_hours": min_age_hours,
+        "referenced": len(referenced),
+        "scanned": 0,
+        "recent": 0,
+        "orphaned": 0,
+        "orphaned_bytes": 0,
+        "deleted": 0,
+        "errors": [],
+        "orphaned_keys": [],
+    }
+
+    def is_referenced(key):
+        if key in referenced:
+            return True
+        # variants/<source key>/<variant>.<format>
+        parts = key.split("/")
+        return parts[0] == "variants" and len(parts) == 3 and parts[1] in sources
+
+    def delete_batch(batch):
+        urls = [s3_object_url(key) for key in batch]
+        db = SessionLocal()
+        try:
+            attached, _ = referenced_media(db, urls)
+        finally:
+            db.close()
+        deleted, errors = delete_media([key for key in batch if key not in attached], s3_client)
+        report["deleted"] += len(deleted)
+        report["errors"].extend(errors)
+
+    pending = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for prefix in MEDIA_GC_PREFIXES:
+        for page in paginator.paginate(Bucket=AWS_BUCKET_NAME, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                report["scanned"] += 1
+                if is_referenced(obj["Key"]):
+                    continue
+                if obj["LastModified"] > cutoff:
+                    report["recent"] += 1
+                    continue
+                report["orphaned"] += 1
+                report["orphaned_bytes"] += obj["Size"]
+                if len(report["orphaned_keys"]) < MEDIA_GC_REPORT_KEYS:
+                    report["orphaned_keys"].append(obj["Key"])
+                if not dry_run:
+                    pending.append(obj["Key"])
+                    if len(pending) == MEDIA_DELETE_BATCH_SIZE:
+                        delete_batch(pending)
+                        pending = []
+    if pending:
+        delete_batch(pending)
+
+    report["seconds"] = round(time.monotonic() - started, 3)
+    print(
+        f"Media GC{' (dry run)' if dry_run else ''}: {report['scanned']} scanned, {report['orphaned']} orphaned "
+        f"({report['orphaned_bytes']} bytes), {report['deleted']} deleted, {len(report['errors'])} errors"
+    )
+    return report
 
-        return product
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
+class DeleteImages(BaseModel):
+    file_urls: List[str]
 
-@app.post("/upload-product-image")
-async def upload_image(file: UploadFile = File(...)):
-    try:
-        # Generate a unique file key using timestamp
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        file_key = f"product_images/{timestamp}_{file.filename}"
-
-        # Upload the file to S3
-        S3_CLIENT.upload_fileobj(
-            file.file, AWS_BUCKET_NAME, file_key,
-            ExtraArgs={"ContentType": file.content_type}
-        )
-        # Generate the file's URL
-        file_url = f"https://{AWS_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{file_key}"
 
-        return {"message": "Image uploaded successfully", "url": file_url}
+@app.post("/delete-images")
+def delete_images(body: DeleteImages):
+    """
+    Delete many stored files at once (1000 per storage request).
+    """
+    storage_prefix = s3_object_url("")
+    errors = [
+        {"key": None, "url": url, "code": "InvalidURL", "message": "Not a URL of this storage"}
+        for url in body.file_urls
+        if not url.startswith(storage_prefix)
+    ]
+    file_keys = [storage_key_from_url(url) for url in body.file_urls if url.startswith(storage_prefix)]
+    try:
+        deleted, failed = delete_media(file_keys)
+        return {"message": f"{len(deleted)} files deleted", "deleted": deleted, "errors": errors + failed}
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=f"Failed to upload image: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to delete images: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
 
 
-@app.delete("/delete-image")
-async def delete_image(file_url: str = Query(...)):
+@app.post("/media/gc")
+def collect_media_garbage(
+    dry_run: bool = Query(True, description="Only report the orphaned objects"),
+    min_age_hours: float = Query(MEDIA_GC_MIN_AGE_HOURS, ge=0, description="Keep objects younger than this"),
+):
+    """
+    Find (and unless dry_run, delete) stored files that nothing refers to.
+    Large buckets are better collected with `python main.py gc-media`.
+    """
     try:
-        # Extract the file key (path after the bucket name) from the URL
-        parsed_url = urlparse(file_url)
-        file_key = parsed_url.path.lstrip("/")  # Remove leading "/"
-
-        # Delete the file from S3
-        S3_CLIENT.delete_object(Bucket=AWS_BUCKET_NAME, Key=file_key)
-        return {"message": f"Image '{file_key}' deleted successfully"}
+        return collect_orphaned_media(dry_run, min_age_hours)
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=f"Failed to delete image: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to list storage: {e}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
-
-
-@app.put("/process-links")
-async def process_links():
-    session = SessionLocal()
-    updated_rows = []
-
-    try:
-        products = session.query(Product).all()
-        if not products:
-            return {"message": "No products found in the database"}
-
-        for product in products:
-            updated = False
-
-            # Process image link
-            if product.images:
-                new_image_url = download_and_upload_to_s3(product.images, "images")
-                if new_image_url and new_image_url != product.images:
-                    print(f"Updated image URL for product ID {product.id}")
-                    product.images = new_image_url
-                    updated = True
-
-            # Process PDF link
-            if product.pdf:
-                new_pdf_url = download_and_upload_to_s3(product.pdf, "pdfs")
-                if new_pdf_url and new_pdf_url != product.pdf:
-                    print(f"Updated PDF URL for product ID {product.id}")
-                    product.pdf = new_pdf_url
-                    updated = True
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
-            if updated:
-                updated_rows.append(product)
 
-        # Commit changes to the database
-        session.commit()
+class TransferError(Exception):
+    def __init__(self, message, retryable):
+        super().__init__(message)
+        self.retryable = retryable
 
-        # Save updated rows to a CSV file
-        csv_file_path = save_to_csv(updated_rows)
-        return {"message": "Links processed successfully", "csv_file": csv_file_path}
 
-    except Exception as e:
-        session.rollback()
-        raise HTTPException(status_code=500, detail=f"Error processing links: {e}")
-    finally:
-        session.close()
+class MediaMigrator:
+    """
+    Copies remote files into S3 with bounded parallelism.
+
+    Transfers run on a thread pool of `concurrency` workers and each source host
+    is limited to `per_host` transfers at a time (`drive_concurrency` for Google
+    Drive). Each download is read in chunks into store_media, which spools and
+    hashes it (in memory, or on disk past MEDIA_SPOOL_MAX_MEMORY) and only uploads
+    content that is not stored yet. Downloads have connect/read timeouts and
+    exponential backoff retries. The HTTP session and S3 client can be swapped for
+    a local server and a local storage backend in tests.
+    """
 
+    def __init__(
+        self,
+        s3_client=None,
+        http=None,
+        concurrency=MEDIA_CONCURRENCY,
+        per_host=MEDIA_PER_HOST_CONCURRENCY,
+        drive_concurrency=MEDIA_DRIVE_CONCURRENCY,
+        timeout=(MEDIA_CONNECT_TIMEOUT, MEDIA_READ_TIMEOUT),
+        retries=MEDIA_RETRIES,
+        backoff=MEDIA_BACKOFF,
+    ):
+        self.s3_client = s3_client
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.drive_concurrency = drive_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        if http is None:
+            http = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+            http.mount("http://", adapter)
+            http.mount("https://", adapter)
+        self.http = http
+        self._host_limits = {}
+        self._host_limits_lock = threading.Lock()
+
+    def _host_limit(self, host):
+        with self._host_limits_lock:
+            limit = self._host_limits.get(host)
+            if limit is None:
+                size = self.drive_concurrency if host == "drive.google.com" else self.per_host
+                limit = self._host_limits[host] = threading.BoundedSemaphore(size)
+            return limit
+
+    def _transfer_once(self, download_url, link, folder):
+        try:
+            response = self.http.get(download_url, stream=True, timeout=self.timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise TransferError(str(e), retryable=True)
+        with response:
+            if response.status_code != 200:
+                raise TransferError(
+                    f"HTTP {response.status_code}", retryable=response.status_code in RETRYABLE_STATUS_CODES
+                )
+            # Let urllib3 undo any Content-Encoding so the stored object is the real file
+            response.raw.decode_content = True
+
+            content_type = response.headers.get("Content-Type", "application/octet-stream")
+            try:
+                return store_media(
+                    response.raw, folder, media_extension(link, content_type), content_type, self.s3_client
+                )
+            except (requests.ConnectionError, requests.Timeout, Urllib3HTTPError) as e:
+                raise TransferError(str(e), retryable=True)
+            except Exception as e:
+                # The source stream is consumed; a retry downloads it again
+                raise TransferError(str(e), retryable=not isinstance(e, ClientError))
+
+    def transfer(self, link, folder):
+        """
+        Copy `link` into `folder` and return the S3 URL, or None on failure.
+        """
+        # Already migrated
+        if link.startswith(s3_object_url("")):
+            return link
 
-def download_and_upload_to_s3(link, folder):
-    try:
         # Extract Google Drive file ID
         if "drive.google.com" in link:
             file_id = extract_google_drive_id(link)
@@ -505,31 +3354,37 @@ def download_and_upload_to_s3(link, folder):
             download_url = f"https://drive.google.com/uc?export=download&id={file_id}"
         else:
             download_url = link
+        host = urlparse(download_url).hostname or ""
+
+        for attempt in range(self.retries + 1):
+            try:
+                with self._host_limit(host):
+                    return self._transfer_once(download_url, link, folder)
+            except TransferError as e:
+                if not e.retryable or attempt == self.retries:
+                    print(f"Failed to process link: {link}. Error: {e}")
+                    return None
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+            except Exception as e:
+                print(f"Failed to process link: {link}. Error: {e}")
+                return None
 
-        # Download the file
-        response = requests.get(download_url, stream=True)
-        if response.status_code != 200:
-            return None
+    def run(self, tasks):
+        """
+        Transfer `tasks` of (key, link, folder) concurrently and yield
+        (key, new_url) as each one finishes; new_url is None on failure.
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(self.transfer, link, folder): key for key, link, folder in tasks}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
 
-        # Generate a unique file key using current timestamp
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        _, file_extension = os.path.splitext(link)
-        file_key = f"{folder}/{timestamp}{file_extension}"
-
-        # Upload to S3 without ACL
-        S3_CLIENT.upload_fileobj(
-            response.raw,
-            AWS_BUCKET_NAME,
-            file_key,
-            ExtraArgs={"ContentType": response.headers.get("Content-Type", "application/octet-stream")}
-        )
 
-        # Return the S3 URL
-        return f"https://{AWS_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{file_key}"
+media_migrator = MediaMigrator()
 
-    except Exception as e:
-        print(f"Failed to process link: {link}. Error: {e}")
-        return None
+
+def download_and_upload_to_s3(link, folder):
+    return media_migrator.transfer(link, folder)
 
 
 def extract_google_drive_id(link):
@@ -544,126 +3399,562 @@ def extract_google_drive_id(link):
         return None
 
 
-def save_to_csv(rows):
-    csv_file_path = "updated_products.csv"
-    with open(csv_file_path, mode="w", newline="", encoding="utf-8") as file:
+def save_to_csv(rows, csv_file_path="updated_products.csv", append=False):
+    """
+    Write product rows to `csv_file_path`. With `append` the rows are added to the
+    existing file, so a job can build its CSV one batch at a time.
+    """
+    write_header = not append or not os.path.exists(csv_file_path) or os.path.getsize(csv_file_path) == 0
+    with open(csv_file_path, mode="a" if append else "w", newline="", encoding="utf-8") as file:
         writer = csv.writer(file)
         # Write header
-        writer.writerow(["id", "code", "main_cat", "sub_cat", "brand", "model", "housing_size", "function", "range", "output", "voltage", "connection", "material", "images", "pdf"])
+        if write_header:
+            writer.writerow(PRODUCT_COLUMNS)
         # Write rows
         for row in rows:
-            writer.writerow([row.id, row.code, row.main_cat, row.sub_cat, row.brand, row.model, row.housing_size, row.function, row.range, row.output, row.voltage, row.connection, row.material, row.images, row.pdf])
+            writer.writerow([getattr(row, column) for column in PRODUCT_COLUMNS])
     return csv_file_path
 
 
+MEDIA_JOB_BATCH_SIZE = int(os.getenv("MEDIA_JOB_BATCH_SIZE", "200"))  # products per commit
+MEDIA_JOB_STALE_SECONDS = int(os.getenv("MEDIA_JOB_STALE_SECONDS", "300"))  # heartbeat age of a dead job
+MEDIA_JOB_DIR = os.getenv("MEDIA_JOB_DIR", ".")
+
+
+class MediaJobRunner:
+    """
+    Runs media migration jobs on background threads.
+
+    Products are read in id order, one keyset batch of MEDIA_JOB_BATCH_SIZE at a
+    time, so neither memory nor an open transaction grows with the catalog. Each
+    batch's product updates are committed together with the job checkpoint (the
+    last product id), so a crashed or restarted job continues after the last
+    committed batch. A job is claimed with
+    an atomic UPDATE, so it runs in at most one worker at a time, and the
+    ux_media_jobs_active index allows only one queued or running job at all.
+    """
+
+    RESUMABLE = ("queued", "interrupted", "failed")
+    ACTIVE = ("queued", "running")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._threads = {}  # job id -> thread running it in this process
+        self._runs = {}  # job id -> (monotonic start, processed at start) for throughput
+        self._stopping = threading.Event()
+
+    def _active(self, db):
+        return db.query(MediaJob).filter(MediaJob.status.in_(self.ACTIVE)).first()
+
+    def _claim(self, db, job_id):
+        stale = datetime.now() - timedelta(seconds=MEDIA_JOB_STALE_SECONDS)
+        try:
+            claimed = db.execute(
+                update(MediaJob)
+                .where(MediaJob.id == job_id)
+                .where(or_(
+                    MediaJob.status.in_(self.RESUMABLE),
+                    and_(MediaJob.status == "running", MediaJob.updated_at < stale),
+                ))
+                .values(status="running", error=None, updated_at=datetime.now(), finished_at=None)
+            ).rowcount
+            db.commit()
+        except IntegrityError:
+            # Another job is queued or running (ux_media_jobs_active)
+            db.rollback()
+            return False
+        if claimed:
+            thread = threading.Thread(target=self._run, args=(job_id,), daemon=True)
+            with self._lock:
+                self._threads[job_id] = thread
+            thread.start()
+        return bool(claimed)
+
+    def start(self, restart=False):
+        """
+        Resume the latest unfinished job, or create a new one. Returns (job, created).
+        While a job is queued or running (in any worker) that job is returned
+        instead, also with `restart`.
+        """
+        db = SessionLocal()
+        try:
+            job = None
+            if not restart:
+                job = (
+                    db.query(MediaJob)
+                    .filter(MediaJob.status.in_(self.RESUMABLE + ("running",)))
+                    .order_by(MediaJob.started_at.desc())
+                    .first()
+                )
+            if job is not None:
+                # A running job with a fresh heartbeat simply stays as it is
+                self._claim(db, job.id)
+                db.refresh(job)
+                if job.status not in self.ACTIVE:
+                    job = self._active(db) or job
+                return job, False
+            job_id = uuid.uuid4().hex
+            job = MediaJob(
+                id=job_id,
+                status="queued",
+                total=db.query(func.count(Product.id)).scalar(),
+                csv_file=os.path.join(MEDIA_JOB_DIR, f"updated_products_{job_id}.csv"),
+                started_at=datetime.now(),
+                updated_at=datetime.now(),
+            )
+            db.add(job)
+            try:
+                # The insert itself is the check: ux_media_jobs_active rejects a second active job
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                active = self._active(db)
+                if active is None:
+                    raise
+                return active, False
+            self._claim(db, job_id)
+            db.refresh(job)
+            return job, True
+        finally:
+            db.close()
+
+    def resume(self, job_id):
+        db = SessionLocal()
+        try:
+            job = db.query(MediaJob).filter(MediaJob.id == job_id).first()
+            if job is None:
+                return None
+            self._claim(db, job_id)
+            db.refresh(job)
+            return job
+        finally:
+            db.close()
+
+    def resume_interrupted(self):
+        """
+        Restart jobs left behind by a previous process (called on startup).
+        """
+        db = SessionLocal()
+        try:
+            job_ids = [
+                job_id
+                for (job_id,) in db.query(MediaJob.id).filter(MediaJob.status.in_(("running", "interrupted")))
+            ]
+            for job_id in job_ids:
+                if self._claim(db, job_id):
+                    print(f"Resuming media job {job_id}")
+        except Exception as e:
+            print(f"Could not resume media jobs: {e}")
+        finally:
+            db.close()
+
+    def shutdown(self, timeout=30):
+        """
+        Ask running jobs to stop after their current batch and wait for them.
+        """
+        self._stopping.set()
+        with self._lock:
+            threads = list(self._threads.values())
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()))
+
+    def _run(self, job_id):
+        db = SessionLocal()
+        try:
+            job = db.query(MediaJob).filter(MediaJob.id == job_id).one()
+            with self._lock:
+                self._runs[job_id] = (time.monotonic(), job.processed)
+
+            while True:
+                if self._stopping.is_set():
+                    job.status = "interrupted"
+                    break
+                batch = db.execute(
+                    select(Product.id, Product.images, Product.pdf)
+                    .where(Product.id > job.last_product_id)
+                    .order_by(asc(Product.id))
+                    .limit(MEDIA_JOB_BATCH_SIZE)
+                ).all()
+                if not batch:
+                    job.status = "completed"
+                    job.finished_at = datetime.now()
+                    break
+                self._process_batch(db, job, batch)
+            job.updated_at = datetime.now()
+            db.commit()
+        except Exception as e:
+            print(f"Media job {job_id} failed: {e}")
+            db.rollback()
+            try:
+                db.query(MediaJob).filter(MediaJob.id == job_id).update(
+                    {"status": "failed", "error": str(e), "updated_at": datetime.now()}
+                )
+                db.commit()
+            except Exception as e:
+                # Left as "running"; it is picked up again once its heartbeat is stale
+                print(f"Could not record failure of media job {job_id}: {e}")
+        finally:
+            db.close()
+            with self._lock:
+                self._threads.pop(job_id, None)
+                self._runs.pop(job_id, None)
+
+    def _process_batch(self, db, job, batch):
+        tasks = []
+        for product_id, images, pdf in batch:
+            # Process image link
+            if images:
+                tasks.append(((product_id, "images", images), images, "images"))
+            # Process PDF link
+            if pdf:
+                tasks.append(((product_id, "pdf", pdf), pdf, "pdfs"))
+
+        changes = {}
+        failed = 0
+        for (product_id, field, old_url), new_url in media_migrator.run(tasks):
+            if new_url is None:
+                failed += 1
+            elif new_url != old_url:
+                changes.setdefault(product_id, {})[field] = new_url
+
+        if changes:
+            db.execute(
+                update(Product),
+                [{"id": product_id, **fields} for product_id, fields in changes.items()],
+            )
+        job.processed += len(batch)
+        job.updated += len(changes)
+        job.failed += failed
+        job.last_product_id = batch[-1][0]
+        job.updated_at = datetime.now()
+        # Product updates and checkpoint are committed together
+        db.commit()
+
+        if changes:
+            rows = db.query(Product).filter(Product.id.in_(list(changes))).order_by(asc(Product.id)).all()
+            save_to_csv(rows, job.csv_file, append=True)
+
+    def report(self, job):
+        with self._lock:
+            run = self._runs.get(job.id)
+        if run is not None:
+            elapsed = time.monotonic() - run[0]
+            throughput = (job.processed - run[1]) / elapsed if elapsed > 0 else 0.0
+        elif job.started_at and job.updated_at and job.updated_at > job.started_at:
+            throughput = job.processed / (job.updated_at - job.started_at).total_seconds()
+        else:
+            throughput = 0.0
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "total": job.total,
+            "processed": job.processed,
+            "updated": job.updated,
+            "failed": job.failed,
+            "last_product_id": job.last_product_id,
+            "throughput_per_second": round(throughput, 2),
+            "csv_file": job.csv_file,
+            "error": job.error,
+            "started_at": job.started_at,
+            "updated_at": job.updated_at,
+            "finished_at": job.finished_at,
+        }
+
+
+media_jobs = MediaJobRunner()
+
+
+def read_distinct_values(db: Session):
+    # Served from the in-memory facet store
+    return {name: facet_store.distinct(db, column) for name, column in FACET_FIELDS.items()}
+
+
 @app.get("/distinct-values", response_model=dict)
-def get_distinct_values(db: Session = Depends(get_db)):
+async def get_distinct_values(db=Depends(get_read_db)):
     """
     Fetch distinct values for all fields in the Product table.
     """
     try:
-        # Query distinct values for each field
-        distinct_values = {
-            "code": sorted([item[0] for item in db.query(Product.code).distinct().all() if item[0] is not None]),
-            "main_categories": sorted([item[0] for item in db.query(Product.main_cat).distinct().all() if item[0] is not None]),
-            "sub_categories": sorted([item[0] for item in db.query(Product.sub_cat).distinct().all() if item[0] is not None]),
-            "brands": sorted([item[0] for item in db.query(Product.brand).distinct().all() if item[0] is not None]),
-            "models": sorted([item[0] for item in db.query(Product.model).distinct().all() if item[0] is not None]),
-            "housing_sizes": sorted([item[0] for item in db.query(Product.housing_size).distinct().all() if item[0] is not None]),
-            "functions": sorted([item[0] for item in db.query(Product.function).distinct().all() if item[0] is not None]),
-            "ranges": sorted([item[0] for item in db.query(Product.range).distinct().all() if item[0] is not None]),
-            "outputs": sorted([item[0] for item in db.query(Product.output).distinct().all() if item[0] is not None]),
-            "voltages": sorted([item[0] for item in db.query(Product.voltage).distinct().all() if item[0] is not None]),
-            "connections": sorted([item[0] for item in db.query(Product.connection).distinct().all() if item[0] is not None]),
-            "materials": sorted([item[0] for item in db.query(Product.material).distinct().all() if item[0] is not None]),
-        }
-
-        return distinct_values
+        return FastJSONResponse(await run_read(db, read_distinct_values))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
     
 
+def search_products_page(
+    db: Session, criteria: dict, page: int, count_mode: str, fields: Optional[List[str]] = None, variant=None
+):
+    """
+    One page of /search-products-extended. The total is taken from the count
+    cache, estimated, or computed together with the page in a single query
+    using a window function. With `fields` only those columns are selected.
+    """
+    PAGE_SIZE = 16  # Items per page
+    offset = (page - 1) * PAGE_SIZE
+
+    query = db.query(Product)
+
+    # Apply dynamic filters
+    version = get_catalog_version(db)
+    filters = build_search_filters(db, criteria, version)
+    if filters:
+        query = query.filter(and_(*filters))
+
+    total_items = count_cache.get(version, criteria)
+    total_is_estimate = False
+    if total_items is None and count_mode == "estimated":
+        total_items = estimate_product_count(db, query, bool(filters))
+        total_is_estimate = total_items is not None
+
+    # Pagination and sorting
+    page_query = project_products(query, fields)
+    if total_items is not None:
+        products = page_query.order_by(asc(Product.id)).offset(offset).limit(PAGE_SIZE).all()
+    else:
+        rows = (
+            page_query.add_columns(func.count().over().label("total_items"))
+            .order_by(asc(Product.id))
+            .offset(offset)
+            .limit(PAGE_SIZE)
+            .all()
+        )
+        products = rows
+        if rows:
+            total_items = rows[0][-1]
+        elif offset == 0:
+            total_items = 0
+        else:
+            # Page past the end: the window function had no row to report on
+            total_items = query.count()
+        count_cache.put(version, criteria, total_items)
+
+    # Plain row tuples to dicts; no ORM objects or Pydantic models on this path
+    product_responses = with_image_variants(db, product_dicts(products, fields), variant)
+
+    return {
+        "page": page,
+        "page_size": PAGE_SIZE,
+        "total_items": total_items,
+        "total_pages": (total_items + PAGE_SIZE - 1) // PAGE_SIZE,
+        "total_is_estimate": total_is_estimate,
+        "products": product_responses,
+    }
+
+
 @app.get("/search-products-extended", response_model=dict)
-def search_products(
-    code: Optional[str] = None,
-    main_cat: Optional[str] = None,
-    sub_cat: Optional[str] = None,
-    brand: Optional[str] = None,
-    model: Optional[str] = None,
-    housing_size: Optional[str] = None,
-    function: Optional[str] = None,
-    range: Optional[str] = None,
-    output: Optional[str] = None,
-    voltage: Optional[str] = None,
-    connection: Optional[str] = None,
-    material: Optional[str] = None,
+async def search_products(
+    criteria: dict = Depends(extended_search_criteria),
     page: int = Query(1, description="Page number for pagination", ge=1),
-    db: Session = Depends(get_db),
+    count_mode: str = Query(
+        "exact",
+        description="'exact' total, or 'estimated' to use planner statistics when no cached count exists",
+        pattern="^(exact|estimated)$",
+    ),
+    fields: Optional[List[str]] = Depends(product_fields),
+    variant=Depends(image_variant),
+    db=Depends(get_read_db),
 ):
     """
     Search products with optional filters, and return paginated results.
+    `fields` limits the columns returned for each product, `size` picks an
+    image variant.
     """
     try:
-        PAGE_SIZE = 16  # Items per page
-        offset = (page - 1) * PAGE_SIZE
+        return FastJSONResponse(await run_read(db, search_products_page, criteria, page, count_mode, fields, variant))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
-        query = db.query(Product)
 
-        # Apply dynamic filters
-        filters = []
-        if code:
-            code = code.strip()
-            filters.append(func.lower(Product.code).ilike(f"%{code.lower()}%"))
-        if main_cat:
-            main_cat = main_cat.strip()
-            filters.append(func.lower(Product.main_cat).ilike(f"%{main_cat.lower()}%"))
-        if sub_cat:
-            sub_cat = sub_cat.strip()
-            filters.append(func.lower(Product.sub_cat).ilike(f"%{sub_cat.lower()}%"))
-        if brand:
-            brand = brand.strip()
-            filters.append(func.lower(Product.brand).ilike(f"%{brand.lower()}%"))
-        if model:
-            model = model.strip()
-            filters.append(func.lower(Product.model).ilike(f"%{model.lower()}%"))
-        if housing_size:
-            housing_size = housing_size.strip()
-            filters.append(func.lower(Product.housing_size).ilike(f"%{housing_size.lower()}%"))
-        if function:
-            function = function.strip()
-            filters.append(func.lower(Product.function).ilike(f"%{function.lower()}%"))
-        if range:
-            range = range.strip()
-            filters.append(func.lower(Product.range).ilike(f"%{range.lower()}%"))
-        if output:
-            output = output.strip()
-            filters.append(func.lower(Product.output).ilike(f"%{output.lower()}%"))
-        if voltage:
-            voltage = voltage.strip()
-            filters.append(func.lower(Product.voltage).ilike(f"%{voltage.lower()}%"))
-        if connection:
-            connection = connection.strip()
-            filters.append(func.lower(Product.connection).ilike(f"%{connection.lower()}%"))
-        if material:
-            material = material.strip()
-            filters.append(func.lower(Product.material).ilike(f"%{material.lower()}%"))
+# Cache-Control max-age of the reference table responses
+REFERENCE_CACHE_MAX_AGE = int(os.getenv("REFERENCE_CACHE_MAX_AGE", "60"))
+# Seconds before a cached body is re-read from the database even though its
+# catalog version is unchanged, which bounds how long edits made straight in
+# the database (outside the API) go unnoticed
+REFERENCE_CACHE_TTL = int(os.getenv("REFERENCE_CACHE_TTL", "300"))
+
+
+class ReferenceCache:
+    """
+    Serialized list responses of the small reference tables (categories,
+    subcategories, brands, clients, projects).
+
+    Every create/update/delete of a table bumps its catalog version (the table
+    name in `catalog_versions`) in the same transaction, so all worker processes
+    see the write. A cached body belongs to one version and carries a strong
+    ETag (a hash of the body).
+
+    Every request, a conditional one answered with 304 included, costs one
+    database query: the version lookup by primary key in `catalog_versions`.
+    The table itself is only read when its version changed or the entry is
+    older than `ttl`.
+    """
+
+    def __init__(self, ttl, max_age):
+        self.ttl = ttl
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = {}  # table -> (version, built at, body, etag)
+
+    def _cached(self, table, version):
+        with self._lock:
+            entry = self._entries.get(table)
+            if entry and entry[0] == version and time.monotonic() - entry[1] < self.ttl:
+                return entry[2], entry[3]
+            return None
+
+    def respond(self, request: Request, db: Session, table, load):
+        """
+        Answer a list request for `table` from the cache, calling `load()` to
+        read the rows when there is no entry for the current version. The
+        version is looked up on every call, before the ETag is compared.
+        """
+        # Read before the rows, so a body is never older than the version it is stored under
+        version = get_catalog_version(db, table)
+        cached = self._cached(table, version)
+        if cached is None:
+            body = json.dumps(jsonable_encoder(load())).encode()
+            etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            with self._lock:
+                self._entries[table] = (version, time.monotonic(), body, etag)
+            cached = body, etag
+        body, etag = cached
+        return cached_json_response(request, body, etag, self.max_age)
+
+
+def cached_json_response(request: Request, body, etag, max_age):
+    """
+    JSON response with ETag and Cache-Control, or 304 when the client's copy is current.
+    """
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+reference_cache = ReferenceCache(REFERENCE_CACHE_TTL, REFERENCE_CACHE_MAX_AGE)
 
-        if filters:
-            query = query.filter(and_(*filters))
 
-        # Pagination and sorting
-        total_items = query.count()
-        products = query.order_by(asc(Product.id)).offset(offset).limit(PAGE_SIZE).all()
+def facet_search_filters(criteria: dict):
+    return {
+        column: func.lower(getattr(Product, column)).ilike(f"%{value.lower()}%")
+        for column, value in criteria.items()
+    }
 
-        # Convert SQLAlchemy objects to Pydantic models
-        product_responses = [ProductResponse.from_orm(product) for product in products]
 
+def facet_counts_statement(criteria: dict, columns, grouping_sets=True):
+    """
+    One statement counting the values of every column of `columns`, grouped
+    with GROUPING SETS, or with one SELECT per grouping set joined by UNION ALL
+    for databases without them (SQLite). Each column's count leaves out its own
+    filter with count(*) FILTER (WHERE the other filters); columns without a
+    filter share the count under all of them, which also gives the total in the
+    empty grouping set. Rows are (column values, GROUPING() flags, counts).
+    Returns the statement and the keys of its counts (a column, or None for the
+    shared one).
+    """
+    filters = facet_search_filters(criteria)
+
+    def count_without(excluded):
+        conditions = [condition for name, condition in filters.items() if name != excluded]
+        return func.count().filter(and_(*conditions)) if conditions else func.count()
+
+    counted = {None: count_without(None)}
+    for column in columns:
+        if column in filters:
+            counted[column] = count_without(column)
+    attributes = [getattr(Product, column) for column in columns]
+    where = None
+    if len(filters) > 1:
+        # A row failing two or more filters counts for no column. Literal 0/1, so
+        # the CASE is an integer even with server-side parameters (asyncpg).
+        failures = [case((condition, literal_column("0")), else_=literal_column("1")) for condition in filters.values()]
+        where = sum(failures[1:], failures[0]) <= 1
+
+    if grouping_sets:
+        statement = select(
+            *attributes, *[func.grouping(attribute) for attribute in attributes], *counted.values()
+        ).select_from(Product)
+        if where is not None:
+            statement = statement.where(where)
+        statement = statement.group_by(func.grouping_sets(*[tuple_(attribute) for attribute in attributes], tuple_()))
+        return statement, list(counted)
+
+    parts = []
+    for position in list(range(len(attributes))) + [None]:
+        part = select(
+            *[attribute if index == position else null() for index, attribute in enumerate(attributes)],
+            *[literal_column("0" if index == position else "1") for index in range(len(attributes))],
+            *counted.values(),
+        ).select_from(Product)
+        if where is not None:
+            part = part.where(where)
+        if position is not None:
+            part = part.group_by(attributes[position])
+        parts.append(part)
+    return union_all(*parts), list(counted)
+
+
+def facet_counts_from_db(db: Session, criteria: dict, columns):
+    """
+    The result of SearchIndex.facet_counts computed by the database in one
+    statement (facet_counts_statement), used while the index is being rebuilt
+    or when it is disabled.
+    """
+    columns = list(columns)
+    statement, keys = facet_counts_statement(criteria, columns, db.get_bind().dialect.name == "postgresql")
+    total = 0
+    counts = {column: {} for column in columns}
+    width = len(columns)
+    for row in db.execute(statement):
+        values, grouping, totals = row[:width], row[width:2 * width], dict(zip(keys, row[2 * width:]))
+        if all(grouping):
+            # The empty grouping set: every row passing all filters
+            total = totals[None]
+            continue
+        position = list(grouping).index(0)
+        column, value = columns[position], values[position]
+        count = totals[column if column in totals else None]
+        if value is not None and count:
+            counts[column][value] = count
+    return total, counts
+
+
+# Columns /facet-counts returns by default: code and model are (nearly) unique
+# per product, so they are only counted when named in facets=
+FACET_COUNT_FIELDS = [column for column in SEARCH_FIELDS if column not in ("code", "model")]
+
+
+@app.get("/facet-counts", response_model=dict)
+def get_facet_counts(
+    criteria: dict = Depends(extended_search_criteria),
+    facets: Optional[str] = Query(
+        None, description="Comma-separated columns to count (default: every attribute except code and model)"
+    ),
+    db: Session = Depends(get_db),
+):
+    """
+    Available values and product counts of every attribute under the same
+    filters as /search-products-extended. Counts for an attribute ignore that
+    attribute's own filter, so a dropdown shows the choices that lead to results.
+    Computed from the in-memory search index in one pass over the matching ids,
+    or by the database while the index is being rebuilt.
+    """
+    columns = FACET_COUNT_FIELDS
+    if facets:
+        columns = [column.strip() for column in facets.split(",") if column.strip()]
+        unknown = [column for column in columns if column not in SEARCH_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown facet columns: {', '.join(unknown)}")
+    try:
+        result = search_index.facet_counts(db, criteria, columns)
+        total_items, counts = result if result is not None else facet_counts_from_db(db, criteria, columns)
         return {
-            "page": page,
-            "page_size": PAGE_SIZE,
             "total_items": total_items,
-            "total_pages": (total_items + PAGE_SIZE - 1) // PAGE_SIZE,
-            "products": product_responses,
+            "facets": {
+                column: [{"value": value, "count": count} for value, count in sorted(counts[column].items())]
+                for column in columns
+            },
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
@@ -673,6 +3964,7 @@ def search_products(
 def create_category(db: Session = Depends(get_db), category: CategoryCreate = None):
     db_category = Category(**category.model_dump())
     db.add(db_category)
+    bump_catalog_version(db, "category")
     db.commit()
     db.refresh(db_category)
     return {"message": "Category created successfully", "category": db_category}
@@ -684,6 +3976,7 @@ def update_category(db: Session = Depends(get_db), category_id: int = None, cate
         return {"error": "Category not found"}
     for key, value in category.model_dump(exclude_unset=True).items():
         setattr(db_category, key, value)
+    bump_catalog_version(db, "category")
     db.commit()
     db.refresh(db_category)
     return {"message": "Category updated successfully", "category": db_category}
@@ -694,6 +3987,7 @@ def delete_category(db: Session = Depends(get_db), category_id: int = None):
     if not db_category:
         return {"error": "Category not found"}
     db.delete(db_category)
+    bump_catalog_version(db, "category")
     db.commit()
     return {"message": "Category deleted successfully"}
 
@@ -705,12 +3999,13 @@ def get_category(db: Session = Depends(get_db), category_id: int = None):
     return db_category
 
 @app.get("/categories")
-def get_all_categories(db: Session = Depends(get_db)):
-    return db.query(Category).all()
+def get_all_categories(request: Request, db: Session = Depends(get_db)):
+    return reference_cache.respond(request, db, "category", lambda: db.query(Category).all())
 
 def create_subcategory(db: Session, subcategory: SubCategoryCreate):
     db_subcategory = SubCategory(**subcategory.model_dump())
     db.add(db_subcategory)
+    bump_catalog_version(db, "sub_category")
     db.commit()
     db.refresh(db_subcategory)
     return db_subcategory
@@ -721,6 +4016,7 @@ def update_subcategory(db: Session, subcategory_id: int, subcategory: SubCategor
         return None
     for key, value in subcategory.model_dump(exclude_unset=True).items():
         setattr(db_subcategory, key, value)
+    bump_catalog_version(db, "sub_category")
     db.commit()
     db.refresh(db_subcategory)
     return db_subcategory
@@ -730,6 +4026,7 @@ def delete_subcategory(db: Session, subcategory_id: int):
     if not db_subcategory:
         return None
     db.delete(db_subcategory)
+    bump_catalog_version(db, "sub_category")
     db.commit()
     return db_subcategory
 
@@ -765,51 +4062,325 @@ def read_subcategory(subcategory_id: int, db: Session = Depends(get_db)):
     return subcategory
 
 @app.get("/subcategories")
-def read_all_subcategories(db: Session = Depends(get_db)):
-    return get_all_subcategories(db)
+def read_all_subcategories(request: Request, db: Session = Depends(get_db)):
+    return reference_cache.respond(request, db, "sub_category", lambda: get_all_subcategories(db))
 
 
-@app.get("/products/distinct-sub-categories/{main_cat}")
-def get_distinct_sub_category_details(
-    main_cat: str = Path(..., description="The main category to filter subcategories"),
-    db: Session = Depends(get_db),
-):
+class CatalogTree:
     """
-    Get the details of all subcategories in the `sub_category` table where
-    `subcat` matches the distinct `sub_cat` values filtered by `main_cat` from the `products` table.
+    Precomputed category structure of the product catalog.
+
+    Keeps the number of products per (main_cat, sub_cat, brand) combination,
+    plus the derived lowered main_cat -> sub_cats and (main_cat, sub_cat) ->
+    brands maps, in step with product writes and the `products` catalog version.
+    The brand and sub_category rows are reloaded when their catalog versions move.
+    Product brand strings are resolved to `brand` rows (the historical
+    `Brand.brand LIKE '%name%'` match) and sub_cat strings to `sub_category`
+    rows once, so the navigation endpoints need a single primary-key lookup.
+    Call refresh() with the request's session before the lookups.
     """
-    try:
-        # Query distinct sub_cat values for the given main_cat from the `products` table
-        distinct_sub_cats = (
-            db.query(Product.sub_cat)
-            .filter(func.lower(Product.main_cat) == main_cat.lower())
-            .distinct()
+
+    # Catalog versions the tree depends on, see state()
+    TABLES = ("products", "brand", "sub_category")
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = None
+        self._combos = Counter()  # (main_cat, sub_cat, brand) -> number of products
+        self._subcats = {}  # lowered main_cat -> Counter(sub_cat)
+        self._brands = {}  # (lowered main_cat, lowered sub_cat) -> Counter(brand)
+        self._reference = None  # (brand version, sub_category version, loaded at)
+        self._brand_rows = []  # (id, brand) of the brand table
+        self._subcat_rows = []  # (id, subcat) of the sub_category table
+        self._brand_ids = {}  # product brand string -> frozenset of brand ids
+        self._subcat_ids = {}  # product sub_cat string -> frozenset of sub_category ids
+        self._pair_brand_ids = {}  # (lowered main_cat, lowered sub_cat) -> frozenset of brand ids
+
+    def _count(self, combo, delta):
+        main_cat, sub_cat, brand = combo
+        self._combos[combo] += delta
+        if self._combos[combo] <= 0:
+            del self._combos[combo]
+        if main_cat is None:
+            return
+        if sub_cat is not None:
+            subcats = self._subcats.setdefault(main_cat.lower(), Counter())
+            subcats[sub_cat] += delta
+            if subcats[sub_cat] <= 0:
+                del subcats[sub_cat]
+            if brand is not None:
+                pair = (main_cat.lower(), sub_cat.lower())
+                brands = self._brands.setdefault(pair, Counter())
+                brands[brand] += delta
+                if brands[brand] <= 0:
+                    del brands[brand]
+                self._pair_brand_ids.pop(pair, None)
+
+    def state(self, db):
+        """
+        The catalog versions of CatalogTree.TABLES, read with one query.
+        """
+        return get_catalog_versions(db, self.TABLES)
+
+    def _load_reference(self, db, state):
+        with self._lock:
+            if self._reference and self._reference[:2] == state and time.monotonic() - self._reference[2] < self.ttl:
+                return
+        brand_rows = [tuple(row) for row in db.query(Brand.id, Brand.brand)]
+        subcat_rows = [tuple(row) for row in db.query(SubCategory.id, SubCategory.subcat)]
+        with self._lock:
+            self._brand_rows, self._subcat_rows = brand_rows, subcat_rows
+            self._brand_ids, self._subcat_ids, self._pair_brand_ids = {}, {}, {}
+            self._reference = state + (time.monotonic(),)
+
+    def refresh(self, db, state=None):
+        """
+        Bring the tree up to date with the database. `state` is the result of
+        state() when the caller has already read it.
+        """
+        version, *reference = state or self.state(db)
+        self._load_reference(db, tuple(reference))
+        with self._lock:
+            if self._version == version:
+                return
+        # No lock is held across the query: it may run on the event loop under
+        # DB_ASYNC, where waiting on a thread lock would stall every request.
+        rows = (
+            db.query(Product.main_cat, Product.sub_cat, Product.brand, func.count(Product.id))
+            .group_by(Product.main_cat, Product.sub_cat, Product.brand)
             .all()
         )
+        off_loop(self._load_combos, rows, version)
+
+    def _load_combos(self, rows, version):
+        with self._lock:
+            if self._version == version:
+                return
+            self._combos, self._subcats, self._brands = Counter(), {}, {}
+            self._pair_brand_ids = {}
+            for main_cat, sub_cat, brand, count in rows:
+                self._count((main_cat, sub_cat, brand), count)
+            self._version = version
+
+    def _resolve_brand(self, name):
+        ids = self._brand_ids.get(name)
+        if ids is None:
+            # Same match as the former Brand.brand LIKE '%name%' query
+            ids = self._brand_ids[name] = frozenset(
+                brand_id for brand_id, brand in self._brand_rows if brand is not None and name in brand
+            )
+        return ids
+
+    def _resolve_subcat(self, name):
+        ids = self._subcat_ids.get(name)
+        if ids is None:
+            ids = self._subcat_ids[name] = frozenset(
+                subcat_id for subcat_id, subcat in self._subcat_rows if subcat == name
+            )
+        return ids
+
+    def subcategory_ids(self, main_cat):
+        """
+        Ids of the sub_category rows used by products of `main_cat` (case-insensitive).
+        """
+        with self._lock:
+            ids = set()
+            for sub_cat in self._subcats.get(main_cat.lower(), {}):
+                ids |= self._resolve_subcat(sub_cat)
+            return ids
+
+    def brand_ids(self, main_cat, sub_cat):
+        """
+        Ids of the brand rows matching the product brands of (main_cat, sub_cat).
+        """
+        pair = (main_cat.lower(), sub_cat.lower())
+        with self._lock:
+            ids = self._pair_brand_ids.get(pair)
+            if ids is None:
+                ids = frozenset().union(*(self._resolve_brand(name) for name in self._brands.get(pair, {})))
+                self._pair_brand_ids[pair] = ids
+            return ids
+
+    def apply(self, before, after, version):
+        """
+        Record a product write committed as catalog `version`.
+        """
+        with self._lock:
+            if self._version is None:
+                return
+            if version is None or self._version != version - 1:
+                self._version = None
+                return
+            if before:
+                self._count((before["main_cat"], before["sub_cat"], before["brand"]), -1)
+            if after:
+                self._count((after["main_cat"], after["sub_cat"], after["brand"]), 1)
+            self._version = version
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+
+catalog_tree = CatalogTree(REFERENCE_CACHE_TTL)
+
+
+class NavigationTree:
+    """
+    The site menu (category -> sub-category -> brand) as one serialized document.
+
+    The tree is assembled from the catalog tree and the category, sub_category
+    and brand tables, and belongs to a state: the catalog versions of those
+    tables and of `products`, which every process writing them bumps. When the
+    state moves on, requests keep getting the previous document while a single
+    background thread rebuilds it (stale-while-revalidate); only the very first
+    build is waited for.
+    """
 
-        # Flatten results to a simple list of strings
-        sub_cat_list = [item[0] for item in distinct_sub_cats if item[0] is not None]
+    TABLES = CatalogTree.TABLES + ("category",)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+        self._body = None
+        self._etag = None
+        self._rebuilding = False
+
+    def _current_state(self, db):
+        return get_catalog_versions(db, self.TABLES)
+
+    def _build(self, db, state):
+        by_priority = lambda row: (row.priority, row.id)
+        categories = sorted(db.query(Category).all(), key=by_priority)
+        subcategories = {row.id: row for row in db.query(SubCategory).all()}
+        brands = {row.id: row for row in db.query(Brand).all()}
+        # The versions were read once for the whole build, not once per node
+        catalog_tree.refresh(db, state[:len(CatalogTree.TABLES)])
+        body = off_loop(self._assemble, categories, subcategories, brands)
+        with self._lock:
+            self._state = state
+            self._body = body
+            self._etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+    def _assemble(self, categories, subcategories, brands):
+        by_priority = lambda row: (row.priority, row.id)
+        tree = []
+        for category in categories:
+            sub_category_nodes = []
+            subcategory_ids = catalog_tree.subcategory_ids(category.main_category)
+            for sub_category in sorted((subcategories[i] for i in subcategory_ids if i in subcategories), key=by_priority):
+                brand_ids = catalog_tree.brand_ids(category.main_category, sub_category.subcat)
+                sub_category_nodes.append({
+                    "id": sub_category.id,
+                    "subcat": sub_category.subcat,
+                    "display_name": sub_category.display_name,
+                    "priority": sub_category.priority,
+                    "link": sub_category.link,
+                    "brands": [
+                        {
+                            "id": brand.id,
+                            "brand": brand.brand,
+                            "display_name": brand.display_name,
+                            "priority": brand.priority,
+                            "aws_link": brand.aws_link,
+                        }
+                        for brand in sorted((brands[i] for i in brand_ids if i in brands), key=by_priority)
+                    ],
+                })
+            tree.append({
+                "id": category.id,
+                "main_category": category.main_category,
+                "display_name": category.display_name,
+                "priority": category.priority,
+                "image_link": category.image_link,
+                "sub_categories": sub_category_nodes,
+            })
+
+        return json.dumps({"categories": tree}).encode()
+
+    def _rebuild_in_background(self):
+        db = SessionLocal()
+        try:
+            self._build(db, self._current_state(db))
+        except Exception as e:
+            print(f"Error rebuilding navigation tree: {e}")
+        finally:
+            db.close()
+            with self._lock:
+                self._rebuilding = False
+
+    def document(self, db):
+        """
+        Return (body, etag) of the navigation tree, scheduling a rebuild when it is stale.
+        """
+        state = self._current_state(db)
+        with self._lock:
+            body, etag = self._body, self._etag
+            if body is not None and (self._state == state or self._rebuilding):
+                return body, etag
+            if body is not None:
+                self._rebuilding = True
+        if body is None:
+            self._build(db, state)
+            with self._lock:
+                return self._body, self._etag
+        threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+        return body, etag
+
+
+navigation_tree = NavigationTree()
+
+
+@app.get("/navigation")
+async def get_navigation(request: Request, db=Depends(get_read_db)):
+    """
+    Get the whole category -> sub-category -> brand menu, sorted by priority.
+    """
+    try:
+        body, etag = await run_read(db, navigation_tree.document)
+        return cached_json_response(request, body, etag, REFERENCE_CACHE_MAX_AGE)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
-        # Query the `sub_category` table for matching subcategories
-        sub_category_details = (
-            db.query(SubCategory)
-            .filter(SubCategory.subcat.in_(sub_cat_list))
-            .all()
-        )
 
-        # Serialize results
-        result = [
-            {
-                "id": sub_category.id,
-                "subcat": sub_category.subcat,
-                "display_name": sub_category.display_name,
-                "priority": sub_category.priority,
-                "link": sub_category.link,
-            }
-            for sub_category in sub_category_details
-        ]
+def read_sub_category_details(db: Session, main_cat: str):
+    # Sub-category ids come from the precomputed catalog tree
+    catalog_tree.refresh(db)
+    subcategory_ids = off_loop(catalog_tree.subcategory_ids, main_cat)
+
+    # Query the `sub_category` table for matching subcategories
+    sub_category_details = (
+        db.query(SubCategory).filter(SubCategory.id.in_(subcategory_ids)).all()
+        if subcategory_ids else []
+    )
+
+    # Serialize results
+    result = [
+        {
+            "id": sub_category.id,
+            "subcat": sub_category.subcat,
+            "display_name": sub_category.display_name,
+            "priority": sub_category.priority,
+            "link": sub_category.link,
+        }
+        for sub_category in sub_category_details
+    ]
+
+    return {"main_category": main_cat, "sub_categories": result}
 
-        return {"main_category": main_cat, "sub_categories": result}
+
+@app.get("/products/distinct-sub-categories/{main_cat}")
+async def get_distinct_sub_category_details(
+    main_cat: str = Path(..., description="The main category to filter subcategories"),
+    db=Depends(get_read_db),
+):
+    """
+    Get the details of all subcategories in the `sub_category` table where
+    `subcat` matches the distinct `sub_cat` values filtered by `main_cat` from the `products` table.
+    """
+    try:
+        return await run_read(db, read_sub_category_details, main_cat)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
@@ -817,6 +4388,7 @@ def get_distinct_sub_category_details(
 def create_brand(db: Session, brand: BrandCreate):
     db_brand = Brand(**brand.model_dump())
     db.add(db_brand)
+    bump_catalog_version(db, "brand")
     db.commit()
     db.refresh(db_brand)
     return db_brand
@@ -827,6 +4399,7 @@ def update_brand(db: Session, brand_id: int, brand: BrandUpdate):
         return None
     for key, value in brand.model_dump(exclude_unset=True).items():
         setattr(db_brand, key, value)
+    bump_catalog_version(db, "brand")
     db.commit()
     db.refresh(db_brand)
     return db_brand
@@ -836,6 +4409,7 @@ def delete_brand(db: Session, brand_id: int):
     if not db_brand:
         return None
     db.delete(db_brand)
+    bump_catalog_version(db, "brand")
     db.commit()
     return db_brand
 
@@ -883,69 +4457,62 @@ def read_brand(brand_id: int, db: Session = Depends(get_db)):
     return brand
 
 @app.get("/brands")
-def read_all_brands(db: Session = Depends(get_db)):
+def read_all_brands(request: Request, db: Session = Depends(get_db)):
     """
     Get all brands.
     """
-    return get_all_brands(db)
+    return reference_cache.respond(request, db, "brand", lambda: get_all_brands(db))
+
+
+def read_category_brands(db: Session, main_cat: str, sub_cat: str):
+    # Step 1: Brand ids of the products in this category, from the precomputed catalog tree
+    catalog_tree.refresh(db)
+    brand_ids = off_loop(catalog_tree.brand_ids, main_cat, sub_cat)
+
+    # Step 2: Query the brand table to get details for the matched brands
+    if brand_ids:
+        brand_details = db.query(Brand).filter(Brand.id.in_(brand_ids)).all()
+
+        # Serialize the brand details
+        result = [
+            {
+                "id": brand.id,
+                "brand": brand.brand,
+                "display_name": brand.display_name,
+                "priority": brand.priority,
+                "aws_link": brand.aws_link,
+            }
+            for brand in brand_details
+        ]
+    else:
+        result = []
+
+    return {
+        "main_category": main_cat,
+        "sub_category": sub_cat,
+        "brands": result,
+    }
 
 
 @app.get("/products/unique_brands/{main_cat}/{sub_cat}")
-def get_brands_by_main_cat_and_sub_cat(
+async def get_brands_by_main_cat_and_sub_cat(
     main_cat: str = Path(..., description="Main category to filter products"),
     sub_cat: str = Path(..., description="Subcategory to filter products"),
-    db: Session = Depends(get_db),
+    db=Depends(get_read_db),
 ):
     """
     Query the products table by main_cat and sub_cat to retrieve all distinct brands
     and match them with brand details from the brand table.
     """
     try:
-        # Step 1: Query distinct brands from the products table
-        distinct_brands = (
-            db.query(Product.brand)
-            .filter(func.lower(Product.main_cat) == main_cat.lower())
-            .filter(func.lower(Product.sub_cat) == sub_cat.lower())
-            .distinct()
-            .all()
-        )
-
-        # Flatten the result to a simple list of brand names
-        brand_names = [item[0] for item in distinct_brands if item[0] is not None]
-
-        # Step 2: Query the brand table to get details for the matched brands
-        if brand_names:
-            brand_details = (
-                db.query(Brand)
-                .filter(or_(*[Brand.brand.like(f"%{name}%") for name in brand_names]))
-                .all()
-            )
-
-            # Serialize the brand details
-            result = [
-                {
-                    "id": brand.id,
-                    "brand": brand.brand,
-                    "display_name": brand.display_name,
-                    "priority": brand.priority,
-                    "aws_link": brand.aws_link,
-                }
-                for brand in brand_details
-            ]
-        else:
-            result = []
-
-        return {
-            "main_category": main_cat,
-            "sub_category": sub_cat,
-            "brands": result,
-        }
+        return await run_read(db, read_category_brands, main_cat, sub_cat)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
     
 def create_project(db: Session, project: ProjectCreate):
     db_project = Project(**project.model_dump())
     db.add(db_project)
+    bump_catalog_version(db, "projects")
     db.commit()
     db.refresh(db_project)
     return db_project
@@ -956,6 +4523,7 @@ def update_project(db: Session, project_id: int, project: ProjectUpdate):
         return None
     for key, value in project.model_dump(exclude_unset=True).items():
         setattr(db_project, key, value)
+    bump_catalog_version(db, "projects")
     db.commit()
     db.refresh(db_project)
     return db_project
@@ -965,6 +4533,7 @@ def delete_project(db: Session, project_id: int):
     if not db_project:
         return None
     db.delete(db_project)
+    bump_catalog_version(db, "projects")
     db.commit()
     return db_project
 
@@ -1012,11 +4581,11 @@ def read_project(project_id: int, db: Session = Depends(get_db)):
     return project
 
 @app.get("/projects")
-def read_all_projects(db: Session = Depends(get_db)):
+def read_all_projects(request: Request, db: Session = Depends(get_db)):
     """
     Get all projects.
     """
-    return get_all_projects(db)
+    return reference_cache.respond(request, db, "projects", lambda: get_all_projects(db))
 
 
 # client model
@@ -1051,12 +4620,15 @@ class ClientResponse(ClientBase):
 
 # client apis
 @app.get("/clients", response_model=List[ClientResponse])
-def get_all_clients(db: Session = Depends(get_db)):
+def get_all_clients(request: Request, db: Session = Depends(get_db)):
     """
     Retrieve all clients.
     """
-    clients = db.query(Client).order_by(asc(Client.priority)).all()
-    return clients
+    def load():
+        clients = db.query(Client).order_by(asc(Client.priority)).all()
+        return [ClientResponse.model_validate(client) for client in clients]
+
+    return reference_cache.respond(request, db, "clients", load)
 
 @app.get("/clients/{client_id}", response_model=ClientResponse)
 def get_client_by_id(client_id: int, db: Session = Depends(get_db)):
@@ -1080,6 +4652,7 @@ def update_client_by_id(client_id: int, client_update: ClientUpdate, db: Session
     for key, value in client_update.dict(exclude_unset=True).items():
         setattr(client, key, value)
 
+    bump_catalog_version(db, "clients")
     db.commit()
     db.refresh(client)
     return client
@@ -1094,6 +4667,7 @@ def delete_client_by_id(client_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Client not found")
 
     db.delete(client)
+    bump_catalog_version(db, "clients")
     db.commit()
     return {"message": "Client deleted successfully"}
 
@@ -1109,7 +4683,376 @@ def create_client(client: ClientCreate, db: Session = Depends(get_db)):
     )
 
     db.add(new_client)
+    bump_catalog_version(db, "clients")
     db.commit()
     db.refresh(new_client)
 
-    return new_client
\ No newline at end of file
+    return new_client
+
+
+# Bulk mutations: entity name -> (model, update schema used to validate changes)
+BULK_ENTITIES = {
+    "products": (Product, ProductUpdate),
+    "categories": (Category, CategoryUpdate),
+    "subcategories": (SubCategory, SubCategoryUpdate),
+    "brands": (Brand, BrandUpdate),
+    "clients": (Client, ClientUpdate),
+    "projects": (Project, ProjectUpdate),
+}
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "10000"))
+
+
+class BulkUpdateRequest(BaseModel):
+    ids: Optional[List[int]] = None  # rows to change
+    filter: Optional[Dict[str, Any]] = None  # column -> value, exact match
+    changes: Optional[Dict[str, Any]] = None  # same changes for every selected row
+    items: Optional[List[Dict[str, Any]]] = None  # per-row changes: [{"id": 1, "priority": 2}, ...]
+
+
+class BulkDeleteRequest(BaseModel):
+    ids: Optional[List[int]] = None
+    filter: Optional[Dict[str, Any]] = None
+
+
+def bulk_entity(entity: str):
+    if entity not in BULK_ENTITIES:
+        raise HTTPException(status_code=404, detail=f"Unknown entity '{entity}'")
+    return BULK_ENTITIES[entity]
+
+
+def validate_bulk_changes(schema, changes):
+    """
+    Validate a {column: value} dict against the entity's update schema.
+    """
+    if not changes:
+        raise HTTPException(status_code=400, detail="No changes given")
+    validated = {}
+    for key, value in changes.items():
+        field = schema.model_fields.get(key)
+        if field is None:
+            raise HTTPException(status_code=400, detail=f"Unknown field '{key}'")
+        try:
+            validated[key] = TypeAdapter(field.annotation).validate_python(value)
+        except ValidationError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid value for '{key}': {e.errors()[0]['msg']}")
+    return validated
+
+
+def bulk_conditions(model, ids, filter):
+    """
+    WHERE conditions selecting rows by id list and/or exact column matches.
+    """
+    if ids is None and not filter:
+        raise HTTPException(status_code=400, detail="Give ids or a filter to select rows")
+    if ids is not None and len(ids) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_ITEMS} ids per request")
+    conditions = []
+    if ids is not None:
+        conditions.append(model.id.in_(ids))
+    for key, value in (filter or {}).items():
+        column = model.__table__.columns.get(key)
+        if column is None:
+            raise HTTPException(status_code=400, detail=f"Unknown filter field '{key}'")
+        conditions.append(column.is_(None) if value is None else column == value)
+    return conditions
+
+
+def bulk_outcomes(ids, affected, status):
+    """
+    Per-item results: requested ids that were not touched are reported as not_found.
+    """
+    affected = set(affected)
+    if ids is None:
+        return [{"id": row_id, "status": status} for row_id in sorted(affected)]
+    return [{"id": row_id, "status": status if row_id in affected else "not_found"} for row_id in ids]
+
+
+def finish_bulk_write(db: Session, entity: str):
+    """
+    Commit a bulk write and refresh whatever caches depend on the entity.
+    """
+    bump_catalog_version(db, BULK_ENTITIES[entity][0].__tablename__)
+    db.commit()
+    if entity == "products":
+        products_changed_in_bulk()
+
+
+@app.patch("/bulk/{entity}")
+def bulk_update(entity: str, request: BulkUpdateRequest, db: Session = Depends(get_db)):
+    """
+    Update many rows of products, categories, subcategories, brands, clients or
+    projects in one transaction. Either apply `changes` to the rows selected by
+    `ids` and/or `filter` with one UPDATE, or apply per-row `items`.
+    """
+    model, schema = bulk_entity(entity)
+    try:
+        if request.items is not None:
+            if request.ids is not None or request.filter is not None or request.changes is not None:
+                raise HTTPException(status_code=400, detail="'items' cannot be combined with 'ids', 'filter' or 'changes'")
+            if len(request.items) > BULK_MAX_ITEMS:
+                raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_ITEMS} items per request")
+            rows = []
+            for item in request.items:
+                if not isinstance(item.get("id"), int):
+                    raise HTTPException(status_code=400, detail="Every item needs an integer 'id'")
+                rows.append({"id": item["id"], **validate_bulk_changes(schema, {k: v for k, v in item.items() if k != "id"})})
+            ids = [row["id"] for row in rows]
+            existing = set(db.scalars(select(model.id).where(model.id.in_(ids))))
+            found = [row for row in rows if row["id"] in existing]
+            if found:
+                # ORM bulk UPDATE by primary key (executemany)
+                db.execute(update(model), found)
+            finish_bulk_write(db, entity)
+            results = bulk_outcomes(ids, existing, "updated")
+        else:
+            changes = validate_bulk_changes(schema, request.changes)
+            conditions = bulk_conditions(model, request.ids, request.filter)
+            affected = db.scalars(
+                update(model)
+                .where(and_(*conditions))
+                .values(**changes)
+                .returning(model.id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            finish_bulk_write(db, entity)
+            results = bulk_outcomes(request.ids, affected, "updated")
+    except HTTPException:
+        db.rollback()
+        raise
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Bulk update failed, nothing was changed: {e.orig if hasattr(e, 'orig') else e}")
+
+    return {
+        "entity": entity,
+        "updated": sum(1 for result in results if result["status"] == "updated"),
+        "results": results,
+    }
+
+
+@app.delete("/bulk/{entity}")
+def bulk_delete(entity: str, request: BulkDeleteRequest, db: Session = Depends(get_db)):
+    """
+    Delete the rows selected by `ids` and/or `filter` with one DELETE statement.
+    """
+    model, _ = bulk_entity(entity)
+    try:
+        conditions = bulk_conditions(model, request.ids, request.filter)
+        affected = db.scalars(
+            model.__table__.delete().where(and_(*conditions)).returning(model.id)
+        ).all()
+        finish_bulk_write(db, entity)
+    except HTTPException:
+        db.rollback()
+        raise
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Bulk delete failed, nothing was deleted: {e.orig if hasattr(e, 'orig') else e}")
+
+    results = bulk_outcomes(request.ids, affected, "deleted")
+    return {
+        "entity": entity,
+        "deleted": sum(1 for result in results if result["status"] == "deleted"),
+        "results": results,
+    }
+
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    name = Column(String(255), nullable=False)
+    applied_at = Column(DateTime, nullable=False, default=datetime.now)
+
+
+# (version, name, function(conn), transactional). Non-transactional migrations
+# run on an AUTOCOMMIT connection, which CREATE INDEX CONCURRENTLY requires.
+MIGRATIONS = []
+
+# Arbitrary key of the PostgreSQL advisory lock that serializes concurrent `migrate` runs
+MIGRATION_LOCK_KEY = 4207
+
+
+def migration(version, name, transactional=True):
+    def register(function):
+        MIGRATIONS.append((version, name, function, transactional))
+        return function
+    return register
+
+
+def create_index(conn, name, definition, trigram=False):
+    """
+    CREATE INDEX `name` ON `definition` if it does not exist. On PostgreSQL the
+    index is built CONCURRENTLY so the table stays writable, and an INVALID
+    leftover of an interrupted build is dropped first.
+    """
+    if conn.dialect.name != "postgresql":
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}"))
+        return
+    valid = conn.execute(
+        text(
+            "SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+            "WHERE c.relname = :name"
+        ),
+        {"name": name},
+    ).scalar()
+    if valid is False:
+        print(f"Dropping invalid index {name} left by an interrupted build")
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    started = time.monotonic()
+    conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"))
+    print(f"Index {name} ready ({time.monotonic() - started:.1f}s)")
+
+
+# The tables that existed before migrations did. Tables added since are created
+# by their own migrations, so this one does not change when a model is added.
+BASELINE_TABLES = (Product, Brand, Project, Category, SubCategory, Client)
+
+
+@migration(1, "initial schema")
+def create_initial_schema(conn):
+    # Tables that already exist (databases created before migrations) are left alone
+    Base.metadata.create_all(bind=conn, tables=[model.__table__ for model in BASELINE_TABLES])
+
+
+@migration(2, "search indexes on products", transactional=False)
+def create_product_search_indexes(conn):
+    for column in ("main_cat", "sub_cat", "brand"):
+        create_index(conn, f"ix_products_lower_{column}", f"products (lower({column}))")
+    create_index(conn, "ix_products_main_cat_sub_cat_brand", "products (main_cat, sub_cat, brand)")
+    create_index(conn, "ix_products_code", "products (code)")
+
+    # Substring search (lower(column) ILIKE '%value%') can only use trigram indexes
+    if conn.dialect.name != "postgresql":
+        return
+    try:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except SQLAlchemyError as e:
+        print(f"pg_trgm is not available, skipping trigram indexes: {e}")
+        return
+    for column in SEARCH_FIELDS:
+        create_index(conn, f"ix_products_lower_{column}_trgm", f"products USING gin (lower({column}) gin_trgm_ops)")
+
+
+@migration(3, "image variants")
+def create_media_variants(conn):
+    MediaVariant.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(4, "one active media job")
+def create_media_job_active_index(conn):
+    MediaJob.__table__.create(bind=conn, checkfirst=True)
+    # Jobs started concurrently before this index existed: keep the latest one
+    active = conn.execute(
+        select(MediaJob.id).where(MediaJob.status.in_(MediaJobRunner.ACTIVE)).order_by(MediaJob.started_at.desc())
+    ).all()
+    for (job_id,) in active[1:]:
+        conn.execute(update(MediaJob).where(MediaJob.id == job_id).values(status="interrupted"))
+    # At most one row can be queued or running: every such row has the same key
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_media_jobs_active ON media_jobs ((1)) "
+        "WHERE status IN ('queued', 'running')"
+    ))
+
+
+@migration(5, "media objects")
+def create_media_objects(conn):
+    MediaObject.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(6, "catalog versions")
+def create_catalog_versions(conn):
+    CatalogVersion.__table__.create(bind=conn, checkfirst=True)
+
+
+def applied_migrations(conn):
+    SchemaMigration.__table__.create(bind=conn, checkfirst=True)
+    rows = conn.execute(select(SchemaMigration.version, SchemaMigration.applied_at)).all()
+    conn.commit()
+    return {version: applied_at for version, applied_at in rows}
+
+
+def pending_migrations(conn):
+    """
+    Versions of the migrations not applied to the database yet. Unlike
+    applied_migrations() this does not create `schema_migrations`.
+    """
+    done = set()
+    if inspect(conn).has_table(SchemaMigration.__tablename__):
+        done = set(conn.execute(select(SchemaMigration.version)).scalars())
+    return [version for version, _, _, _ in sorted(MIGRATIONS) if version not in done]
+
+
+def migrate():
+    """
+    Apply the pending migrations in version order and record each one in
+    `schema_migrations`. Returns the versions that were applied.
+    """
+    applied = []
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            # Session-level lock, held across the per-migration transactions below
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            done = applied_migrations(conn)
+            for version, name, function, transactional in sorted(MIGRATIONS):
+                if version in done:
+                    continue
+                print(f"Applying migration {version}: {name}")
+                if transactional:
+                    function(conn)
+                else:
+                    # `conn` is idle (no open transaction) here, which a concurrent
+                    # index build needs: it waits for every older transaction to end.
+                    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as autocommit:
+                        function(autocommit)
+                conn.execute(insert(SchemaMigration).values(version=version, name=name, applied_at=datetime.now()))
+                conn.commit()
+                applied.append(version)
+        finally:
+            if conn.dialect.name == "postgresql":
+                conn.rollback()
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+                conn.commit()
+    return applied
+
+
+def migration_status():
+    with engine.connect() as conn:
+        done = applied_migrations(conn)
+    return [
+        {"version": version, "name": name, "applied_at": done.get(version)}
+        for version, name, _, _ in sorted(MIGRATIONS)
+    ]
+
+
+def init_db():
+    """
+    Bring the database schema up to date. This is a one-off deployment step
+    (`python main.py migrate`), not something workers do on boot.
+    """
+    return migrate()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backend maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = commands.add_parser("migrate", help="Apply pending schema migrations")
+    migrate_parser.add_argument("--status", action="store_true", help="List migrations without applying them")
+    commands.add_parser("init-db", help="Alias of migrate")
+    gc_parser = commands.add_parser("gc-media", help="Report (or delete) stored files that nothing refers to")
+    gc_parser.add_argument("--delete", action="store_true", help="Delete the orphaned files instead of only reporting them")
+    gc_parser.add_argument("--min-age-hours", type=float, default=MEDIA_GC_MIN_AGE_HOURS, help="Keep files younger than this")
+    args = parser.parse_args()
+
+    if args.command == "gc-media":
+        print(json.dumps(collect_orphaned_media(not args.delete, args.min_age_hours), indent=2))
+    elif args.command == "migrate" and args.status:
+        for entry in migration_status():
+            state = f"applied {entry['applied_at']:%Y-%m-%d %H:%M:%S}" if entry["applied_at"] else "pending"
+            print(f"{entry['version']:>4}  {entry['name']:<40} {state}")
+    else:
+        applied = init_db()
+        print(f"Applied migrations: {', '.join(map(str, applied))}" if applied else "Schema is up to date")
@@ -0,0 +1,76 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# main.py reads its settings at import time
+TEST_DIR = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}",
+    "DB_ASYNC": "false",
+    "STORAGE_BACKEND": "local",
+    "LOCAL_STORAGE_DIR": os.path.join(TEST_DIR, "storage"),
+    "STORAGE_PUBLIC_URL": "http://testserver",
+    "UPLOAD_SIGNING_SECRET": "test-secret",
+    "AWS_BUCKET_NAME": "test-bucket",
+    "IMAGE_VARIANTS_ENABLED": "false",
+    "MEDIA_JOB_DIR": TEST_DIR,
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    main.init_db()
+    yield
+    main.engine.dispose()
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def empty_catalog():
+    """
+    Every test starts without products, media or stored files.
+    """
+    db = main.SessionLocal()
+    try:
+        for model in (main.Product, main.MediaObject, main.MediaVariant, main.MediaJob, main.Brand, main.Category, main.Client):
+            db.query(model).delete()
+        for name in ("products", "brand", "category", "clients"):
+            main.bump_catalog_version(db, name)
+        db.commit()
+    finally:
+        db.close()
+    main.products_changed_in_bulk()
+    main.media_index._urls.clear()
+    shutil.rmtree(main.LOCAL_STORAGE_DIR, ignore_errors=True)
+    yield
+
+
+@pytest.fixture
+def db():
+    session = main.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def add_products(db, rows):
+    """
+    Insert product rows (dicts of columns) and bump the catalog version like a write endpoint.
+    """
+    db.add_all([main.Product(**row) for row in rows])
+    main.bump_catalog_version(db)
+    db.commit()
+    main.products_changed_in_bulk()
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import main
+from conftest import add_products
+
+pytest.importorskip("aiosqlite")
+
+READ_PATHS = [
+    "/distinct-values",
+    "/distinct-categories",
+    "/search-products-extended?brand=fes",
+    "/search-products-extended?brand=fes&main_cat=valves&count_mode=estimated",
+    "/navigation",
+    "/products/distinct-sub-categories/Valves",
+    "/products/unique_brands/Valves/Cylinders",
+]
+
+
+@pytest.fixture
+def catalog(db):
+    db.add(main.Category(main_category="Valves", display_name="Valves", priority=1, image_link=""))
+    db.add(main.SubCategory(subcat="Cylinders", display_name="Cylinders", priority=1, link=""))
+    db.add(main.Brand(brand="Festo", display_name="Festo", priority=1, aws_link=""))
+    add_products(db, [
+        {"code": f"C{i}", "main_cat": "Valves", "sub_cat": "Cylinders", "brand": brand}
+        for i, brand in enumerate(["Festo", "Festo", "SMC", "Norgren"])
+    ])
+    main.search_index.rebuild()
+
+
+@pytest.fixture
+def async_reads(monkeypatch):
+    """
+    Serve the read endpoints through AsyncSession.run_sync on aiosqlite, as with DB_ASYNC=true.
+    """
+    engine = create_async_engine(main.async_database_url(main.DATABASE_URL), poolclass=NullPool)
+    monkeypatch.setattr(main, "AsyncSessionLocal", async_sessionmaker(engine, autoflush=False, expire_on_commit=False))
+    yield
+
+
+def record_index_work(monkeypatch):
+    """
+    Record the index work done during the requests, and whether each call ran on
+    a thread with a running event loop.
+    """
+    calls = []
+    for owner, name in [
+        (main.facet_store, "_count_rows"),
+        (main.search_index, "_candidates"),
+        (main.catalog_tree, "_load_combos"),
+        (main.navigation_tree, "_assemble"),
+    ]:
+        method = getattr(owner, name)
+
+        def recording(*args, method=method, name=name):
+            calls.append((name, asyncio._get_running_loop() is not None))
+            return method(*args)
+
+        monkeypatch.setattr(owner, name, recording)
+    return calls
+
+
+def test_async_reads_match_sync_reads(client, catalog, async_reads, monkeypatch):
+    with monkeypatch.context() as sync:
+        sync.setattr(main, "AsyncSessionLocal", None)
+        expected = {path: client.get(path).json() for path in READ_PATHS}
+
+    main.products_changed_in_bulk()
+    main.search_index.rebuild()
+    for path in READ_PATHS:
+        response = client.get(path)
+        assert response.status_code == 200, (path, response.text)
+        assert response.json() == expected[path], path
+
+
+def test_async_reads_do_index_work_off_the_event_loop(client, catalog, async_reads, monkeypatch):
+    main.products_changed_in_bulk()
+    main.navigation_tree._body = None
+    main.search_index.rebuild()
+    calls = record_index_work(monkeypatch)
+
+    for path in READ_PATHS:
+        assert client.get(path).status_code == 200, path
+
+    assert {name for name, _ in calls} == {"_count_rows", "_candidates", "_load_combos", "_assemble"}
+    assert [name for name, on_loop in calls if on_loop] == []
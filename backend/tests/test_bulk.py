@@ -0,0 +1,59 @@
+import pytest
+
+import main
+from conftest import add_products
+
+
+@pytest.fixture
+def product_ids(db):
+    add_products(db, [{"code": f"C{i}", "brand": "Acme", "model": f"M{i}"} for i in range(3)])
+    return [product_id for (product_id,) in db.query(main.Product.id).order_by(main.Product.id)]
+
+
+def test_items_report_updated_and_not_found_rows(client, db, product_ids):
+    missing = max(product_ids) + 100
+    response = client.patch("/bulk/products", json={"items": [
+        {"id": product_ids[0], "model": "New0"},
+        {"id": missing, "model": "Nowhere"},
+        {"id": product_ids[2], "brand": "Other"},
+    ]})
+    assert response.status_code == 200
+    assert response.json() == {
+        "entity": "products",
+        "updated": 2,
+        "results": [
+            {"id": product_ids[0], "status": "updated"},
+            {"id": missing, "status": "not_found"},
+            {"id": product_ids[2], "status": "updated"},
+        ],
+    }
+    db.expire_all()
+    rows = {row.id: (row.brand, row.model) for row in db.query(main.Product)}
+    assert rows == {product_ids[0]: ("Acme", "New0"), product_ids[1]: ("Acme", "M1"), product_ids[2]: ("Other", "M2")}
+
+
+def test_changes_report_ids_that_were_not_found(client, db, product_ids):
+    missing = max(product_ids) + 100
+    response = client.patch("/bulk/products", json={"ids": [product_ids[1], missing], "changes": {"brand": "Other"}})
+    assert response.status_code == 200
+    assert response.json()["results"] == [{"id": product_ids[1], "status": "updated"}, {"id": missing, "status": "not_found"}]
+    db.expire_all()
+    assert [brand for (brand,) in db.query(main.Product.brand).order_by(main.Product.id)] == ["Acme", "Other", "Acme"]
+
+
+@pytest.mark.parametrize("body", [
+    {"ids": [1], "changes": {"colour": "red"}},
+    {"items": [{"id": 1, "colour": "red"}]},
+])
+def test_unknown_field_is_rejected_without_changes(client, db, product_ids, body):
+    response = client.patch("/bulk/products", json=body)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown field 'colour'"
+
+
+@pytest.mark.parametrize("extra", [{"ids": [1]}, {"filter": {"brand": "Acme"}}, {"changes": {"brand": "Other"}}])
+def test_items_cannot_be_mixed_with_a_selection(client, db, product_ids, extra):
+    response = client.patch("/bulk/products", json={"items": [{"id": product_ids[0], "model": "New0"}], **extra})
+    assert response.status_code == 400
+    db.expire_all()
+    assert db.query(main.Product.model).filter(main.Product.id == product_ids[0]).scalar() == "M0"
@@ -0,0 +1,25 @@
+import csv
+import io
+import json
+
+import pyarrow.parquet
+import pytest
+
+from conftest import add_products
+
+
+@pytest.fixture
+def catalog(db):
+    add_products(db, [{"code": f"C{i}", "brand": "Festo" if i % 2 else "Sick", "model": f"M{i}"} for i in range(25)])
+
+
+def test_export_formats_agree(client, catalog):
+    rows = list(csv.DictReader(io.StringIO(client.get("/products/export", params={"brand": "fest"}).text)))
+    lines = [json.loads(line) for line in client.get("/products/export", params={"brand": "fest", "format": "ndjson"}).text.splitlines()]
+    response = client.get("/products/export", params={"brand": "fest", "format": "parquet"})
+    assert response.status_code == 200
+    table = pyarrow.parquet.read_table(io.BytesIO(response.content)).to_pylist()
+
+    assert len(rows) == len(lines) == len(table) == 12
+    assert [row["code"] for row in rows] == [line["code"] for line in lines] == [row["code"] for row in table]
+    assert table[0]["id"] == lines[0]["id"] and table[0]["pdf"] is None
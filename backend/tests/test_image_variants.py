@@ -0,0 +1,61 @@
+import io
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import main
+
+pytest.importorskip("PIL")
+from PIL import Image  # noqa: E402
+
+import imaging  # noqa: E402
+
+
+def png(width, height):
+    output = io.BytesIO()
+    Image.new("RGBA", (width, height), (200, 30, 30, 128)).save(output, "PNG")
+    return output.getvalue()
+
+
+def test_render_image_variants_sizes_and_formats():
+    rendered = imaging.render_image_variants(png(2000, 1000), main.IMAGE_VARIANTS, ["webp", "jpeg"], 80)
+
+    sizes = {(variant, image_format): (width, height) for variant, image_format, _, width, height in rendered}
+    assert sizes == {
+        ("full", "webp"): (1600, 800), ("full", "jpeg"): (1600, 800),
+        ("card", "webp"): (480, 240), ("card", "jpeg"): (480, 240),
+        ("thumbnail", "webp"): (128, 64), ("thumbnail", "jpeg"): (128, 64),
+    }
+    for variant, image_format, content, _, _ in rendered:
+        with Image.open(io.BytesIO(content)) as image:
+            assert image.format == image_format.upper()
+
+
+def test_imaging_does_not_import_the_application():
+    # The spawned pool processes import imaging; they must not build the app
+    code = "import sys, imaging; assert 'main' not in sys.modules and 'sqlalchemy' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(imaging.__file__), check=True)
+
+
+def test_stored_image_gets_variants_from_its_storage_key(db, monkeypatch):
+    variants = main.ImageVariants(workers=1, max_pending=4)
+    monkeypatch.setattr(main, "image_variants", variants)
+    monkeypatch.setattr(main, "IMAGE_VARIANTS_ENABLED", True)
+    try:
+        url = main.store_media(io.BytesIO(png(640, 320)), "images", ".png", "image/png")
+
+        deadline = time.monotonic() + 60
+        while db.query(main.MediaVariant).count() < 6 and time.monotonic() < deadline:
+            time.sleep(0.1)
+        rows = db.query(main.MediaVariant).filter(main.MediaVariant.source_key == main.source_key(url)).all()
+    finally:
+        variants.shutdown()
+
+    assert {(row.variant, row.format, row.width) for row in rows} == {
+        ("full", "webp", 640), ("full", "jpeg", 640),
+        ("card", "webp", 480), ("card", "jpeg", 480),
+        ("thumbnail", "webp", 128), ("thumbnail", "jpeg", 128),
+    }
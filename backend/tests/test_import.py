@@ -0,0 +1,65 @@
+import io
+
+import openpyxl
+from sqlalchemy.exc import OperationalError
+
+import main
+
+
+def csv_file(rows, tail=b""):
+    lines = ["code,brand,model"] + [f"C{i},Brand{i % 3},M{i}" for i in range(rows)]
+    return ("products.csv", ("\n".join(lines) + "\n").encode() + tail, "text/csv")
+
+
+def test_import_reports_inserts_updates_and_invalid_rows(client, db):
+    response = client.post("/products/import", files={"file": csv_file(5)}, params={"chunk_size": 2})
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 5
+    body = "code,brand\nC1,Changed\n,Without code\nC9," + "x" * 300 + "\n"
+    report = client.post("/products/import", files={"file": ("p.csv", body.encode(), "text/csv")}).json()
+    assert (report["inserted"], report["updated"], report["failed"]) == (1, 1, 1)
+    assert report["errors"][0]["row"] == 4
+    assert db.query(main.Product).filter(main.Product.code == "C1").one().brand == "Changed"
+
+
+def test_unreadable_file_returns_the_partial_report(client, db):
+    # Invalid UTF-8 well past the first decoded block
+    response = client.post("/products/import", files={"file": csv_file(3000, b"C-bad,\xff\xfe,x\n")}, params={"chunk_size": 500})
+    assert response.status_code == 422
+    detail = response.json()["detail"]
+    assert detail["aborted_at_row"] > 2
+    # Everything read before the broken part was written and is reported
+    assert detail["inserted"] == db.query(main.Product).count() == detail["aborted_at_row"] - 2
+    assert "Could not read the file" in detail["message"]
+
+
+def test_truncated_workbook(client, db):
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["code", "brand"])
+    for i in range(100):
+        workbook.active.append([f"C{i}", "B"])
+    data = io.BytesIO()
+    workbook.save(data)
+    truncated = data.getvalue()[: len(data.getvalue()) // 2]
+    response = client.post("/products/import", files={"file": ("p.xlsx", truncated, "application/octet-stream")})
+    assert response.status_code == 422
+    assert response.json()["detail"]["inserted"] == 0
+
+
+def test_database_failure_is_not_reported_as_unreadable(client, db, monkeypatch):
+    calls = []
+    write_chunk = main.import_product_chunk
+
+    def failing_chunk(session, rows, columns):
+        calls.append(len(rows))
+        if len(calls) == 3:
+            raise OperationalError("INSERT", {}, Exception("connection lost"))
+        return write_chunk(session, rows, columns)
+
+    monkeypatch.setattr(main, "import_product_chunk", failing_chunk)
+    response = client.post("/products/import", files={"file": csv_file(10)}, params={"chunk_size": 3})
+    assert response.status_code == 500
+    detail = response.json()["detail"]
+    assert detail["inserted"] == db.query(main.Product).count() == 6
+    assert detail["aborted_at_row"] == 8
+    assert detail["message"].startswith("Database error")
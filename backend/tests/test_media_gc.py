@@ -0,0 +1,96 @@
+import io
+import os
+import time
+
+import pytest
+
+import main
+from conftest import add_products
+
+DAY = 24 * 3600
+
+
+def stored_key(url):
+    return main.storage_key_from_url(url)
+
+
+def age(key, seconds):
+    path = main.get_s3_client().path(key)
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def put(key, content=b"variant"):
+    main.get_s3_client().put_object(Bucket=main.AWS_BUCKET_NAME, Key=key, Body=content)
+
+
+@pytest.fixture
+def media(db):
+    """
+    An image and a PDF used by a product, with one variant; an orphaned image
+    with one variant; an orphan uploaded moments ago; a file outside the GC prefixes.
+    """
+    used_image = main.store_media(io.BytesIO(b"used image"), "images", ".png", "image/png")
+    used_pdf = main.store_media(io.BytesIO(b"used pdf"), "pdfs", ".pdf", "application/pdf")
+    orphan = main.store_media(io.BytesIO(b"orphan image"), "images", ".png", "image/png")
+    recent = main.store_media(io.BytesIO(b"recent orphan"), "product_images", ".png", "image/png")
+    add_products(db, [{"code": "P1", "images": used_image, "pdf": used_pdf}])
+
+    keys = {
+        "used_image": stored_key(used_image),
+        "used_pdf": stored_key(used_pdf),
+        "used_variant": f"variants/{main.source_key(used_image)}/card.webp",
+        "orphan": stored_key(orphan),
+        "orphan_variant": f"variants/{main.source_key(orphan)}/card.webp",
+        "recent": stored_key(recent),
+        "unmanaged": "exports/catalog.csv",
+    }
+    for name in ("used_variant", "orphan_variant", "unmanaged"):
+        put(keys[name])
+    for name, key in keys.items():
+        if name != "recent":
+            age(key, 2 * DAY)
+    return keys
+
+
+def existing(keys):
+    storage = main.get_s3_client()
+    return {name for name, key in keys.items() if os.path.isfile(storage.path(key))}
+
+
+def test_dry_run_reports_orphans_and_deletes_nothing(media):
+    report = main.collect_orphaned_media(dry_run=True, min_age_hours=24)
+
+    assert report["dry_run"]
+    assert sorted(report["orphaned_keys"]) == sorted([media["orphan"], media["orphan_variant"]])
+    assert report["recent"] == 1
+    assert report["scanned"] == 6
+    assert report["deleted"] == 0
+    assert existing(media) == set(media)
+
+
+def test_delete_removes_only_old_orphans(media, db):
+    report = main.collect_orphaned_media(dry_run=False, min_age_hours=24)
+
+    assert report["deleted"] == 2
+    assert report["errors"] == []
+    assert existing(media) == set(media) - {"orphan", "orphan_variant"}
+    # The deleted file is no longer a dedupe target
+    assert db.query(main.MediaObject).filter(main.MediaObject.file_key == media["orphan"]).count() == 0
+
+
+def test_delete_keeps_files_attached_during_the_scan(media, db, monkeypatch):
+    referenced_media = main.referenced_media
+
+    def attach_then_check(session, source_urls=None):
+        if source_urls is not None:
+            # A product starts using the orphan between the listing and the delete
+            add_products(db, [{"code": "P2", "images": main.s3_object_url(media["orphan"])}])
+        return referenced_media(session, source_urls)
+
+    monkeypatch.setattr(main, "referenced_media", attach_then_check)
+
+    report = main.collect_orphaned_media(dry_run=False, min_age_hours=24)
+
+    assert report["orphaned"] == 2
+    assert "orphan" in existing(media)
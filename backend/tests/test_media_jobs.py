@@ -0,0 +1,140 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import main
+
+
+def add_job(db, job_id, status):
+    db.add(main.MediaJob(id=job_id, status=status, started_at=datetime.now(), updated_at=datetime.now()))
+    db.commit()
+
+
+def test_only_one_active_job(db):
+    add_job(db, "first", "running")
+    add_job(db, "old", "failed")
+    db.add(main.MediaJob(id="second", status="queued", started_at=datetime.now(), updated_at=datetime.now()))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+
+def test_start_returns_the_active_job(client, db):
+    add_job(db, "running-elsewhere", "running")
+    # Neither a restart nor resuming another job may start a second one
+    response = client.put("/process-links", params={"restart": True}).json()
+    assert response["job_id"] == "running-elsewhere"
+    assert "not restarted" in response["message"]
+    add_job(db, "old", "interrupted")
+    job, created = main.media_jobs.start()
+    assert (job.id, created) == ("running-elsewhere", False)
+    statuses = dict(db.query(main.MediaJob.id, main.MediaJob.status))
+    assert statuses == {"running-elsewhere": "running", "old": "interrupted"}
+
+
+class FakeMigrator:
+    """
+    Stands in for media_migrator: "copies" every link except broken ones, and
+    can fail or stop the job when a given batch comes in.
+    """
+
+    def __init__(self, fail_on_batch=None, stop_after_batch=None, runner=None):
+        self.fail_on_batch = fail_on_batch
+        self.stop_after_batch = stop_after_batch
+        self.runner = runner
+        self.batches = 0
+        self.links = []
+
+    def run(self, tasks):
+        self.batches += 1
+        if self.batches == self.fail_on_batch:
+            raise RuntimeError("storage went away")
+        for key, link, folder in tasks:
+            self.links.append(link)
+            yield key, None if "broken" in link else main.s3_object_url(f"{folder}/{link.rsplit('/', 1)[1]}")
+        if self.batches == self.stop_after_batch:
+            self.runner._stopping.set()
+
+
+@pytest.fixture
+def catalog(db, monkeypatch):
+    monkeypatch.setattr(main, "MEDIA_JOB_BATCH_SIZE", 3)
+    db.add_all([
+        main.Product(code=f"P{i}", images=f"http://media.example/{i}.png", pdf="http://media.example/broken.pdf" if i == 5 else None)
+        for i in range(10)
+    ])
+    db.commit()
+    return [product_id for (product_id,) in db.query(main.Product.id).order_by(main.Product.id)]
+
+
+def wait_for(runner, job_id):
+    with runner._lock:
+        thread = runner._threads.get(job_id)
+    if thread is not None:
+        thread.join(10)
+
+
+def job_state(db, job_id):
+    db.expire_all()
+    return runner_report(db.query(main.MediaJob).filter(main.MediaJob.id == job_id).one())
+
+
+def runner_report(job):
+    return {key: getattr(job, key) for key in ("status", "total", "processed", "updated", "failed", "last_product_id")}
+
+
+def csv_codes(job_id, db):
+    path = db.query(main.MediaJob.csv_file).filter(main.MediaJob.id == job_id).scalar()
+    with open(path, newline="", encoding="utf-8") as file:
+        return [row[1] for row in list(main.csv.reader(file))[1:]]
+
+
+def test_failed_job_resumes_after_its_checkpoint(db, catalog, monkeypatch):
+    runner = main.MediaJobRunner()
+    first = FakeMigrator(fail_on_batch=3)
+    monkeypatch.setattr(main, "media_migrator", first)
+
+    job, created = runner.start()
+    wait_for(runner, job.id)
+
+    # Two batches of three were committed before the third failed
+    assert created
+    state = job_state(db, job.id)
+    assert state == {"status": "failed", "total": 10, "processed": 6, "updated": 6, "failed": 1, "last_product_id": catalog[5]}
+    assert db.query(main.Product).filter(main.Product.images.startswith(main.s3_object_url(""))).count() == 6
+
+    second = FakeMigrator()
+    monkeypatch.setattr(main, "media_migrator", second)
+    resumed, created = runner.start()
+    wait_for(runner, job.id)
+
+    assert (resumed.id, created) == (job.id, False)
+    assert second.links == [f"http://media.example/{i}.png" for i in range(6, 10)]
+    assert job_state(db, job.id) == {
+        "status": "completed", "total": 10, "processed": 10, "updated": 10, "failed": 1, "last_product_id": catalog[-1],
+    }
+    assert csv_codes(job.id, db) == [f"P{i}" for i in range(10)]
+
+
+def test_interrupted_job_is_resumed_by_the_next_process(db, catalog, monkeypatch):
+    stopping = main.MediaJobRunner()
+    monkeypatch.setattr(main, "media_migrator", FakeMigrator(stop_after_batch=2, runner=stopping))
+    job, _ = stopping.start()
+    wait_for(stopping, job.id)
+
+    assert job_state(db, job.id)["status"] == "interrupted"
+    assert job_state(db, job.id)["processed"] == 6
+
+    # A new process picks the job up on startup
+    restarted = main.MediaJobRunner()
+    rest = FakeMigrator()
+    monkeypatch.setattr(main, "media_migrator", rest)
+    restarted.resume_interrupted()
+    wait_for(restarted, job.id)
+
+    assert rest.links == [f"http://media.example/{i}.png" for i in range(6, 10)]
+    state = job_state(db, job.id)
+    assert (state["status"], state["processed"], state["updated"], state["failed"]) == ("completed", 10, 10, 1)
+    report = restarted.report(db.query(main.MediaJob).filter(main.MediaJob.id == job.id).one())
+    assert report["processed"] == 10 and report["throughput_per_second"] >= 0
@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import main
+
+
+class MediaServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the remote media hosts. Paths:
+    /ok/<name>            200 after a short delay
+    /fail/<n>/<name>      503 for the first n requests, then 200
+    /stall/<n>/<name>     answers slower than the read timeout for the first n requests
+    /missing/<name>       404
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), MediaHandler)
+        self.lock = threading.Lock()
+        self.requests = Counter()  # path -> requests received
+        self.in_flight = Counter()  # Host header -> requests being served
+        self.max_in_flight = Counter()
+
+    def url(self, path, host="127.0.0.1"):
+        return f"http://{host}:{self.server_address[1]}{path}"
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        host = self.headers["Host"].split(":")[0]
+        with server.lock:
+            server.requests[self.path] += 1
+            attempt = server.requests[self.path]
+            server.in_flight[host] += 1
+            server.max_in_flight[host] = max(server.max_in_flight[host], server.in_flight[host])
+        try:
+            kind, *rest = self.path.strip("/").split("/")
+            if kind == "missing":
+                return self.send_error(404)
+            if kind == "fail" and attempt <= int(rest[0]):
+                return self.send_error(503)
+            if kind == "stall" and attempt <= int(rest[0]):
+                time.sleep(0.5)
+            time.sleep(0.05)
+            body = f"media {self.path}".encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight[host] -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def media_server():
+    server = MediaServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def storage():
+    return main.LocalStorage(main.LOCAL_STORAGE_DIR)
+
+
+def migrator(storage, **options):
+    options = {"retries": 2, "backoff": 0, "timeout": (1, 0.25), **options}
+    return main.MediaMigrator(s3_client=storage, **options)
+
+
+def stored_content(storage, url):
+    return storage.get_object(Bucket=main.AWS_BUCKET_NAME, Key=main.storage_key_from_url(url))["Body"].read()
+
+
+def test_retries_server_errors_and_timeouts(media_server, storage):
+    transfers = migrator(storage)
+    flaky = media_server.url("/fail/2/a.png")
+    stalled = media_server.url("/stall/1/b.png")
+
+    flaky_url = transfers.transfer(flaky, "images")
+    stalled_url = transfers.transfer(stalled, "images")
+
+    assert media_server.requests["/fail/2/a.png"] == 3
+    assert stored_content(storage, flaky_url) == b"media /fail/2/a.png"
+    assert media_server.requests["/stall/1/b.png"] >= 2
+    assert stored_content(storage, stalled_url) == b"media /stall/1/b.png"
+
+
+def test_concurrency_per_host_stays_within_the_limit(media_server, storage):
+    transfers = migrator(storage, concurrency=8, per_host=2)
+    tasks = [
+        (f"{host}-{i}", media_server.url(f"/ok/{host}-{i}.png", host), "images")
+        for host in ("127.0.0.1", "localhost")
+        for i in range(8)
+    ]
+
+    results = dict(transfers.run(tasks))
+
+    assert all(results.values())
+    assert media_server.max_in_flight == {"127.0.0.1": 2, "localhost": 2}
+
+
+def test_failed_links_are_reported_not_raised(media_server, storage):
+    transfers = migrator(storage)
+    tasks = [
+        ("missing", media_server.url("/missing/c.png"), "images"),
+        ("down", media_server.url("/fail/99/d.png"), "images"),
+        ("ok", media_server.url("/ok/e.png"), "images"),
+    ]
+
+    results = dict(transfers.run(tasks))
+
+    assert results["missing"] is None
+    assert results["down"] is None
+    assert results["ok"].startswith(main.s3_object_url("images/"))
+    # 404 is not worth retrying; 503 is, until the retries run out
+    assert media_server.requests["/missing/c.png"] == 1
+    assert media_server.requests["/fail/99/d.png"] == 3
@@ -0,0 +1,29 @@
+from sqlalchemy import create_engine, inspect
+
+import main
+
+
+def apply(conn, versions):
+    for version, _, function, _ in sorted(main.MIGRATIONS):
+        if version in versions:
+            function(conn)
+    return set(inspect(conn).get_table_names())
+
+
+def test_initial_schema_creates_only_the_baseline_tables():
+    with create_engine("sqlite://").begin() as conn:
+        tables = apply(conn, {1})
+    assert tables == {"products", "brand", "projects", "category", "sub_category", "clients"}
+
+
+def test_migrations_create_every_model_table():
+    with create_engine("sqlite://").begin() as conn:
+        tables = apply(conn, {version for version, _, _, _ in main.MIGRATIONS})
+    assert tables == set(main.Base.metadata.tables) - {main.SchemaMigration.__tablename__}
+
+
+def test_migrations_leave_tables_created_before_them_alone():
+    # Databases whose initial schema was created from every model at the time
+    with create_engine("sqlite://").begin() as conn:
+        main.Base.metadata.create_all(bind=conn)
+        assert apply(conn, {version for version, _, _, _ in main.MIGRATIONS}) == set(main.Base.metadata.tables)
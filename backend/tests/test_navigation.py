@@ -0,0 +1,73 @@
+import time
+
+from sqlalchemy import text
+
+import main
+from conftest import add_products
+
+
+def edit_in_other_worker(db, statement, table):
+    """
+    Change a reference table the way another worker process would: the write and
+    its catalog version bump reach the database, this process's caches are not told.
+    """
+    db.execute(text(statement))
+    main.bump_catalog_version(db, table)
+    db.commit()
+
+
+def navigation_after_rebuild(client, expected):
+    # The first request after a change still gets the previous document and starts the rebuild
+    for _ in range(100):
+        body = client.get("/navigation").json()
+        if expected(body):
+            return body
+        time.sleep(0.05)
+    raise AssertionError(f"navigation never changed: {body}")
+
+
+def test_navigation_sees_category_edits_from_other_workers(client, db):
+    db.add(main.Category(main_category="Tools", display_name="Tools", priority=1, image_link=""))
+    db.commit()
+    add_products(db, [{"main_cat": "Tools", "sub_cat": "Drills", "brand": "Acme"}])
+    navigation_after_rebuild(client, lambda body: [c["display_name"] for c in body["categories"]] == ["Tools"])
+
+    edit_in_other_worker(db, "UPDATE category SET display_name = 'Power tools'", "category")
+
+    body = navigation_after_rebuild(client, lambda body: body["categories"][0]["display_name"] == "Power tools")
+    assert [category["main_category"] for category in body["categories"]] == ["Tools"]
+
+
+def test_reference_lists_see_edits_from_other_workers(client, db):
+    db.add(main.Category(main_category="Tools", display_name="Tools", priority=1, image_link=""))
+    db.commit()
+    first = client.get("/categories")
+    assert [category["display_name"] for category in first.json()] == ["Tools"]
+    assert client.get("/categories", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    edit_in_other_worker(db, "UPDATE category SET display_name = 'Power tools'", "category")
+
+    second = client.get("/categories", headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 200
+    assert [category["display_name"] for category in second.json()] == ["Power tools"]
+
+
+def test_navigation_build_reads_the_catalog_versions_once(client, db, monkeypatch):
+    db.add(main.Category(main_category="Tools", display_name="Tools", priority=1, image_link=""))
+    db.add(main.Category(main_category="Garden", display_name="Garden", priority=2, image_link=""))
+    db.commit()
+    add_products(db, [
+        {"main_cat": "Tools", "sub_cat": "Drills", "brand": "Acme"},
+        {"main_cat": "Garden", "sub_cat": "Hoses", "brand": "Acme"},
+    ])
+    calls = []
+    original = main.get_catalog_versions
+    monkeypatch.setattr(main, "get_catalog_versions", lambda *args: calls.append(args[1]) or original(*args))
+
+    session = main.SessionLocal()
+    try:
+        main.navigation_tree._build(session, main.navigation_tree._current_state(session))
+    finally:
+        session.close()
+
+    assert calls == [main.NavigationTree.TABLES]
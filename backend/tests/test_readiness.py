@@ -0,0 +1,32 @@
+from sqlalchemy import delete
+
+import main
+
+
+def forget_latest_migration():
+    latest = max(version for version, _, _, _ in main.MIGRATIONS)
+    with main.engine.begin() as conn:
+        conn.execute(delete(main.SchemaMigration).where(main.SchemaMigration.version == latest))
+    return latest
+
+
+def test_ready_when_every_migration_is_applied(client, monkeypatch):
+    monkeypatch.setattr(main, "readiness", main.Readiness())
+
+    assert main.readiness.check()
+    assert client.get("/readyz").status_code == 200
+
+
+def test_not_ready_until_pending_migrations_are_applied(client, monkeypatch):
+    monkeypatch.setattr(main, "readiness", main.Readiness())
+    latest = forget_latest_migration()
+
+    assert not main.readiness.check()
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["database"]["ready"]
+    assert "python main.py migrate" in response.json()["schema"]["error"]
+
+    assert main.migrate() == [latest]
+    assert main.readiness.check()
+    assert client.get("/readyz").status_code == 200
@@ -0,0 +1,130 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+
+import main
+from conftest import add_products
+
+VALUES = [
+    "Festo", "FESTO", "festo-pneumatic", "Sick AG", "Omron", "Pepperl+Fuchs",
+    "50% duty", "50_x", "5000", "back\\slash", "Ölventil", "straße", "STRASSE", "İzmir", "ıi", "ǅemal", "",
+]
+
+NEEDLES = [
+    "fes", "FESTO", "sto", "o", "fe", "ick a", "pneumatic", "xyz", "+fu",
+    "%", "50%", "_", "0_x", "5_0", "\\", "k\\s",
+    "öl", "ÖL", "ß", "strasse", "İ", "i", "ı", "ǆ", "",
+]
+
+
+def matching_ids(db, criteria):
+    query = db.query(main.Product.id).filter(*main.build_search_filters(db, criteria))
+    return sorted(product_id for (product_id,) in query)
+
+
+def ilike_ids(db, criteria):
+    filters = [
+        main.func.lower(getattr(main.Product, column)).ilike(f"%{value.lower()}%")
+        for column, value in criteria.items()
+    ]
+    return sorted(product_id for (product_id,) in db.query(main.Product.id).filter(*filters))
+
+
+@pytest.fixture
+def catalog(db):
+    add_products(db, [
+        {"code": f"C{i}", "brand": value, "model": VALUES[(i * 7) % len(VALUES)], "main_cat": "Sensors" if i % 2 else "Valves"}
+        for i, value in enumerate(VALUES * 3)
+    ])
+    main.search_index.rebuild()
+    assert main.search_index._ensure(db)
+
+
+@pytest.mark.parametrize("needle", NEEDLES)
+def test_index_matches_ilike(db, catalog, needle):
+    criteria = {"brand": needle}
+    assert matching_ids(db, criteria) == ilike_ids(db, criteria)
+
+
+@pytest.mark.parametrize("needles", [("fes", "o"), ("%", "5"), ("öl", "ß"), ("sick", "xyz"), ("o", "sensors")])
+def test_index_matches_ilike_with_several_filters(db, catalog, needles):
+    criteria = {"brand": needles[0], "model": needles[1]}
+    assert matching_ids(db, criteria) == ilike_ids(db, criteria)
+    criteria = {"brand": needles[0], "main_cat": needles[1]}
+    assert matching_ids(db, criteria) == ilike_ids(db, criteria)
+
+
+def test_index_narrows_ascii_needles(db, catalog):
+    candidates = main.search_index.candidates(db, {"brand": "festo"})
+    assert candidates is not None
+    assert set(ilike_ids(db, {"brand": "festo"})) <= candidates
+    # LIKE wildcards cannot be answered by the index
+    assert main.search_index.candidates(db, {"brand": "50%"}) is None
+
+
+def test_stale_index_falls_back_to_database(db, catalog):
+    # A write from another process: only the shared version tells us
+    db.add(main.Product(code="new", brand="Festo Neu"))
+    main.bump_catalog_version(db)
+    db.commit()
+    main.search_index.rebuild_interval = 3600
+    main.search_index._last_rebuild = main.time.monotonic()
+    try:
+        assert main.search_index.candidates(db, {"brand": "festo"}) is None
+        assert matching_ids(db, {"brand": "festo neu"}) == ilike_ids(db, {"brand": "festo neu"}) != []
+    finally:
+        main.search_index.rebuild_interval = main.SEARCH_INDEX_REBUILD_INTERVAL
+        main.search_index._last_rebuild = None
+
+
+def group_by_counts(db, criteria, columns):
+    """
+    Facet counts with one GROUP BY per column, the reference for both fast paths.
+    """
+    filters = main.facet_search_filters(criteria)
+    total = db.query(main.func.count(main.Product.id)).filter(*filters.values()).scalar()
+    counts = {}
+    for column in columns:
+        attribute = getattr(main.Product, column)
+        rows = (
+            db.query(attribute, main.func.count(main.Product.id))
+            .filter(attribute.isnot(None), *[condition for name, condition in filters.items() if name != column])
+            .group_by(attribute)
+        )
+        counts[column] = dict(rows.all())
+    return total, counts
+
+
+FACET_CRITERIA = [
+    {}, {"brand": "fes"}, {"brand": "o", "main_cat": "sens"}, {"model": "ß"},
+    {"brand": "e", "model": "o", "main_cat": "v"}, {"brand": "xyz"},
+]
+
+
+@pytest.mark.parametrize("criteria", FACET_CRITERIA)
+def test_facet_counts_match_group_by(db, catalog, criteria):
+    columns = ["brand", "model", "main_cat"]
+    expected = group_by_counts(db, criteria, columns)
+    indexed = main.search_index.facet_counts(db, criteria, columns)
+    assert indexed is not None
+    assert (indexed[0], {column: dict(indexed[1][column]) for column in columns}) == expected
+    assert main.facet_counts_from_db(db, criteria, columns) == expected
+
+
+def test_facet_counts_are_one_grouping_sets_statement_on_postgresql():
+    statement, keys = main.facet_counts_statement({"brand": "fes", "main_cat": "sens"}, ["brand", "main_cat", "voltage"])
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+
+    assert sql.count("SELECT") == 1
+    assert "GROUPING SETS((products.brand), (products.main_cat), (products.voltage), ())" in sql
+    assert sql.count("FILTER (WHERE") == 3
+    assert keys == [None, "brand", "main_cat"]
+
+
+def test_facet_counts_default_skips_per_row_identifiers(client, db, catalog):
+    facets = client.get("/facet-counts").json()["facets"]
+    assert "code" not in facets and "model" not in facets
+    assert {"main_cat", "sub_cat", "brand", "voltage", "output", "connection", "material"} <= set(facets)
+
+    facets = client.get("/facet-counts", params={"facets": "code,brand"}).json()["facets"]
+    assert set(facets) == {"code", "brand"}
+    assert len(facets["code"]) == db.query(main.Product.code).distinct().count()
@@ -0,0 +1,57 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import main
+
+
+class CountingStorage(main.LocalStorage):
+    def __init__(self, root):
+        super().__init__(root)
+        self.uploads = 0
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None):
+        self.uploads += 1
+        super().upload_fileobj(Fileobj, Bucket, Key, ExtraArgs)
+
+
+def test_same_content_is_stored_once(db):
+    storage = CountingStorage(main.LOCAL_STORAGE_DIR)
+    first = main.store_media(io.BytesIO(b"same bytes"), "images", ".png", "image/png", storage)
+    second = main.store_media(io.BytesIO(b"same bytes"), "pdfs", ".pdf", "application/pdf", storage)
+    other = main.store_media(io.BytesIO(b"other bytes"), "images", ".png", "image/png", storage)
+
+    assert first == second != other
+    assert storage.uploads == 2
+    assert first.endswith(f"images/{main.hashlib.sha256(b'same bytes').hexdigest()}.png")
+    assert db.query(main.MediaObject).count() == 2
+
+
+def test_dedupe_survives_a_cold_cache(db):
+    storage = CountingStorage(main.LOCAL_STORAGE_DIR)
+    url = main.store_media(io.BytesIO(b"x" * 100), "images", ".jpg", "image/jpeg", storage)
+    # Another worker (or a restart) only has the database
+    main.media_index._urls.clear()
+    assert main.store_media(io.BytesIO(b"x" * 100), "images", ".jpg", "image/jpeg", storage) == url
+    assert storage.uploads == 1
+
+
+def test_concurrent_duplicates_upload_once():
+    storage = CountingStorage(main.LOCAL_STORAGE_DIR)
+    data = os.urandom(256 * 1024)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        urls = set(executor.map(
+            lambda _: main.store_media(io.BytesIO(data), "images", ".bin", None, storage), range(16)
+        ))
+    assert len(urls) == 1
+    assert storage.uploads == 1
+
+
+def test_forgotten_content_is_stored_again(db):
+    storage = CountingStorage(main.LOCAL_STORAGE_DIR)
+    url = main.store_media(io.BytesIO(b"gone"), "images", ".png", "image/png", storage)
+    main.delete_media([main.storage_key_from_url(url)], storage)
+    assert db.query(main.MediaObject).count() == 0
+    assert main.store_media(io.BytesIO(b"gone"), "images", ".png", "image/png", storage) == url
+    assert storage.uploads == 2
+    assert os.path.exists(storage.path(main.storage_key_from_url(url)))
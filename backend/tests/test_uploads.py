@@ -0,0 +1,108 @@
+import hashlib
+import logging
+
+import pytest
+
+import main
+
+CONTENT = b"presigned upload round trip " * 64
+
+
+def create_upload(client, **fields):
+    request = {"filename": "manual.pdf", "content_type": "application/pdf", "size": len(CONTENT), "folder": "pdfs"}
+    response = client.post("/uploads", json={**request, **fields})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_put_upload_round_trip_and_dedupe(client):
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    upload = create_upload(client, sha256=sha256, mode="put")
+    assert upload["key"] == f"pdfs/{sha256}.pdf"
+
+    assert client.put(upload["url"], content=CONTENT, headers=upload["headers"]).status_code == 200
+    done = client.post("/uploads/complete", json={"upload_token": upload["upload_token"]}).json()
+
+    assert done["verified"]
+    assert client.get(done["url"]).content == CONTENT
+    assert main.image_variants._read(done["url"], done["key"]) == CONTENT
+    assert create_upload(client, sha256=sha256, mode="put") == {"status": "exists", "url": done["url"]}
+
+
+def test_put_upload_rejects_other_content(client):
+    upload = create_upload(client, sha256=hashlib.sha256(CONTENT).hexdigest(), mode="put")
+
+    response = client.put(upload["url"], content=CONTENT[::-1], headers=upload["headers"])
+
+    assert response.status_code == 400
+    complete = client.post("/uploads/complete", json={"upload_token": upload["upload_token"]})
+    assert complete.status_code == 400
+
+
+def test_post_upload_round_trip(client):
+    upload = create_upload(client, mode="post")
+
+    response = client.post(upload["url"], data=upload["fields"], files={"file": ("manual.pdf", CONTENT, "application/pdf")})
+    assert response.status_code == 204
+    done = client.post("/uploads/complete", json={"upload_token": upload["upload_token"]}).json()
+
+    assert not done["verified"]
+    assert client.get(done["url"]).content == CONTENT
+
+
+def test_multipart_upload_round_trip(client):
+    upload = create_upload(client, mode="multipart")
+
+    parts = []
+    for part in upload["parts"]:
+        start = (part["part_number"] - 1) * upload["part_size"]
+        response = client.put(part["url"], content=CONTENT[start:start + upload["part_size"]])
+        assert response.status_code == 200
+        parts.append({"part_number": part["part_number"], "etag": response.headers["etag"]})
+    done = client.post("/uploads/complete", json={"upload_token": upload["upload_token"], "parts": parts}).json()
+
+    assert client.get(done["url"]).content == CONTENT
+
+
+def test_complete_rejects_wrong_size_and_forged_tokens(client):
+    upload = create_upload(client, mode="put")
+    assert client.put(upload["url"], content=CONTENT[:-1], headers=upload["headers"]).status_code == 200
+
+    response = client.post("/uploads/complete", json={"upload_token": upload["upload_token"]})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Uploaded file does not match the announced size"
+
+    payload, _, signature = upload["upload_token"].partition(".")
+    forged = client.post("/uploads/complete", json={"upload_token": f"{payload}.{'0' * len(signature)}"})
+    assert forged.status_code == 400
+
+
+@pytest.mark.parametrize("backend, workers", [("s3", "1"), ("local", "2")])
+def test_uploads_unavailable_without_secret_where_tokens_cross_processes(client, monkeypatch, caplog, backend, workers):
+    monkeypatch.setattr(main, "UPLOAD_SIGNING_SECRET_GENERATED", True)
+    monkeypatch.setattr(main, "STORAGE_BACKEND", backend)
+    monkeypatch.setenv("WEB_CONCURRENCY", workers)
+
+    with caplog.at_level(logging.ERROR):
+        main.report_upload_signing_secret()
+    assert "UPLOAD_SIGNING_SECRET is not set" in caplog.text
+
+    request = {"filename": "manual.pdf", "size": len(CONTENT), "folder": "pdfs"}
+    for path, body in [("/uploads", request), ("/uploads/complete", {"upload_token": "x.y"}), ("/uploads/abort", {"upload_token": "x.y"})]:
+        response = client.post(path, json=body)
+        assert response.status_code == 503, path
+        assert "UPLOAD_SIGNING_SECRET" in response.json()["detail"]
+    # Everything else keeps working
+    assert client.get("/healthz").status_code == 200
+    assert client.get("/categories").status_code == 200
+
+
+def test_generated_signing_secret_warns_for_one_local_worker(client, monkeypatch, caplog):
+    monkeypatch.setattr(main, "UPLOAD_SIGNING_SECRET_GENERATED", True)
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+
+    with caplog.at_level(logging.WARNING):
+        main.report_upload_signing_secret()
+
+    assert "UPLOAD_SIGNING_SECRET is not set" in caplog.text
+    assert create_upload(client, mode="put")["status"] == "upload"
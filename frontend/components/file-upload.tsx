@@ -7,6 +7,111 @@ import { Label } from "@/components/ui/label";
 import { useToast } from "@/hooks/use-toast";
 import { AlertDialog, AlertDialogContent, AlertDialogDescription, AlertDialogFooter, AlertDialogHeader, AlertDialogTitle } from "@/components/ui/alert-dialog";
 
+const API_BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL;
+// Files up to this size are hashed in the browser, so the API can skip uploads it already has
+const HASH_MAX_BYTES = 64 * 1024 * 1024;
+const PART_CONCURRENCY = 4;
+
+type UploadPlan = {
+  status: "exists" | "upload";
+  url: string;
+  mode?: "put" | "post" | "multipart";
+  headers?: Record<string, string>;
+  fields?: Record<string, string>;
+  part_size?: number;
+  parts?: { part_number: number; url: string }[];
+  upload_token?: string;
+};
+
+async function sha256Hex(file: File): Promise<string | null> {
+  if (file.size > HASH_MAX_BYTES || !window.crypto?.subtle) {
+    return null;
+  }
+  const digest = await window.crypto.subtle.digest("SHA-256", await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest))
+    .map((byte) => byte.toString(16).padStart(2, "0"))
+    .join("");
+}
+
+async function postJson<T>(path: string, body: unknown): Promise<T> {
+  const response = await fetch(`${API_BASE_URL}${path}`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body),
+  });
+  if (!response.ok) {
+    throw new Error(`${path} failed with status ${response.status}`);
+  }
+  return response.json();
+}
+
+async function uploadParts(file: File, plan: UploadPlan) {
+  const parts = plan.parts ?? [];
+  const partSize = plan.part_size ?? file.size;
+  const etags: { part_number: number; etag: string }[] = [];
+  let next = 0;
+
+  const worker = async () => {
+    while (next < parts.length) {
+      const part = parts[next++];
+      const start = (part.part_number - 1) * partSize;
+      const response = await fetch(part.url, { method: "PUT", body: file.slice(start, start + partSize) });
+      const etag = response.headers.get("ETag");
+      if (!response.ok || !etag) {
+        throw new Error(`Part ${part.part_number} failed to upload`);
+      }
+      etags.push({ part_number: part.part_number, etag });
+    }
+  };
+
+  await Promise.all(Array.from({ length: Math.min(PART_CONCURRENCY, parts.length) }, worker));
+  return etags;
+}
+
+// Upload straight to storage with presigned URLs issued by the API
+async function uploadFile(file: File): Promise<string> {
+  const plan = await postJson<UploadPlan>("/uploads", {
+    filename: file.name,
+    content_type: file.type || null,
+    size: file.size,
+    sha256: await sha256Hex(file),
+  });
+  if (plan.status === "exists") {
+    return plan.url;
+  }
+
+  let parts: { part_number: number; etag: string }[] = [];
+  try {
+    if (plan.mode === "multipart") {
+      parts = await uploadParts(file, plan);
+    } else if (plan.mode === "post") {
+      const formData = new FormData();
+      Object.entries(plan.fields ?? {}).forEach(([name, value]) => formData.append(name, value));
+      formData.append("file", file);
+      const response = await fetch(plan.url, { method: "POST", body: formData });
+      if (!response.ok) {
+        throw new Error("Failed to upload file");
+      }
+    } else {
+      const response = await fetch(plan.url, { method: "PUT", headers: plan.headers, body: file });
+      if (!response.ok) {
+        throw new Error("Failed to upload file");
+      }
+    }
+  } catch (error) {
+    if (plan.mode === "multipart") {
+      await postJson("/uploads/abort", { upload_token: plan.upload_token }).catch(() => undefined);
+    }
+    throw error;
+  }
+
+  const result = await postJson<{ url: string }>("/uploads/complete", {
+    upload_token: plan.upload_token,
+    parts,
+  });
+  return result.url;
+}
+
 export function FileUpload() {
   const [file, setFile] = useState<File | null>(null);
   const [isUploading, setIsUploading] = useState(false);
@@ -34,20 +139,7 @@ export function FileUpload() {
     setIsUploading(true);
 
     try {
-      const formData = new FormData();
-      formData.append("file", file);
-
-      const response = await fetch(`${process.env.NEXT_PUBLIC_API_BASE_URL}/upload-product-image`, {
-        method: "POST",
-        body: formData,
-      });
-
-      if (!response.ok) {
-        throw new Error("Failed to upload file");
-      }
-
-      const result = await response.json();
-      setUploadedUrl(result.url);
+      setUploadedUrl(await uploadFile(file));
 
       toast({
         title: "File Uploaded",